@@ -1,8 +1,9 @@
 from apps.auth.routers import auth_router
 from apps.auth.services import (
-    pwd_context,
+    get_pwd_context,
     CryptContext,
     verify_password,
+    hash_password,
     OAuth2PasswordBearerWithCookie,
     get_user,
     authenticate_user,
@@ -13,11 +14,12 @@ from apps.auth.schemas import Token, TokenData
 
 __all__ = [
     "auth_router",
-    "pwd_context",
+    "get_pwd_context",
     "Token",
     "TokenData",
     "CryptContext",
     "verify_password",
+    "hash_password",
     "OAuth2PasswordBearerWithCookie",
     "get_user",
     "authenticate_user",
@@ -1,3 +1,7 @@
 from fastapi import APIRouter
 
-auth_router = APIRouter(tags=["Аутентификация/авторизация пользователя"])
+from apps.monitoring.services import TimedAPIRoute
+
+auth_router = APIRouter(
+    tags=["Аутентификация/авторизация пользователя"], route_class=TimedAPIRoute
+)
@@ -1,4 +1,5 @@
 import asyncio
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Optional
 
@@ -9,8 +10,9 @@ from fastapi.security.utils import get_authorization_scheme_param
 from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
 from apps.user.services import ConnectionDep
-from settings.settings import SettingsDep
+from settings.settings import SettingsDep, get_settings
 from apps.auth.schemas import TokenData
+from apps.monitoring.services import timed
 
 
 class OAuth2PasswordBearerWithCookie(OAuth2PasswordBearer):
@@ -42,8 +44,20 @@ class OAuth2PasswordBearerWithCookie(OAuth2PasswordBearer):
             )
 
 
-# Контекст PassLib. Используется для хэширования и проверки паролей.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache()
+def get_pwd_context() -> CryptContext:
+    """
+    Функция получения контекста PassLib. Используется для хэширования и проверки паролей.
+    Контекст и backend bcrypt создаются при первом обращении, а не при импорте модуля.
+    Стоимость хэширования задается настройкой BCRYPT_ROUNDS.
+    :return: Контекст PassLib
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=get_settings().BCRYPT_ROUNDS,
+    )
+
 
 oauth2_scheme = OAuth2PasswordBearerWithCookie(tokenUrl="token")
 
@@ -53,7 +67,16 @@ def verify_password(plain_password, hashed_password) -> bool:
     Функция проверки соответствия полученного пароля и хранимого хеша
     """
 
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("bcrypt"):
+        return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def hash_password(password: str) -> str:
+    """
+    Функция хэширования пароля пользователя
+    """
+    with timed("bcrypt"):
+        return get_pwd_context().hash(password)
 
 
 async def get_user(username: str, connection: ConnectionDep):
@@ -83,7 +106,8 @@ async def authenticate_user(username: str, password: str, connection: Connection
     :return: Пользователь, валидированный моделью User
     """
     user = await get_user(username, connection)
-    if not verify_password(password, user["hashed_password"]):
+    # Проверка bcrypt выполняется в потоке: пока идут входы, цикл событий обслуживает остальные запросы
+    if not await asyncio.to_thread(verify_password, password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Введен неверный пароль",
@@ -132,9 +156,10 @@ async def verify_token(
     :return: username-пользователя, декодированный из токена доступа
     """
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        with timed("jwt"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
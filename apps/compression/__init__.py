@@ -0,0 +1,13 @@
+from apps.compression.services import (
+    CompressionMiddleware,
+    CompressedCache,
+    get_compressors,
+    select_encoding,
+)
+
+__all__ = [
+    "CompressionMiddleware",
+    "CompressedCache",
+    "get_compressors",
+    "select_encoding",
+]
@@ -0,0 +1,374 @@
+import asyncio
+import zlib
+from collections import OrderedDict
+from typing import Callable, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from apps.monitoring.services import timed
+from settings.settings import get_settings
+
+# Необязательные зависимости: без них соответствующее сжатие не предлагается клиентам
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def sync_flush(self) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _GzipCompressor:
+    """
+    Обертка над zlib.compressobj. sync_flush отдает все накопленные данные (Z_SYNC_FLUSH),
+    чтобы клиент мог распаковать уже полученную часть потока; flush завершает поток
+    """
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync_flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    """Обертка над brotli.Compressor с интерфейсом _GzipCompressor"""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def sync_flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    """Обертка над zstandard compressobj с интерфейсом _GzipCompressor"""
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync_flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def get_compressors(
+    encodings: list[str],
+    gzip_level: int = 6,
+    brotli_quality: int = 4,
+    zstd_level: int = 3,
+) -> dict[str, Callable[[], Compressor]]:
+    """
+    Функция получения фабрик компрессоров для доступных кодировок
+    :param encodings: Кодировки в порядке предпочтения сервера
+    :param gzip_level: Уровень сжатия gzip
+    :param brotli_quality: Качество сжатия brotli
+    :param zstd_level: Уровень сжатия zstd
+    :return: Словарь {кодировка: фабрика компрессора} в порядке предпочтения, без кодировок,
+    для которых не установлена библиотека
+    """
+    factories = {
+        "gzip": lambda: _GzipCompressor(gzip_level),
+        "br": (lambda: _BrotliCompressor(brotli_quality)) if brotli else None,
+        "zstd": (lambda: _ZstdCompressor(zstd_level)) if zstandard else None,
+    }
+    return {
+        encoding: factories[encoding]
+        for encoding in encodings
+        if factories.get(encoding) is not None
+    }
+
+
+def select_encoding(accept_encoding: str | None, encodings) -> str | None:
+    """
+    Функция выбора кодировки по заголовку Accept-Encoding
+    :param accept_encoding: Значение заголовка Accept-Encoding
+    :param encodings: Кодировки сервера в порядке предпочтения
+    :return: Первая кодировка сервера, принимаемая клиентом, или None
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_body(factory: Callable[[], Compressor], body: bytes) -> bytes:
+    compressor = factory()
+    return compressor.compress(body) + compressor.flush()
+
+
+def is_compressible(status: int, headers: Headers) -> bool:
+    """
+    Функция проверки, можно ли сжимать ответ
+    :param status: Код ответа
+    :param headers: Заголовки ответа
+    :return: True для успешных ответов с телом текстового типа, еще не сжатых
+    """
+    if not 200 <= status < 300 or status in (204, 206):
+        return False
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type
+
+
+class CompressedCache:
+    """
+    LRU-кэш сжатых тел ответов с ограничением по суммарному размеру. Кэшируются только ответы
+    с ETag: ключ включает путь, строку запроса, ETag и кодировку, поэтому после изменения данных
+    устаревший вариант не будет найден и со временем вытеснится
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._bodies: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def get(self, key: tuple) -> bytes | None:
+        body = self._bodies.get(key)
+        if body is not None:
+            self._bodies.move_to_end(key)
+        return body
+
+    def put(self, key: tuple, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        previous = self._bodies.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._bodies[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._bodies.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self._bodies.clear()
+        self.size = 0
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов (zstd, br, gzip - по Accept-Encoding клиента и порядку
+    COMPRESSION_ENCODINGS). Тела меньше minimum_size передаются без сжатия. Сжатие частей
+    больше thread_min_size выполняется в потоке, чтобы не блокировать цикл событий (zlib, brotli
+    и zstd отпускают GIL). Сжатые варианты ответов с ETag хранятся в кэше, и повторный горячий
+    ответ не сжимается заново. Потоковые ответы сжимаются по частям, и каждая сжатая часть сразу
+    передается клиенту.
+    Параметры, не переданные явно, берутся из настроек при первом запросе.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        enabled: bool | None = None,
+        minimum_size: int | None = None,
+        thread_min_size: int | None = None,
+        compressors: dict[str, Callable[[], Compressor]] | None = None,
+        cache: CompressedCache | None = None,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+        self.compressors = compressors
+        self.cache = cache
+        self._configured = False
+
+    def _configure(self):
+        settings = get_settings()
+        if self.enabled is None:
+            self.enabled = settings.COMPRESSION_ENABLED
+        if self.minimum_size is None:
+            self.minimum_size = settings.COMPRESSION_MIN_SIZE
+        if self.thread_min_size is None:
+            self.thread_min_size = settings.COMPRESSION_THREAD_MIN_SIZE
+        if self.compressors is None:
+            self.compressors = get_compressors(
+                settings.COMPRESSION_ENCODINGS,
+                settings.COMPRESSION_GZIP_LEVEL,
+                settings.COMPRESSION_BROTLI_QUALITY,
+                settings.COMPRESSION_ZSTD_LEVEL,
+            )
+        if self.cache is None:
+            self.cache = CompressedCache(settings.COMPRESSION_CACHE_MAX_BYTES)
+        self._configured = True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if not self._configured:
+            self._configure()
+        encoding = None
+        if self.enabled and scope["method"] != "HEAD":
+            encoding = select_encoding(
+                Headers(scope=scope).get("accept-encoding"), self.compressors
+            )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(
+            scope, receive, _CompressionResponder(self, scope, encoding, send)
+        )
+
+
+class _CompressionResponder:
+    """
+    Обертка send для одного ответа. Начало ответа задерживается до первых minimum_size байт тела:
+    если ответ закончился раньше, он передается без сжатия. Тело, пришедшее целиком, сжимается
+    за один раз (с использованием кэша), потоковое - компрессором по частям
+    """
+
+    def __init__(
+        self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send
+    ):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message | None = None
+        self.passthrough = False
+        self.compressor: Compressor | None = None
+        self.buffer: list[bytes] = []
+        self.buffered = 0
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = not is_compressible(
+                message["status"], Headers(raw=message["headers"])
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if more_body and self.buffered < self.middleware.minimum_size:
+                return
+            body = b"".join(self.buffer)
+            self.buffer = []
+            if not more_body:
+                await self._send_whole(body)
+                return
+            self.compressor = self.middleware.compressors[self.encoding]()
+            headers = MutableHeaders(scope=self.start_message)
+            if "content-length" in headers:
+                del headers["content-length"]
+            headers.add_vary_header("Accept-Encoding")
+            self._set_encoding_headers(headers)
+            await self.send(self.start_message)
+
+        with timed("compress"):
+            data = await self._run(
+                lambda chunk: self._compress_chunk(chunk, more_body), body
+            )
+        await self.send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    def _compress_chunk(self, chunk: bytes, more_body: bool) -> bytes:
+        # Компрессоры накапливают небольшие части внутри себя; без сброса после каждой части
+        # потоковый ответ дошел бы до клиента только после заполнения буфера или в конце потока
+        data = self.compressor.compress(chunk)
+        return data + (
+            self.compressor.sync_flush() if more_body else self.compressor.flush()
+        )
+
+    async def _run(self, func, data: bytes) -> bytes:
+        if len(data) >= self.middleware.thread_min_size:
+            return await asyncio.to_thread(func, data)
+        return func(data)
+
+    async def _send_whole(self, body: bytes):
+        headers = MutableHeaders(scope=self.start_message)
+        compressed = None
+        if len(body) >= self.middleware.minimum_size:
+            etag = headers.get("etag")
+            key = (
+                (self.scope["path"], self.scope["query_string"], etag, self.encoding)
+                if etag
+                else None
+            )
+            compressed = self.middleware.cache.get(key) if key else None
+            if compressed is None:
+                factory = self.middleware.compressors[self.encoding]
+                with timed("compress"):
+                    compressed = await self._run(
+                        lambda data: compress_body(factory, data), body
+                    )
+                if key:
+                    self.middleware.cache.put(key, compressed)
+        # Выбор кодировки зависит от Accept-Encoding, даже если тело передается без сжатия
+        headers.add_vary_header("Accept-Encoding")
+        if compressed is not None and len(compressed) < len(body):
+            self._set_encoding_headers(headers)
+            headers["Content-Length"] = str(len(compressed))
+            body = compressed
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": body})
+
+    def _set_encoding_headers(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        # Сжатое представление побайтно отличается от исходного, поэтому ETag становится слабым;
+        # If-None-Match с таким ETag по-прежнему совпадает (слабое сравнение)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
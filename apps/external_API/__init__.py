@@ -1,4 +1,39 @@
 from apps.external_API.routers import external_API_router
-from apps.external_API.services import fetch_data
+from apps.external_API.disk_cache import DiskCache
+from apps.external_API.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientClient,
+    UpstreamError,
+    get_upstream_client,
+)
+from apps.external_API.services import (
+    fetch_data,
+    get_http_client,
+    close_http_client,
+    pagination_params,
+    parse_fields,
+    project_fields,
+    stream_json_array,
+    JsonStreamParser,
+    aggregate_posts,
+)
 
-__all__ = ["external_API_router", "fetch_data"]
+__all__ = [
+    "external_API_router",
+    "DiskCache",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ResilientClient",
+    "UpstreamError",
+    "get_upstream_client",
+    "fetch_data",
+    "get_http_client",
+    "close_http_client",
+    "pagination_params",
+    "parse_fields",
+    "project_fields",
+    "stream_json_array",
+    "JsonStreamParser",
+    "aggregate_posts",
+]
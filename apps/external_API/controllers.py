@@ -1,13 +1,49 @@
 from typing import Annotated, Union
 
-from fastapi import Query
+from fastapi import HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
+from apps.external_API.resilience import (
+    CircuitOpenError,
+    UpstreamError,
+    get_upstream_client,
+)
 from apps.external_API.routers import external_API_router
-from apps.external_API.services import fetch_data
+from apps.external_API.services import (
+    aggregate_posts,
+    pagination_params,
+    parse_fields,
+    stream_json_array,
+)
+from settings.settings import SettingsDep
+
+
+def upstream_http_error(error: Exception, client) -> HTTPException:
+    """
+    Функция перевода ошибки внешнего API в HTTP-ошибку
+    :param error: Исключение, возникшее при запросе к внешнему API
+    :param client: Клиент внешнего API
+    :return: HTTPException с кодом 503 (внешний API недоступен) или 502 (внешний API вернул ошибку)
+    """
+    if isinstance(error, CircuitOpenError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(error),
+            headers={"Retry-After": str(int(client.breaker.reset_timeout))},
+        )
+    if isinstance(error, UpstreamError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(error)
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Внешний API вернул ошибку: {error!r}",
+    )
 
 
 @external_API_router.get("/json", response_model=Union[list[dict], dict])
 async def fetch_external_API_data(
+    settings: SettingsDep,
     offset: Annotated[
         int,
         Query(
@@ -21,20 +57,85 @@ async def fetch_external_API_data(
         int,
         Query(
             title="Ограничитель списка",
-            description="ID сущности, которой закончить поиск",
+            description="Максимальное количество сущностей в ответе",
             ge=1,
             le=101,
         ),
     ] = 101,
+    fields: Annotated[
+        str | None,
+        Query(
+            title="Проекция",
+            description="Поля сущности через запятую, например: id,title",
+            min_length=1,
+        ),
+    ] = None,
 ):
     """
     Эндпоинт поиска диапазона сущностей.
+    :param settings: Настройки приложения
     :param offset: Отступ. Рекомендуется использовать 1 по умолчанию
-    :param limit: Ограничитель.
-    :return: Список сущностей или ошибка.
+    :param limit: Ограничитель: максимальное количество сущностей в ответе
+    :param fields: Поля сущности, которые нужно вернуть. По умолчанию возвращаются все
+    :return: Список сущностей. Если внешний API недоступен, а в кэше нет ответа - ошибка 503
     """
+    # Пагинация выполняется на стороне внешнего API, ограничитель - еще и при чтении ответа
+    client = get_upstream_client()
+    items = client.fetch(
+        f"{settings.UPSTREAM_BASE_URL}/posts", params=pagination_params(offset, limit)
+    )
     try:
-        result = await fetch_data("https://jsonplaceholder.typicode.com/posts")
-        return result[offset - 1 : offset - 2 + limit]
+        # Ошибки соединения возникают до первого элемента, пока ответ еще можно заменить
+        first = await anext(items)
+    except StopAsyncIteration:
+        return []
     except Exception as e:
-        return {"message": e}
+        raise upstream_http_error(e, client)
+    return StreamingResponse(
+        stream_json_array(first, items, limit, parse_fields(fields)),
+        media_type="application/json",
+    )
+
+
+@external_API_router.get("/aggregate", response_model=list[dict])
+async def aggregate_external_API_data(
+    settings: SettingsDep,
+    offset: Annotated[
+        int,
+        Query(
+            title="Отступ от начала списка",
+            description="ID поста, с которого начать",
+            ge=1,
+            le=99,
+        ),
+    ] = 1,
+    limit: Annotated[
+        int,
+        Query(
+            title="Ограничитель списка",
+            description="Количество постов",
+            ge=1,
+            le=100,
+        ),
+    ] = 10,
+):
+    """
+    Эндпоинт сводного представления постов: каждый пост дополняется автором и комментариями.
+    Посты, пользователи и комментарии запрашиваются у внешнего API одновременно.
+    :param settings: Настройки приложения
+    :param offset: ID поста, с которого начать
+    :param limit: Количество постов
+    :return: Список постов с полями author и comments
+    """
+    client = get_upstream_client()
+    try:
+        return await aggregate_posts(
+            client,
+            settings.UPSTREAM_BASE_URL,
+            offset,
+            limit,
+            concurrency=settings.UPSTREAM_CONCURRENCY,
+        )
+    except ExceptionGroup as group:
+        # TaskGroup собирает ошибки всех запросов, для ответа достаточно первой
+        raise upstream_http_error(group.exceptions[0], client)
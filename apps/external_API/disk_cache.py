@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Iterator
+
+from apps.external_API.services import JsonStreamParser
+
+logger = logging.getLogger("apps.external_API")
+
+# Заголовок записи: сигнатура, версия формата, длины ключа, ETag, Last-Modified и тела
+HEADER = struct.Struct("<4sB3xIIII")
+MAGIC = b"UAPI"
+VERSION = 1
+SUFFIX = ".bin"
+
+
+class DiskCacheEntry:
+    """
+    Запись дискового кэша, отображенная в память через mmap. Файл можно заменить или удалить
+    из другого процесса - отображение продолжает указывать на прочитанную версию.
+    Время сохранения записи - время изменения файла
+    """
+
+    def __init__(
+        self,
+        mm: mmap.mmap,
+        stored_at: float,
+        etag: str | None,
+        last_modified: str | None,
+        body_offset: int,
+        body_length: int,
+    ):
+        self._mm = mm
+        self.stored_at = stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self._body_offset = body_offset
+        self._body_length = body_length
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    def validators(self) -> dict[str, str]:
+        """
+        Метод получения заголовков условного запроса
+        :return: Заголовки If-None-Match и If-Modified-Since, если валидаторы сохранены
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def items(self, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        """
+        Метод чтения элементов записи. Тело разбирается частями, без копирования файла целиком
+        :param chunk_size: Размер части тела в байтах
+        :return: Итератор по элементам
+        """
+        parser = JsonStreamParser()
+        end = self._body_offset + self._body_length
+        for start in range(self._body_offset, end, chunk_size):
+            yield from parser.feed(self._mm[start : min(start + chunk_size, end)])
+        yield from parser.close()
+
+    def close(self):
+        self._mm.close()
+
+
+class DiskCache:
+    """
+    Дисковый кэш ответов внешнего API, общий для процессов-воркеров. Каждая запись - отдельный
+    файл с бинарным заголовком, ключом, валидаторами (ETag, Last-Modified) и телом в JSON.
+    Запись выполняется во временный файл с атомарной заменой, поэтому читатели не видят
+    частично записанных данных. При превышении max_bytes удаляются давно обновлявшиеся записи.
+    """
+
+    def __init__(
+        self, directory: str, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha256(key.encode()).hexdigest() + SUFFIX
+        )
+
+    def get(self, key: str) -> DiskCacheEntry | None:
+        """
+        Метод получения записи. Выполняет блокирующий ввод-вывод, поэтому из цикла событий
+        вызывается через asyncio.to_thread
+        :param key: Ключ записи (адрес с параметрами запроса)
+        :return: Запись или None, если ее нет, она недоступна или повреждена
+        """
+        try:
+            with open(self.path(key), "rb") as file:
+                stored_at = os.fstat(file.fileno()).st_mtime
+                mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # ValueError - пустой файл, который нельзя отобразить
+            logger.warning(
+                "Запись дискового кэша недоступна",
+                extra={"event": "disk_cache_unavailable", "error": repr(e)},
+            )
+            return None
+        try:
+            magic, version, key_length, etag_length, lm_length, body_length = (
+                HEADER.unpack_from(mm)
+            )
+            offset = HEADER.size
+            stored_key = mm[offset : offset + key_length].decode()
+            offset += key_length
+            etag = mm[offset : offset + etag_length].decode() or None
+            offset += etag_length
+            last_modified = mm[offset : offset + lm_length].decode() or None
+            offset += lm_length
+            if (
+                magic != MAGIC
+                or version != VERSION
+                or stored_key != key
+                or offset + body_length != len(mm)
+            ):
+                raise ValueError("Некорректная запись кэша")
+        except (struct.error, ValueError, UnicodeDecodeError):
+            mm.close()
+            logger.warning(
+                "Повреждена запись дискового кэша",
+                extra={"event": "disk_cache_corrupted"},
+            )
+            return None
+        return DiskCacheEntry(mm, stored_at, etag, last_modified, offset, body_length)
+
+    def put(
+        self,
+        key: str,
+        items: list[Any],
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        """
+        Метод сохранения записи. Выполняет блокирующий ввод-вывод, поэтому из цикла событий
+        вызывается через asyncio.to_thread
+        :param key: Ключ записи
+        :param items: Элементы ответа
+        :param etag: Заголовок ETag ответа
+        :param last_modified: Заголовок Last-Modified ответа
+        """
+        key_bytes = key.encode()
+        etag_bytes = (etag or "").encode()
+        lm_bytes = (last_modified or "").encode()
+        body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode()
+        header = HEADER.pack(
+            MAGIC, VERSION, len(key_bytes), len(etag_bytes), len(lm_bytes), len(body)
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(header + key_bytes + etag_bytes + lm_bytes)
+                file.write(body)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def touch(self, key: str):
+        """
+        Метод продления записи после ответа 304 Not Modified
+        :param key: Ключ записи
+        """
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        Метод удаления записей, давно не обновлявшихся, пока общий размер кэша больше max_bytes
+        """
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,362 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator
+from urllib.parse import urlencode
+
+from apps.external_API.disk_cache import DiskCache
+from apps.external_API.services import fetch_data
+from settings.settings import get_settings
+
+logger = logging.getLogger("apps.external_API")
+
+
+class UpstreamError(Exception):
+    """Внешний API недоступен: попытки исчерпаны, а данных в кэше нет"""
+
+
+class CircuitOpenError(UpstreamError):
+    """Автоматический выключатель разомкнут: запросы к внешнему API не выполняются"""
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель. После threshold неудач подряд размыкается, и запросы к внешнему API
+    отклоняются сразу. Через reset_timeout пропускается одна пробная попытка (полуоткрытое
+    состояние): успех замыкает выключатель, неудача снова размыкает его.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """
+        Метод проверки, можно ли выполнить запрос
+        :return: True, если выключатель замкнут или пропускает пробную попытку
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self._opened_at is None or self._probing:
+                logger.warning(
+                    "Выключатель внешнего API разомкнут",
+                    extra={"event": "circuit_open", "failures": self.failures},
+                )
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """
+        Метод освобождения пробной попытки, прерванной без результата (например, при отмене
+        запроса): следующий запрос в полуоткрытом состоянии снова может стать пробным
+        """
+        self._probing = False
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Функция проверки, имеет ли смысл повторять запрос после ошибки: повторяются таймауты, ошибки
+    соединения и ответы 5xx/429. Остальные ответы 4xx говорят об ошибке запроса, а не о сбое
+    внешнего API
+    :param error: Исключение
+    :return: True, если запрос можно повторить
+    """
+    import httpx  # Модуль уже загружен get_http_client к моменту первой ошибки
+
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, (TimeoutError, httpx.TransportError))
+
+
+class ResilientClient:
+    """
+    Обертка над fetch_data для идемпотентных GET-запросов: у каждой попытки свой срок, повторы идут
+    с экспоненциальной задержкой со случайным разбросом, при недоступности внешнего API
+    выключатель отклоняет запросы сразу, а ответ берется из кэша последних успешных ответов.
+    Если задан дисковый кэш, свежие ответы отдаются из него без обращения к внешнему API,
+    устаревшие - перепроверяются условным запросом по сохраненным ETag и Last-Modified.
+    Срок попытки ограничивает время до первого элемента ответа; ошибка посреди потока
+    не повторяется, так как часть ответа уже отдана клиенту. В кэши попадают только полностью
+    прочитанные ответы не длиннее cache_max_items элементов: на время чтения более длинного ответа
+    в памяти не копится его содержимое.
+    """
+
+    def __init__(
+        self,
+        attempt_timeout: float = 2,
+        retries: int = 2,
+        backoff_base: float = 0.1,
+        backoff_max: float = 1,
+        breaker: CircuitBreaker | None = None,
+        cache_size: int = 128,
+        cache_max_items: int = 1000,
+        disk_cache: DiskCache | None = None,
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.cache_size = cache_size
+        self.cache_max_items = cache_max_items
+        self._cache: OrderedDict[tuple, list[dict[str, Any]]] = OrderedDict()
+        self.disk_cache = disk_cache
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Метод расчета задержки перед повтором ("full jitter")
+        :param attempt: Номер неудачной попытки, начиная с 0
+        :return: Задержка в секундах
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def fetch(
+        self, url: str, params: dict[str, Any] | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Метод потокового получения данных из внешнего API
+        :param url: Адрес ресурса
+        :param params: Параметры запроса
+        :return: Асинхронный итератор по элементам ответа
+        """
+        key = (
+            url,
+            tuple(
+                sorted(
+                    (name, tuple(value) if isinstance(value, list) else value)
+                    for name, value in (params or {}).items()
+                )
+            ),
+        )
+        disk_key = f"{url}?{urlencode(key[1], doseq=True)}"
+        entry, fresh = (
+            await asyncio.to_thread(self._read_disk, disk_key)
+            if self.disk_cache
+            else (None, None)
+        )
+        if fresh is not None:
+            for item in fresh:
+                yield item
+            return
+        try:
+            response_meta = {}
+            try:
+                items, first = await self._open(
+                    url,
+                    params,
+                    headers=entry.validators() if entry is not None else None,
+                    meta=response_meta,
+                )
+            except UpstreamError:
+                cached = self._cache.get(key)
+                if cached is None and entry is None:
+                    raise
+                logger.info(
+                    "Ответ внешнего API взят из кэша", extra={"event": "upstream_cache"}
+                )
+                if cached is None:
+                    cached = await asyncio.to_thread(list, entry.items())
+                for item in cached:
+                    yield item
+                return
+            if response_meta.get("status") == 304 and entry is not None:
+                await asyncio.to_thread(self.disk_cache.touch, disk_key)
+                for item in await asyncio.to_thread(list, entry.items()):
+                    yield item
+                return
+        finally:
+            if entry is not None:
+                entry.close()
+        if items is None:
+            self._remember(key, [])
+            return
+        collected = [first] if self.cache_max_items > 0 else None
+        exhausted = False
+        try:
+            yield first
+            async for item in items:
+                if collected is not None:
+                    if len(collected) < self.cache_max_items:
+                        collected.append(item)
+                    else:
+                        collected = None  # Ответ слишком длинный для кэша
+                yield item
+            exhausted = True
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            raise
+        finally:
+            await items.aclose()
+            # Ответ, прерванный потребителем или ошибкой, неполон и в кэши не попадает
+            if exhausted and collected is not None:
+                self._remember(key, collected)
+            if exhausted and collected is not None and self.disk_cache is not None:
+                try:
+                    await asyncio.to_thread(
+                        self.disk_cache.put,
+                        disk_key,
+                        collected,
+                        response_meta.get("etag"),
+                        response_meta.get("last_modified"),
+                    )
+                except OSError as e:
+                    # Ответ уже отдан клиенту: ошибка записи в кэш его не прерывает
+                    logger.warning(
+                        "Не удалось сохранить ответ в дисковый кэш",
+                        extra={"event": "disk_cache_unavailable", "error": repr(e)},
+                    )
+
+    def _read_disk(self, disk_key: str):
+        """
+        Метод чтения записи дискового кэша. Выполняет блокирующий ввод-вывод и разбор JSON,
+        поэтому из цикла событий вызывается через asyncio.to_thread
+        :param disk_key: Ключ записи
+        :return: Кортеж из устаревшей записи для условного запроса и элементов свежей записи;
+        отсутствующее значение - None
+        """
+        entry = self.disk_cache.get(disk_key)
+        if entry is None or not entry.is_fresh(self.disk_cache.ttl):
+            return entry, None
+        try:
+            return None, list(entry.items())
+        finally:
+            entry.close()
+
+    async def _open(
+        self,
+        url: str,
+        params: dict[str, Any] | None,
+        headers: dict[str, str] | None = None,
+        meta: dict[str, Any] | None = None,
+    ):
+        def on_response(response):
+            if meta is not None:
+                meta.update(
+                    status=response.status_code,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Внешний API временно недоступен")
+            items = fetch_data(
+                url, params=params, headers=headers, on_response=on_response
+            )
+            try:
+                async with asyncio.timeout(self.attempt_timeout):
+                    first = await anext(items)
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return None, None
+            except Exception as e:
+                await items.aclose()
+                if not is_retryable(e):
+                    # Внешний API ответил, ошибка в самом запросе
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                logger.warning(
+                    "Попытка запроса к внешнему API не удалась",
+                    extra={
+                        "event": "upstream_retry",
+                        "attempt": attempt,
+                        "error": repr(e),
+                    },
+                )
+                if attempt == self.retries:
+                    raise UpstreamError("Внешний API не ответил") from e
+                await asyncio.sleep(self.backoff(attempt))
+            except BaseException:
+                # Отмена (CancelledError) не является неудачей внешнего API
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return items, first
+
+    def _remember(self, key: tuple, items: list[dict[str, Any]]):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = items
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+_upstream_client: ResilientClient | None = None
+
+
+def get_upstream_client() -> ResilientClient:
+    """
+    Функция получения общего клиента внешнего API. Создается при первом обращении по настройкам.
+    Дисковый кэш включается настройкой UPSTREAM_DISK_CACHE_DIR; каталог общий для всех воркеров
+    :return: Объект ResilientClient
+    """
+    global _upstream_client
+    if _upstream_client is None:
+        settings = get_settings()
+        _upstream_client = ResilientClient(
+            attempt_timeout=settings.UPSTREAM_ATTEMPT_TIMEOUT,
+            retries=settings.UPSTREAM_RETRIES,
+            backoff_base=settings.UPSTREAM_BACKOFF_BASE,
+            backoff_max=settings.UPSTREAM_BACKOFF_MAX,
+            breaker=CircuitBreaker(
+                settings.UPSTREAM_BREAKER_THRESHOLD,
+                settings.UPSTREAM_BREAKER_RESET_SECONDS,
+            ),
+            cache_size=settings.UPSTREAM_CACHE_SIZE,
+            cache_max_items=settings.UPSTREAM_CACHE_MAX_ITEMS,
+            disk_cache=(
+                DiskCache(
+                    settings.UPSTREAM_DISK_CACHE_DIR,
+                    max_bytes=settings.UPSTREAM_DISK_CACHE_MAX_BYTES,
+                    ttl=settings.UPSTREAM_DISK_CACHE_TTL,
+                )
+                if settings.UPSTREAM_DISK_CACHE_DIR
+                else None
+            ),
+        )
+    return _upstream_client
+
+
+def reset_upstream_client():
+    """
+    Функция сброса общего клиента внешнего API (кэш, состояние выключателя).
+    Следующее обращение создаст клиент заново по настройкам
+    """
+    global _upstream_client
+    _upstream_client = None
@@ -1,3 +1,7 @@
 from fastapi import APIRouter
 
-external_API_router = APIRouter(tags=["Интеграция с внешним API"])
+from apps.monitoring.services import TimedAPIRoute
+
+external_API_router = APIRouter(
+    tags=["Интеграция с внешним API"], route_class=TimedAPIRoute
+)
@@ -1,9 +1,272 @@
-from typing import Any
+import asyncio
+import codecs
+import json
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable
 
-import httpx
+if TYPE_CHECKING:
+    import httpx
 
+# HTTP-клиент создается при первом запросе к внешнему API и закрывается в lifespan приложения
+_http_client: "httpx.AsyncClient | None" = None
 
-async def fetch_data(url: str) -> list[dict[str, Any]]:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-    return response.json()
+
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Функция получения общего HTTP-клиента. Модуль httpx импортируется и клиент создается
+    лениво, чтобы не замедлять старт приложения.
+    :return: Асинхронный HTTP-клиент
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        _http_client = httpx.AsyncClient()
+    return _http_client
+
+
+async def close_http_client():
+    """
+    Функция закрытия общего HTTP-клиента, если он был создан
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class JsonStreamParser:
+    """
+    Инкрементальный парсер JSON-массива. Принимает тело ответа частями и отдает элементы массива
+    по мере их получения, поэтому в памяти хранится только еще не разобранный элемент.
+    Если документ не является массивом, он отдается целиком при закрытии парсера
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._in_array: bool | None = None
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        """
+        Метод передачи очередной части тела ответа
+        :param chunk: Часть тела ответа
+        :return: Список полностью полученных элементов массива
+        """
+        self._buffer += self._text_decoder.decode(chunk)
+        return self._parse(final=False)
+
+    def close(self) -> list[Any]:
+        """
+        Метод завершения разбора. Вызывается после получения последней части тела ответа
+        :return: Список оставшихся элементов
+        """
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        items = self._parse(final=True)
+        if self._in_array is False:
+            items.append(json.loads(self._buffer))
+            self._buffer = ""
+        elif not self._finished:
+            raise ValueError("Тело ответа оборвалось до конца JSON-массива")
+        return items
+
+    def _parse(self, final: bool) -> list[Any]:
+        items = []
+        pos = self._skip(0, "")
+        if self._in_array is None:
+            if pos == len(self._buffer):
+                return items
+            self._in_array = self._buffer[pos] == "["
+            pos += 1
+        if not self._in_array:
+            # Не массив: накапливаем документ целиком и разбираем его в close()
+            return items
+        while not self._finished:
+            pos = self._skip(pos, ",")
+            if pos == len(self._buffer):
+                break
+            if self._buffer[pos] == "]":
+                self._finished = True
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент получен не полностью - ждем следующую часть
+                break
+            # Число в конце буфера может продолжиться в следующей части
+            if end == len(self._buffer) and not final:
+                break
+            items.append(item)
+            pos = end
+        self._buffer = self._buffer[pos:]
+        return items
+
+    def _skip(self, pos: int, extra: str) -> int:
+        while pos < len(self._buffer) and (
+            self._buffer[pos].isspace() or self._buffer[pos] in extra
+        ):
+            pos += 1
+        return pos
+
+
+async def fetch_data(
+    url: str,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, str] | None = None,
+    on_response: Callable[["httpx.Response"], None] | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Функция потокового получения данных из внешнего API. Тело ответа читается частями
+    и разбирается инкрементально, элементы отдаются по мере получения. Если потребитель
+    прекращает итерацию, ответ закрывается и оставшаяся часть тела не загружается
+    :param url: Адрес ресурса
+    :param params: Параметры запроса, передаваемые внешнему API (например, пагинация)
+    :param headers: Дополнительные заголовки запроса (например, валидаторы условного запроса)
+    :param on_response: Функция, получающая ответ до чтения тела (статус, заголовки)
+    :return: Асинхронный итератор по элементам ответа. Для ответа 304 элементов нет
+    """
+    async with get_http_client().stream(
+        "GET", url, params=params, headers=headers
+    ) as response:
+        if response.status_code != 304:
+            response.raise_for_status()
+        if on_response is not None:
+            on_response(response)
+        if response.status_code == 304:
+            return
+        parser = JsonStreamParser()
+        async for chunk in response.aiter_bytes():
+            for item in parser.feed(chunk):
+                yield item
+        for item in parser.close():
+            yield item
+
+
+def pagination_params(offset: int, limit: int) -> dict[str, int]:
+    """
+    Функция перевода отступа и ограничителя в параметры пагинации внешнего API
+    (json-server: _start считается от нуля, _limit - количество сущностей)
+    :param offset: Номер сущности, с которой начать, начиная с 1
+    :param limit: Количество сущностей
+    :return: Параметры запроса
+    """
+    return {"_start": offset - 1, "_limit": limit}
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """
+    Функция разбора параметра проекции вида "id,title"
+    :param fields: Строка с именами полей через запятую
+    :return: Список имен полей или None, если проекция не задана
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()] or None
+
+
+def project_fields(item: dict[str, Any], fields: list[str] | None) -> dict[str, Any]:
+    """
+    Функция проекции: оставляет в сущности только запрошенные поля
+    :param item: Сущность
+    :param fields: Список имен полей. Если None - сущность возвращается без изменений
+    :return: Сущность с запрошенными полями
+    """
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+async def stream_json_array(
+    first: dict[str, Any],
+    items: AsyncIterator[dict[str, Any]],
+    limit: int,
+    fields: list[str] | None,
+) -> AsyncIterator[bytes]:
+    """
+    Функция сериализации элементов в JSON-массив по мере их получения. Итерация по внешнему API
+    прекращается, как только собрано limit элементов
+    :param first: Первый, уже полученный элемент
+    :param items: Асинхронный итератор по оставшимся элементам
+    :param limit: Максимальное количество элементов
+    :param fields: Список имен полей для проекции или None
+    :return: Асинхронный итератор по частям тела ответа
+    """
+    try:
+        yield b"[" + _dump(project_fields(first, fields))
+        count = 1
+        async for item in items:
+            if count >= limit:
+                break
+            yield b"," + _dump(project_fields(item, fields))
+            count += 1
+        yield b"]"
+    finally:
+        await items.aclose()
+
+
+def _dump(item: dict[str, Any]) -> bytes:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def collect(
+    items: AsyncIterator[dict[str, Any]], semaphore: asyncio.Semaphore
+) -> list[dict[str, Any]]:
+    """
+    Функция чтения ответа внешнего API целиком с ограничением числа одновременных запросов
+    :param items: Асинхронный итератор по элементам ответа
+    :param semaphore: Семафор, ограничивающий число одновременных запросов
+    :return: Список элементов
+    """
+    async with semaphore:
+        return [item async for item in items]
+
+
+async def aggregate_posts(
+    client, base_url: str, offset: int, limit: int, concurrency: int = 4
+) -> list[dict[str, Any]]:
+    """
+    Функция получения сводного представления постов: посты, их авторы и комментарии запрашиваются
+    у внешнего API одновременно и объединяются в памяти. Время ответа определяется самым
+    медленным запросом, а не суммой всех
+    :param client: Клиент внешнего API с методом fetch(url, params)
+    :param base_url: Базовый адрес внешнего API
+    :param offset: Номер поста, с которого начать, начиная с 1
+    :param limit: Количество постов
+    :param concurrency: Максимальное число одновременных запросов
+    :return: Список постов с полями author и comments
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Комментарии фильтруются по диапазону id постов, чтобы не ждать ответа со списком постов
+    comments_params = {"postId_gte": offset, "postId_lte": offset + limit - 1}
+    async with asyncio.TaskGroup() as group:
+        posts_task = group.create_task(
+            collect(
+                client.fetch(
+                    f"{base_url}/posts", params=pagination_params(offset, limit)
+                ),
+                semaphore,
+            )
+        )
+        users_task = group.create_task(
+            collect(client.fetch(f"{base_url}/users"), semaphore)
+        )
+        comments_task = group.create_task(
+            collect(
+                client.fetch(f"{base_url}/comments", params=comments_params), semaphore
+            )
+        )
+    users = {user["id"]: user for user in users_task.result()}
+    comments = defaultdict(list)
+    for comment in comments_task.result():
+        comments[comment.get("postId")].append(comment)
+    return [
+        {
+            **post,
+            "author": users.get(post.get("userId")),
+            "comments": comments.get(post.get("id"), []),
+        }
+        for post in posts_task.result()[:limit]
+    ]
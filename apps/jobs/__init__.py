@@ -0,0 +1,27 @@
+from apps.jobs.routers import jobs_router
+from apps.jobs.schemas import JobInfo, JobAccepted, JobsList
+from apps.jobs.services import (
+    Job,
+    JobQueue,
+    get_job_queue,
+    close_job_queue,
+    reset_job_queue,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+)
+
+__all__ = [
+    "jobs_router",
+    "JobInfo",
+    "JobAccepted",
+    "JobsList",
+    "Job",
+    "JobQueue",
+    "get_job_queue",
+    "close_job_queue",
+    "reset_job_queue",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_LOW",
+]
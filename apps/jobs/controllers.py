@@ -0,0 +1,77 @@
+from typing import Annotated
+
+from fastapi import HTTPException, Path, Query, status
+
+from apps.auth.services import ProtectionDep
+from apps.jobs.routers import jobs_router
+from apps.jobs.schemas import JobInfo, JobsList, JobStatus
+from apps.jobs.services import get_job_queue
+
+
+@jobs_router.get("/", response_model=JobsList)
+async def read_jobs(
+    protection: ProtectionDep,
+    job_status: Annotated[
+        JobStatus | None, Query(alias="status", title="Состояние задач")
+    ] = None,
+    kind: Annotated[str | None, Query(title="Тип задач")] = None,
+    limit: Annotated[
+        int,
+        Query(title="Ограничитель списка", description="Максимум задач", ge=1, le=1000),
+    ] = 100,
+):
+    """
+    Эндпоинт получения последних фоновых задач и состояния очереди
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param job_status: Состояние задач
+    :param kind: Тип задач
+    :param limit: Максимальное количество задач
+    :return: Задачи от новых к старым, количество воркеров, выполняющихся и ожидающих задач
+    """
+    queue = get_job_queue()
+    jobs = [job.info() for job in queue.recent(job_status, kind, limit)]
+    return {"jobs": jobs, **queue.stats()}
+
+
+@jobs_router.get("/{job_id}", response_model=JobInfo)
+async def read_job(
+    job_id: Annotated[str, Path(title="Идентификатор задачи")],
+    protection: ProtectionDep,
+):
+    """
+    Эндпоинт получения состояния фоновой задачи
+    :param job_id: Параметр пути, обозначающий идентификатор задачи
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :return: Состояние, прогресс и результат задачи
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
+        )
+    return job.info()
+
+
+@jobs_router.delete("/{job_id}", response_model=JobInfo)
+async def cancel_job(
+    job_id: Annotated[str, Path(title="Идентификатор задачи")],
+    protection: ProtectionDep,
+):
+    """
+    Эндпоинт отмены фоновой задачи, ожидающей в очереди
+    :param job_id: Параметр пути, обозначающий идентификатор задачи
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :return: Состояние отмененной задачи
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
+        )
+    if not queue.cancel(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Отменить можно только задачу, ожидающую в очереди",
+        )
+    return job.info()
@@ -0,0 +1,5 @@
+from fastapi import APIRouter
+
+from apps.monitoring.services import TimedAPIRoute
+
+jobs_router = APIRouter(tags=["Фоновые задачи"], route_class=TimedAPIRoute)
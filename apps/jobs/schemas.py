@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+from pydantic.alias_generators import to_camel
+
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class JobInfo(BaseModel):
+    id: str = Field(title="Идентификатор задачи")
+    kind: str = Field(title="Тип задачи", description="Например: users_import")
+    status: JobStatus = Field(title="Состояние задачи")
+    priority: int = Field(
+        title="Приоритет", description="Меньшее значение выполняется раньше"
+    )
+    attempts: int = Field(title="Количество запусков")
+    progress: dict[str, int] = Field(
+        title="Прогресс", description="Счетчики обработанных элементов"
+    )
+    result: Any = Field(default=None, title="Результат выполнения")
+    error: str | None = Field(default=None, title="Ошибка выполнения")
+    created_at: datetime = Field(title="Время создания")
+    started_at: datetime | None = Field(default=None, title="Время запуска")
+    finished_at: datetime | None = Field(default=None, title="Время завершения")
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class JobAccepted(BaseModel):
+    job_id: str = Field(title="Идентификатор задачи")
+    status_url: str = Field(title="Адрес для проверки состояния задачи")
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class JobsList(BaseModel):
+    jobs: list[JobInfo] = Field(title="Задачи", description="От новых к старым")
+    workers: int = Field(title="Количество воркеров очереди")
+    running: int = Field(title="Количество выполняющихся задач")
+    queued: int = Field(title="Количество задач в очереди")
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
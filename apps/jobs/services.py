@@ -0,0 +1,297 @@
+import asyncio
+import itertools
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+from settings.settings import get_settings
+
+logger = logging.getLogger("apps.jobs")
+
+# Приоритеты задач: меньшее значение выполняется раньше
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+class Job:
+    """
+    Фоновая задача. Функция задачи обновляет progress по ходу выполнения, клиент получает
+    состояние по идентификатору задачи
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        func: Callable[["Job"], Awaitable[Any]],
+        priority: int = PRIORITY_NORMAL,
+        retries: int = 0,
+        on_cancel: Callable[[], None] | None = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.priority = priority
+        self.retries = retries
+        self.attempts = 0
+        self.status = "queued"
+        self.progress: dict[str, int] = {}
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self._func = func
+        self._on_cancel = on_cancel
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач процесса с приоритетами. Задачи выполняют workers воркеров цикла событий,
+    поэтому одновременно выполняется не больше workers задач, а остальные ждут в порядке приоритета
+    и поступления. Упавшая задача перезапускается до retries раз с экспоненциальной задержкой.
+    Хранится не больше max_finished завершенных задач: самые старые из них удаляются.
+
+    Очередь и воркеры создаются при первой задаче в текущем цикле событий; если цикл сменился
+    (например, в тестах), они создаются заново, а ожидавшие задачи переносятся в новую очередь.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_finished: int = 1000,
+        retry_backoff: float = 0.5,
+        retry_backoff_max: float = 30,
+    ):
+        self.workers = workers
+        self.max_finished = max_finished
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._order = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.PriorityQueue | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._retry_handles: dict[str, asyncio.TimerHandle] = {}
+        self.running = 0
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[[Job], Awaitable[Any]],
+        priority: int = PRIORITY_NORMAL,
+        retries: int = 0,
+        on_cancel: Callable[[], None] | None = None,
+    ) -> Job:
+        """
+        Метод постановки задачи в очередь
+        :param kind: Тип задачи
+        :param func: Асинхронная функция задачи, принимающая объект Job
+        :param priority: Приоритет (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+        :param retries: Количество повторов при ошибке. Повторять можно только идемпотентные задачи
+        :param on_cancel: Функция освобождения ресурсов задачи, отмененной до запуска
+        :return: Созданная задача
+        """
+        job = Job(kind, func, priority, retries, on_cancel)
+        self._ensure_workers()  # До регистрации: при смене цикла задача не попадет в очередь дважды
+        self._jobs[job.id] = job
+        self._put(job)
+        return job
+
+    def _put(self, job: Job):
+        self._ensure_workers()
+        self._queue.put_nowait((job.priority, next(self._order), job))
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        # Отложенные повторы привязаны к прежнему циклу: задачи ставятся в очередь сразу
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        self.running = 0
+        for job in self._jobs.values():
+            if job.status == "queued":
+                self._queue.put_nowait((job.priority, next(self._order), job))
+            elif job.status == "running":
+                # Воркер прежнего цикла уже не завершит задачу
+                job.status = "failed"
+                job.error = "Задача прервана остановкой цикла событий"
+                job.finished_at = datetime.now(timezone.utc)
+        self._worker_tasks = [
+            loop.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != "queued":
+                continue  # Отменена, пока ждала в очереди
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        try:
+            job.result = await job._func(job)
+            job.status = "succeeded"
+            job.error = None
+        except Exception as e:
+            job.error = str(e)
+            if job.attempts <= job.retries:
+                job.status = "queued"
+                delay = min(
+                    self.retry_backoff * 2 ** (job.attempts - 1), self.retry_backoff_max
+                )
+                logger.warning(
+                    "Повтор фоновой задачи",
+                    extra={"event": "job_retry", "job_id": job.id, "kind": job.kind},
+                )
+                self._retry_handles[job.id] = self._loop.call_later(
+                    delay, self._retry, job
+                )
+                return
+            job.status = "failed"
+            logger.exception(
+                "Ошибка фоновой задачи",
+                extra={"event": "job_failed", "job_id": job.id, "kind": job.kind},
+            )
+        job.finished_at = datetime.now(timezone.utc)
+        self._trim()
+
+    def _retry(self, job: Job):
+        self._retry_handles.pop(job.id, None)
+        if job.status == "queued":
+            self._queue.put_nowait((job.priority, next(self._order), job))
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def recent(
+        self, status: str | None = None, kind: str | None = None, limit: int = 100
+    ) -> list[Job]:
+        """
+        Метод получения последних задач
+        :param status: Состояние задач
+        :param kind: Тип задач
+        :param limit: Максимальное количество задач
+        :return: Задачи от новых к старым
+        """
+        jobs = []
+        for job in reversed(self._jobs.values()):
+            if (status is None or job.status == status) and (
+                kind is None or job.kind == kind
+            ):
+                jobs.append(job)
+                if len(jobs) >= limit:
+                    break
+        return jobs
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Метод отмены задачи, ожидающей в очереди. Выполняющиеся задачи не прерываются
+        :param job_id: Идентификатор задачи
+        :return: True, если задача отменена
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status != "queued":
+            return False
+        job.status = "cancelled"
+        job.finished_at = datetime.now(timezone.utc)
+        if job._on_cancel is not None:
+            job._on_cancel()
+        self._trim()
+        return True
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": sum(job.status == "queued" for job in self._jobs.values()),
+        }
+
+    async def close(self):
+        """
+        Метод остановки воркеров при остановке приложения. Выполняющиеся задачи прерываются
+        """
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._loop = None
+
+
+_job_queue: JobQueue | None = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Функция получения очереди фоновых задач приложения. Создается при первом обращении
+    с параметрами из настроек
+    :return: Очередь задач
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                settings = get_settings()
+                _job_queue = JobQueue(
+                    workers=settings.JOBS_WORKERS,
+                    max_finished=settings.JOBS_MAX_FINISHED,
+                    retry_backoff=settings.JOBS_RETRY_BACKOFF,
+                )
+    return _job_queue
+
+
+async def close_job_queue():
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.close()
+        _job_queue = None
+
+
+def reset_job_queue():
+    """
+    Функция сброса очереди фоновых задач. Следующее обращение создаст очередь заново по настройкам
+    """
+    global _job_queue
+    _job_queue = None
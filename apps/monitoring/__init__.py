@@ -0,0 +1,32 @@
+from apps.monitoring.routers import monitoring_router
+from apps.monitoring.profiler import profiler, SamplingProfiler
+from apps.monitoring.blocking import BlockingDetector
+from apps.monitoring.admission import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionLimiter,
+    AdmissionRejected,
+)
+from apps.monitoring.services import (
+    timed,
+    timed_stage,
+    format_server_timing,
+    ServerTimingMiddleware,
+    TimedAPIRoute,
+)
+
+__all__ = [
+    "monitoring_router",
+    "profiler",
+    "SamplingProfiler",
+    "BlockingDetector",
+    "AdmissionControlMiddleware",
+    "AdmissionController",
+    "AdmissionLimiter",
+    "AdmissionRejected",
+    "timed",
+    "timed_stage",
+    "format_server_timing",
+    "ServerTimingMiddleware",
+    "TimedAPIRoute",
+]
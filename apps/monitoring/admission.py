@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import math
+import threading
+from collections import deque
+from time import perf_counter
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from apps.monitoring.services import timed
+from settings.settings import get_settings
+
+logger = logging.getLogger("apps.monitoring")
+
+ROUTE_CLASSES = ("auth", "user_read", "user_write", "integration")
+# POST-маршруты, которые только читают данные (тело запроса - список идентификаторов)
+READ_ONLY_POST_PATHS = {"/protected_user/users/batch"}
+
+
+class AdmissionRejected(Exception):
+    """Запрос отклонен: очередь класса маршрутов заполнена или ожидание в ней истекло"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Ограничитель одновременных запросов одного класса маршрутов. Не больше concurrency запросов
+    выполняются одновременно, остальные ждут в очереди FIFO длиной queue_size не дольше
+    queue_timeout секунд. Запрос, для которого нет места в очереди, отклоняется сразу.
+    Освободившийся слот передается первому ожидающему напрямую, без гонки с новыми запросами.
+    """
+
+    def __init__(
+        self, name: str, concurrency: int, queue_size: int, queue_timeout: float
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # Скользящее среднее длительности обработки, по нему оценивается Retry-After
+        self.service_time = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """
+        Метод оценки времени, через которое имеет смысл повторить запрос
+        :return: Количество секунд, не меньше 1
+        """
+        estimate = self.service_time * (self.queued + 1) / self.concurrency
+        return max(1, math.ceil(estimate))
+
+    async def acquire(self):
+        """
+        Метод получения слота. Если свободного слота нет, запрос ждет в очереди
+        :raises AdmissionRejected: Очередь заполнена или ожидание истекло
+        """
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected("queue_full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = perf_counter()
+        try:
+            with timed("admission"):
+                await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Слот передан этому запросу одновременно с истечением ожидания
+            else:
+                self._discard(waiter)
+            self.timed_out += 1
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Слот уже передан этому запросу
+            else:
+                self._discard(waiter)
+            raise
+        waited = perf_counter() - start
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.admitted += 1
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, duration: float | None = None):
+        """
+        Метод освобождения слота: слот передается первому ожидающему или освобождается
+        :param duration: Длительность обработки запроса в секундах
+        """
+        if duration is not None:
+            self.service_time += (duration - self.service_time) * 0.1
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> dict[str, float | int]:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queue_timeout_s": self.queue_timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_avg_ms": round(self.wait_total / max(self.admitted, 1) * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "service_time_ms": round(self.service_time * 1000, 3),
+        }
+
+
+def classify_request(scope: Scope) -> str | None:
+    """
+    Функция определения класса маршрута запроса
+    :param scope: ASGI scope запроса
+    :return: auth, user_read, user_write, integration или None для маршрутов без ограничений
+    (документация, мониторинг, фоновые задачи)
+    """
+    path = scope["path"]
+    if path.startswith("/auth/"):
+        return "auth"
+    if path.startswith("/integration/"):
+        return "integration"
+    if path.startswith(("/user/", "/protected_user/")):
+        if scope["method"] in ("GET", "HEAD") or (
+            scope["method"] == "POST" and path.rstrip("/") in READ_ONLY_POST_PATHS
+        ):
+            return "user_read"
+        return "user_write"
+    return None
+
+
+class AdmissionController:
+    """Набор ограничителей по классам маршрутов"""
+
+    def __init__(self, limiters: dict[str, AdmissionLimiter]):
+        self.limiters = limiters
+
+    @classmethod
+    def from_settings(cls, settings=None) -> "AdmissionController":
+        settings = settings or get_settings()
+        return cls(
+            {
+                name: AdmissionLimiter(
+                    name,
+                    getattr(settings, f"ADMISSION_{name.upper()}_CONCURRENCY"),
+                    getattr(settings, f"ADMISSION_{name.upper()}_QUEUE"),
+                    getattr(settings, f"ADMISSION_{name.upper()}_TIMEOUT"),
+                )
+                for name in ROUTE_CLASSES
+            }
+        )
+
+    def metrics(self) -> dict[str, dict[str, float | int]]:
+        return {name: limiter.metrics() for name, limiter in self.limiters.items()}
+
+
+_admission_controller: AdmissionController | None = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Функция получения ограничителей приложения. Создаются при первом обращении по настройкам
+    :return: Набор ограничителей
+    """
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController.from_settings()
+    return _admission_controller
+
+
+def reset_admission_controller(controller: AdmissionController | None = None):
+    global _admission_controller
+    _admission_controller = controller
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware управления допуском запросов. Для каждого класса маршрутов (auth, user_read,
+    user_write, integration) свой бюджет одновременных запросов и своя очередь, поэтому перегрузка
+    одного класса (например, вход с bcrypt) не замедляет остальные. Если очередь заполнена или
+    ожидание истекло, сразу возвращается 503 с заголовком Retry-After. Время ожидания в очереди
+    (если запрос ждал) попадает в Server-Timing как этап admission. Включается настройкой
+    ADMISSION_ENABLED.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        enabled: bool | None = None,
+        controller: AdmissionController | None = None,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.enabled is None:
+            self.enabled = get_settings().ADMISSION_ENABLED
+        route_class = classify_request(scope) if scope["type"] == "http" else None
+        if not self.enabled or route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller or get_admission_controller()
+        limiter = controller.limiters[route_class]
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            logger.warning(
+                "Запрос отклонен управлением допуском",
+                extra={
+                    "event": "admission_rejected",
+                    "route_class": route_class,
+                    "reason": e.reason,
+                    "path": scope["path"],
+                },
+            )
+            response = JSONResponse(
+                {"detail": "Сервер перегружен, повторите запрос позже"},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(perf_counter() - start)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass
+
+logger = logging.getLogger("apps.monitoring")
+
+# Корень проекта: кадры из этих файлов считаются местом вызова блокирующего кода
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+MONITORING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class BlockingCallSite:
+    """Статистика блокировок цикла событий для одного места вызова"""
+
+    call_site: str
+    count: int = 0
+    max_ms: float = 0.0
+    stack: str = ""
+
+
+def find_call_site(frame) -> str:
+    """
+    Функция поиска места вызова блокирующего кода: ближайший к вершине стека кадр из кода проекта
+    (кроме самого мониторинга). Если такого кадра нет, используется вершина стека.
+    :param frame: Кадр вершины стека потока цикла событий
+    :return: Строка вида "apps/user/controllers.py:23 create_user"
+    """
+    innermost = frame
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PROJECT_ROOT) and not filename.startswith(
+            MONITORING_DIR
+        ):
+            return (
+                f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} "
+                f"{frame.f_code.co_qualname}"
+            )
+        frame = frame.f_back
+    code = innermost.f_code
+    return f"{code.co_filename}:{innermost.f_lineno} {code.co_qualname}"
+
+
+class BlockingDetector:
+    """
+    Детектор блокировок цикла событий синхронным кодом. Цикл событий периодически обновляет
+    метку времени (heartbeat), сторожевой поток проверяет ее. Если метка не обновлялась дольше
+    порога, снимается стек потока цикла событий и блокировка учитывается для места вызова.
+    Не подменяет внутренности asyncio, поэтому работает и с uvloop.
+    """
+
+    def __init__(self, threshold: float = 0.1):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.call_sites: dict[str, BlockingCallSite] = {}
+        self._last_beat = time.monotonic()
+        self._blocked_site: str | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat: asyncio.TimerHandle | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._watchdog is not None and self._watchdog.is_alive()
+
+    def start(self):
+        """
+        Функция запуска детектора для текущего цикла событий
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._beat()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="blocking-detector", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self):
+        """
+        Функция остановки детектора
+        """
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def _beat(self):
+        now = time.monotonic()
+        blocked_for = now - self._last_beat - self.interval
+        self._last_beat = now
+        if self._blocked_site is not None:
+            with self._lock:
+                site = self.call_sites[self._blocked_site]
+                site.max_ms = max(site.max_ms, blocked_for * 1000)
+            logger.warning(
+                "Цикл событий заблокирован на %.1f мс: %s",
+                blocked_for * 1000,
+                self._blocked_site,
+            )
+            self._blocked_site = None
+        if not self._stopped.is_set():
+            self._heartbeat = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+            if blocked_for < self.threshold or self._blocked_site is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            call_site = find_call_site(frame)
+            stack = "".join(traceback.format_stack(frame))
+            with self._lock:
+                site = self.call_sites.setdefault(
+                    call_site, BlockingCallSite(call_site)
+                )
+                site.count += 1
+                site.max_ms = max(site.max_ms, blocked_for * 1000)
+                site.stack = stack
+            self._blocked_site = call_site
+
+    def report(self) -> list[BlockingCallSite]:
+        """
+        Функция получения статистики блокировок по местам вызова
+        :return: Список мест вызова, отсортированный по количеству блокировок
+        """
+        with self._lock:
+            return sorted(self.call_sites.values(), key=lambda site: -site.count)
+
+    def counts(self) -> Counter:
+        """
+        Функция получения количества блокировок по местам вызова
+        """
+        with self._lock:
+            return Counter(
+                {site.call_site: site.count for site in self.call_sites.values()}
+            )
+
+
+# Детектор создается в lifespan приложения, если включен настройкой BLOCKING_DETECTOR_ENABLED
+blocking_detector: BlockingDetector | None = None
+
+
+def start_blocking_detector(threshold: float) -> BlockingDetector:
+    """
+    Функция создания и запуска детектора блокировок для текущего цикла событий
+    :param threshold: Порог блокировки в секундах
+    :return: Запущенный детектор
+    """
+    global blocking_detector
+    blocking_detector = BlockingDetector(threshold)
+    blocking_detector.start()
+    return blocking_detector
+
+
+def stop_blocking_detector():
+    """
+    Функция остановки детектора блокировок, если он был запущен
+    """
+    global blocking_detector
+    if blocking_detector is not None:
+        blocking_detector.stop()
+        blocking_detector = None
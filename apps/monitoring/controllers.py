@@ -0,0 +1,86 @@
+import time
+from typing import Annotated
+
+from fastapi import HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from apps.auth.services import ProtectionDep
+from apps.monitoring import blocking
+from apps.monitoring.admission import get_admission_controller
+from apps.monitoring.profiler import profiler
+from apps.monitoring.routers import monitoring_router
+from settings.settings import SettingsDep
+
+
+@monitoring_router.get("/profile", response_class=PlainTextResponse)
+async def profile_event_loop(
+    protection: ProtectionDep,
+    settings: SettingsDep,
+    seconds: Annotated[
+        float,
+        Query(
+            title="Длительность профилирования", description="В секундах", gt=0, le=60
+        ),
+    ] = 5,
+    interval_ms: Annotated[
+        float,
+        Query(
+            title="Интервал сэмплирования", description="В миллисекундах", ge=1, le=100
+        ),
+    ] = 5,
+):
+    """
+    Эндпоинт сэмплирующего профилирования цикла событий под реальной нагрузкой. Включается настройкой
+    PROFILER_ENABLED.
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param settings: Объект-настройки для взаимодействия с переменными окружения из .env-файла
+    :param seconds: Длительность профилирования
+    :param interval_ms: Интервал между сэмплами стека
+    :return: Файл со свернутыми стеками (flamegraph) и задержкой цикла событий в заголовках
+    """
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    try:
+        result = await profiler.profile(seconds, interval=interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    headers = {
+        "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.collapsed"',
+        "X-Profile-Samples": str(result.samples),
+        "X-Event-Loop-Lag-Max-Ms": f"{result.loop_lag.max_ms:.2f}",
+        "X-Event-Loop-Lag-Mean-Ms": f"{result.loop_lag.mean_ms:.2f}",
+        "X-Event-Loop-Lag-P99-Ms": f"{result.loop_lag.p99_ms:.2f}",
+    }
+    return PlainTextResponse(result.collapsed(), headers=headers)
+
+
+@monitoring_router.get("/blocking")
+async def read_blocking_call_sites(protection: ProtectionDep):
+    """
+    Эндпоинт статистики блокировок цикла событий синхронным кодом. Детектор включается настройкой
+    BLOCKING_DETECTOR_ENABLED.
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :return: Порог блокировки и список мест вызова с количеством блокировок и последним стеком
+    """
+    detector = blocking.blocking_detector
+    if detector is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return {
+        "threshold_ms": detector.threshold * 1000,
+        "call_sites": detector.report(),
+    }
+
+
+@monitoring_router.get("/admission")
+async def read_admission_metrics(protection: ProtectionDep, settings: SettingsDep):
+    """
+    Эндпоинт метрик управления допуском по классам маршрутов: бюджет, выполняющиеся и ожидающие
+    запросы, количество допущенных, отклоненных и не дождавшихся запросов, время ожидания в очереди
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param settings: Объект-настройки для взаимодействия с переменными окружения из .env-файла
+    :return: Признак включения и метрики каждого класса маршрутов
+    """
+    return {
+        "enabled": settings.ADMISSION_ENABLED,
+        "route_classes": get_admission_controller().metrics(),
+    }
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("apps.monitoring")
+
+
+@dataclass
+class LoopLagStats:
+    """Статистика задержки цикла событий в миллисекундах"""
+
+    samples: list[float] = field(default_factory=list)
+
+    @property
+    def max_ms(self) -> float:
+        return max(self.samples, default=0.0)
+
+    @property
+    def mean_ms(self) -> float:
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    @property
+    def p99_ms(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+@dataclass
+class ProfileResult:
+    """Результат профилирования: свернутые стеки и задержка цикла событий"""
+
+    stacks: Counter
+    loop_lag: LoopLagStats
+    samples: int
+
+    def collapsed(self) -> str:
+        """
+        Функция формирования свернутых стеков в формате flamegraph.pl / speedscope:
+        одна строка на стек, "кадр;кадр;кадр количество"
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def top_functions(self, limit: int = 10) -> list[tuple[str, int]]:
+        """
+        Функция подсчета самых горячих функций по собственному времени (вершина стека)
+        :param limit: Количество функций
+        :return: Список пар (функция, количество сэмплов)
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_thread(
+    thread_id: int, duration: float, interval: float
+) -> tuple[Counter, int]:
+    """
+    Функция сэмплирования стека потока. Выполняется в отдельном потоке и с заданным
+    интервалом снимает стек целевого потока через sys._current_frames().
+    :param thread_id: Идентификатор профилируемого потока (поток цикла событий)
+    :param duration: Длительность профилирования в секундах
+    :param interval: Интервал между сэмплами в секундах
+    :return: Счетчик свернутых стеков и количество сэмплов
+    """
+    stacks = Counter()
+    samples = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+            samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+async def probe_loop_lag(duration: float, interval: float) -> LoopLagStats:
+    """
+    Функция измерения задержки цикла событий: периодически засыпает на interval и замеряет,
+    насколько позже запланированного цикл событий вернул управление.
+    :param duration: Длительность измерения в секундах
+    :param interval: Период проверки в секундах
+    :return: Статистика задержки цикла событий
+    """
+    loop = asyncio.get_running_loop()
+    stats = LoopLagStats()
+    deadline = loop.time() + duration
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stats.samples.append(max(0.0, loop.time() - start - interval) * 1000)
+    return stats
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик цикла событий. Одновременно может выполняться только
+    одно профилирование.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(
+        self, duration: float, interval: float = 0.005, lag_interval: float = 0.01
+    ) -> ProfileResult:
+        """
+        Функция профилирования текущего цикла событий
+        :param duration: Длительность профилирования в секундах
+        :param interval: Интервал сэмплирования стека в секундах
+        :param lag_interval: Период проверки задержки цикла событий в секундах
+        :return: Результат профилирования
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Профилирование уже выполняется")
+        try:
+            thread_id = threading.get_ident()
+            (stacks, samples), loop_lag = await asyncio.gather(
+                asyncio.to_thread(sample_thread, thread_id, duration, interval),
+                probe_loop_lag(duration, lag_interval),
+            )
+            return ProfileResult(stacks=stacks, loop_lag=loop_lag, samples=samples)
+        finally:
+            self._lock.release()
+
+    async def profile_to_file(self, duration: float, output_dir: str) -> str:
+        """
+        Функция профилирования с сохранением свернутых стеков в файл. Используется
+        обработчиком сигнала.
+        :param duration: Длительность профилирования в секундах
+        :param output_dir: Каталог для файла профиля
+        :return: Путь к файлу профиля
+        """
+        result = await self.profile(duration)
+        path = os.path.join(
+            output_dir, f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+        )
+        await asyncio.to_thread(_write_text, path, result.collapsed())
+        logger.warning(
+            "Профиль сохранен: %s, сэмплов %s, задержка цикла событий max %.1f мс, "
+            "p99 %.1f мс, горячие функции: %s",
+            path,
+            result.samples,
+            result.loop_lag.max_ms,
+            result.loop_lag.p99_ms,
+            result.top_functions(5),
+        )
+        return path
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w") as file:
+        file.write(text)
+
+
+profiler = SamplingProfiler()
+
+
+def install_profiler_signal(signum: int, duration: float, output_dir: str):
+    """
+    Функция регистрации обработчика сигнала, запускающего профилирование на duration секунд
+    с сохранением профиля в output_dir. Вызывается в lifespan приложения.
+    :param signum: Номер сигнала, например signal.SIGUSR2
+    :param duration: Длительность профилирования в секундах
+    :param output_dir: Каталог для файлов профиля
+    """
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    def handler():
+        if profiler.running:
+            logger.warning("Профилирование уже выполняется, сигнал пропущен")
+            return
+        task = loop.create_task(profiler.profile_to_file(duration, output_dir))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    loop.add_signal_handler(signum, handler)
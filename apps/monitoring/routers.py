@@ -0,0 +1,7 @@
+from fastapi import APIRouter
+
+from apps.monitoring.services import TimedAPIRoute
+
+monitoring_router = APIRouter(
+    tags=["Мониторинг и профилирование"], route_class=TimedAPIRoute
+)
@@ -0,0 +1,184 @@
+import functools
+import inspect
+import logging
+from contextlib import nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings.settings import get_settings
+
+logger = logging.getLogger("apps.monitoring")
+
+# Длительности этапов текущего запроса (в секундах). None, если инструментирование выключено
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+# Служебный ключ: момент завершения функции эндпоинта, от него отсчитывается сериализация
+_ENDPOINT_DONE = "_endpoint_done"
+
+_NOOP_STAGE = nullcontext()
+
+
+class _Stage:
+    """Контекстный менеджер, добавляющий длительность блока к этапу запроса"""
+
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: dict[str, float], name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + duration
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def timed(stage: str):
+    """
+    Функция замера этапа обработки запроса. Используется как синхронный или асинхронный
+    контекстный менеджер. Если инструментирование выключено, возвращает пустой контекст.
+    :param stage: Название этапа (db_connect, jwt, db, bcrypt, serialize)
+    :return: Контекстный менеджер
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        return _NOOP_STAGE
+    return _Stage(timings, stage)
+
+
+def timed_stage(stage: str):
+    """
+    Декоратор асинхронной функции, замеряющий ее выполнение как этап обработки запроса
+    :param stage: Название этапа
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed(stage):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def format_server_timing(timings: dict[str, float], total: float) -> str:
+    """
+    Функция формирования значения заголовка Server-Timing
+    :param timings: Длительности этапов в секундах
+    :param total: Общая длительность обработки запроса в секундах
+    :return: Значение заголовка, например "jwt;dur=0.12, db;dur=50.3, total;dur=51.0"
+    """
+    metrics = [
+        f"{name};dur={duration * 1000:.2f}"
+        for name, duration in timings.items()
+        if not name.startswith("_")
+    ]
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware, замеряющее этапы обработки запроса. Добавляет заголовок Server-Timing и
+    пишет структурированную строку лога. Включается настройкой SERVER_TIMING_ENABLED,
+    в выключенном состоянии только передает запрос дальше.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: bool | None = None):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.enabled is None:
+            self.enabled = get_settings().SERVER_TIMING_ENABLED
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = perf_counter()
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                total = perf_counter() - start
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", format_server_timing(timings, total))
+                log_record = {
+                    "event": "server_timing",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": message["status"],
+                    "total_ms": round(total * 1000, 2),
+                }
+                log_record.update(
+                    (f"{name}_ms", round(duration * 1000, 2))
+                    for name, duration in timings.items()
+                    if not name.startswith("_")
+                )
+                logger.info("server_timing", extra=log_record)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+
+
+def _mark_endpoint_done(endpoint):
+    """
+    Декоратор эндпоинта, запоминающий момент завершения функции эндпоинта
+    """
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = _request_timings.get()
+            if timings is not None:
+                timings[_ENDPOINT_DONE] = perf_counter()
+
+    return wrapper
+
+
+class TimedAPIRoute(APIRoute):
+    """
+    Класс маршрута, замеряющий этап serialize: время от завершения функции эндпоинта
+    до готового ответа (валидация response_model и рендеринг JSON)
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _request_timings.get()
+            if timings is not None and _ENDPOINT_DONE in timings:
+                duration = perf_counter() - timings.pop(_ENDPOINT_DONE)
+                timings["serialize"] = timings.get("serialize", 0.0) + duration
+            return response
+
+        return timed_handler
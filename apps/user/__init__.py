@@ -1,11 +1,16 @@
 from apps.user.routers import user_router, check_if_user_authorized
-from apps.user.services import ConnectionDep
+from apps.user.services import ConnectionDep, UsersStoreDep
+from apps.user.repository import UsersStore, get_users_store, reset_users_store
 from apps.user.services import get_connection, AsyncDatabaseConnection
 from apps.user.schemas import UserPublic, User, UserCreate
 
 __all__ = [
     "user_router",
     "ConnectionDep",
+    "UsersStoreDep",
+    "UsersStore",
+    "get_users_store",
+    "reset_users_store",
     "get_connection",
     "AsyncDatabaseConnection",
     "UserPublic",
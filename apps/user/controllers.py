@@ -1,10 +1,58 @@
 from apps.user.routers import user_router, middleware_protected_app
-from apps.user.schemas import UserPublic, UserCreate, User, UserUpdate
-from apps.user.services import ConnectionDep
-from fastapi import Form, Query, Path, HTTPException, Body
+from apps.user.schemas import (
+    UserPublic,
+    UserCreate,
+    User,
+    UserUpdate,
+    UserBulkUpdate,
+    UsersBatch,
+    UsersUpdated,
+    UserPublicListAdapter,
+)
+from apps.user.services import (
+    ConnectionDep,
+    cached_json_response,
+)
+from apps.user.imports import (
+    detect_format,
+    save_upload,
+    import_users_file,
+    create_users_job,
+)
+from apps.jobs.schemas import JobAccepted
+from apps.jobs.services import get_job_queue, PRIORITY_LOW, PRIORITY_NORMAL
+from settings.settings import get_settings
+import os
+from fastapi import (
+    Form,
+    Query,
+    Path,
+    HTTPException,
+    Body,
+    Request,
+    File,
+    UploadFile,
+    status,
+)
 from fastapi.exceptions import ResponseValidationError
-from typing import Annotated, Union
-from apps.auth.services import pwd_context, ProtectionDep
+from typing import Annotated, Any, Literal, Union
+from apps.auth.services import hash_password, ProtectionDep
+
+
+def to_user_changes(
+    user: UserUpdate, exclude: set[str] | None = None
+) -> dict[str, Any]:
+    """
+    Функция получения словаря изменений пользователя: только переданные поля, пароль заменяется хешем
+    :param user: Данные о пользователе, валидированные моделью UserUpdate
+    :param exclude: Поля, не попадающие в изменения
+    :return: Словарь изменяемых полей
+    """
+    changes = user.model_dump(exclude_unset=True, exclude=exclude)
+    password = changes.pop("password", None)
+    if password:
+        changes["hashed_password"] = hash_password(password)
+    return changes
 
 
 @user_router.post("/user/")
@@ -20,7 +68,7 @@ async def create_user(
     """
     try:
         user_dict = user.model_dump()
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = hash_password(user.password)
         extra_data = {"hashed_password": hashed_password}
         user_dict.update(extra_data)
         user_model = User.model_validate(user_dict)
@@ -30,63 +78,168 @@ async def create_user(
         return {"message": f"something_went_wrong...{e}"}
 
 
-@user_router.post("/users/")
+@user_router.post(
+    "/users/", status_code=status.HTTP_202_ACCEPTED, response_model=JobAccepted
+)
 async def create_users(
-    users: Annotated[list[UserCreate], Body()],
+    users: Annotated[list[Any], Body()],
     connection: ConnectionDep,
     protection: ProtectionDep,
 ):
     """
-    Эндпоинт создания группы пользователей
+    Эндпоинт создания группы пользователей. Хэширование паролей выполняется фоновой задачей, а не
+    в запросе: пакет валидируется целиком за один проход, строки с ошибками не прерывают создание
+    остальных пользователей и возвращаются в поле errors результата задачи.
     :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя.
     :param users: Список пользователей, пришедших из тела запроса
     :param connection: Объект типа Connection (соединение) для взаимодействия с БД
-    :return: JSON-объект, сообщающий о результате выполнения эндпоинта и возвращающий список пользователей
+    :return: Идентификатор задачи создания пользователей и адрес для проверки ее состояния
     """
-    try:
-        if protection:
-            list_of_users = []
-            for user in users:
-                user_dict = user.model_dump()
-                if user.password:
-                    hashed_password = pwd_context.hash(user.password)
-                    extra_data = {"hashed_password": hashed_password}
-                    user_dict.update(extra_data)
-                list_of_users.append(user_dict)
-                user_model = User.model_validate(user_dict)
-                await connection.create_user(user_model)
-            return {"users_created": f"Пользователи созданы!: {list_of_users}"}
+    store, latency = connection.store, connection.latency
+    job = get_job_queue().submit(
+        "users_create",
+        lambda job: create_users_job(job, users, store, latency),
+        priority=PRIORITY_NORMAL,
+        retries=get_settings().JOBS_RETRIES,
+    )
+    return {"job_id": job.id, "status_url": f"/jobs/{job.id}"}
 
-    except Exception as e:
-        return {"message": f"Произошла ошибка: {e}"}
+
+@user_router.post(
+    "/users/import", status_code=status.HTTP_202_ACCEPTED, response_model=JobAccepted
+)
+async def import_users(
+    file: Annotated[
+        UploadFile, File(description="Файл с пользователями в формате CSV или NDJSON")
+    ],
+    connection: ConnectionDep,
+    protection: ProtectionDep,
+    file_format: Annotated[
+        Literal["csv", "ndjson"] | None,
+        Query(
+            alias="format",
+            title="Формат файла",
+            description="По умолчанию определяется по расширению или типу содержимого",
+        ),
+    ] = None,
+):
+    """
+    Эндпоинт импорта пользователей из файла CSV (строка заголовков с именами полей) или NDJSON
+    (объект пользователя в каждой строке). Файл сохраняется, импорт выполняется фоновой задачей:
+    строки читаются и валидируются пакетами, пароли хэшируются в пуле потоков, пользователи
+    добавляются пакетами. Прогресс и ошибки по строкам доступны по идентификатору задачи.
+    :param file: Загруженный файл
+    :param connection: Объект типа Connection (соединение) для взаимодействия с БД
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param file_format: Формат файла
+    :return: Идентификатор задачи импорта и адрес для проверки ее состояния
+    """
+    file_format = file_format or detect_format(file.filename, file.content_type)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Поддерживаются файлы CSV и NDJSON",
+        )
+    path = await save_upload(file)
+    store, latency = connection.store, connection.latency
+    # Импорт не идемпотентен (пакеты добавляются по мере чтения), поэтому не повторяется
+    job = get_job_queue().submit(
+        "users_import",
+        lambda job: import_users_file(job, path, file_format, store, latency),
+        priority=PRIORITY_LOW,
+        on_cancel=lambda: os.unlink(path),
+    )
+    return {"job_id": job.id, "status_url": f"/jobs/{job.id}"}
 
 
 @middleware_protected_app.get(
     "/users/{user_id}", response_model=Union[UserPublic, dict]
 )
 async def read_user(
+    request: Request,
     connection: ConnectionDep,
     user_id: Annotated[int, Path(title="Идентификатор пользователя", ge=0, le=1000)],
 ):
     """
-    Эндпоинт получения конкретного пользователя по идентификатору из БД.
+    Эндпоинт получения конкретного пользователя по идентификатору из БД. Ответ содержит ETag версии
+    пользователя: на запрос с совпадающим If-None-Match возвращается 304 без чтения и сериализации.
+    :param request: Запрос, из которого берется заголовок If-None-Match
     :param connection: Объект типа Connection (соединение) для взаимодействия с БД
     :param user_id: Параметр пути, обозначающий идентификатор искомого пользователя.
     :return: Объект пользователь, валидируемый моделью UserPublic
     """
-    try:
+
+    async def serialize():
         user_dict = await connection.read_user_by_id(user_id)
         if not user_dict:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
-        return user_dict
+        return (
+            UserPublic.model_validate(user_dict).model_dump_json(by_alias=True).encode()
+        )
+
+    try:
+        etag = connection.user_etag(user_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        return await cached_json_response(request, f"user:{user_id}", etag, serialize)
     except ResponseValidationError:
         return {"message": "Фастапи ругается на какую-то &$*^ю"}
     except Exception as e:
         return {"message": f"something_went_wrong...{e}"}
 
 
+@middleware_protected_app.get("/users/", response_model=Union[UsersBatch, dict])
+async def read_users_by_ids(
+    connection: ConnectionDep,
+    ids: Annotated[
+        list[int],
+        Query(
+            title="Идентификаторы пользователей",
+            description="Список ID искомых пользователей: ?ids=1&ids=2",
+            min_length=1,
+            max_length=1000,
+        ),
+    ],
+):
+    """
+    Эндпоинт получения группы пользователей по списку идентификаторов одним запросом.
+    :param connection: Объект типа Connection (соединение) для взаимодействия с БД
+    :param ids: Параметр запроса со списком идентификаторов искомых пользователей.
+    :return: Найденные пользователи, валидируемые моделью UserPublic, и список отсутствующих ID
+    """
+    try:
+        found, missing = await connection.read_users_by_ids(ids)
+        return {"found": found, "missing": missing}
+    except Exception as e:
+        return {"message": f"something_went_wrong...{e}"}
+
+
+@middleware_protected_app.post("/users/batch", response_model=Union[UsersBatch, dict])
+async def read_users_batch(
+    connection: ConnectionDep,
+    ids: Annotated[
+        list[int],
+        Body(
+            title="Идентификаторы пользователей",
+            description="Список ID искомых пользователей",
+            min_length=1,
+            max_length=10000,
+        ),
+    ],
+):
+    """
+    Эндпоинт получения группы пользователей по списку идентификаторов из тела запроса. Подходит
+    для длинных списков, которые не помещаются в строку запроса.
+    :param connection: Объект типа Connection (соединение) для взаимодействия с БД
+    :param ids: Список идентификаторов искомых пользователей
+    :return: Найденные пользователи, валидируемые моделью UserPublic, и список отсутствующих ID
+    """
+    return await read_users_by_ids(connection, ids)
+
+
 @user_router.get("/users/", response_model=Union[list[UserPublic], dict])
 async def read_users_list(
+    request: Request,
     connection: ConnectionDep,
     protection: ProtectionDep,
     start_index: Annotated[
@@ -109,17 +262,90 @@ async def read_users_list(
     ] = None,
 ):
     """
-    Эндпоинт получения списка пользователей по списку ID.
+    Эндпоинт получения списка пользователей по списку ID. Ответ содержит ETag версии хранилища:
+    на запрос с совпадающим If-None-Match возвращается 304 без чтения и сериализации.
+    :param request: Запрос, из которого берется заголовок If-None-Match
     :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
     :param connection: Объект типа Connection (соединение) для взаимодействия с БД
     :param start_index: Значение ID, с которого начинается поиск пользователей
     :param end_index: Значение ID, которым заканчивается поиск пользователей
     :return: Список пользователей, валидированных моделью UserPublic
     """
+
+    async def serialize():
+        users_list = await connection.read_users(start_index, end_index)
+        return UserPublicListAdapter.dump_json(
+            UserPublicListAdapter.validate_python(users_list), by_alias=True
+        )
+
+    try:
+        if protection:
+            return await cached_json_response(
+                request,
+                f"users:{start_index}:{end_index}",
+                connection.store_etag(),
+                serialize,
+            )
+    except Exception as e:
+        return {"message": f"Возникла ошибка: {e}"}
+
+
+@user_router.get("/users/search", response_model=Union[list[UserPublic], dict])
+async def search_users(
+    connection: ConnectionDep,
+    protection: ProtectionDep,
+    age_min: Annotated[
+        int | None, Query(title="Минимальный возраст", description="Включительно", gt=0)
+    ] = None,
+    age_max: Annotated[
+        int | None,
+        Query(title="Максимальный возраст", description="Включительно", gt=0),
+    ] = None,
+    is_supervisor: Annotated[
+        bool | None,
+        Query(title="Является ли админом", description="Признак суперпользователя"),
+    ] = None,
+    email_domain: Annotated[
+        str | None,
+        Query(title="Домен почты", description="Например: mail.com", min_length=1),
+    ] = None,
+    name_prefix: Annotated[
+        str | None,
+        Query(title="Начало имени", description="Без учета регистра", min_length=1),
+    ] = None,
+    limit: Annotated[
+        int,
+        Query(
+            title="Ограничитель списка",
+            description="Максимум результатов",
+            ge=1,
+            le=1000,
+        ),
+    ] = 100,
+):
+    """
+    Эндпоинт поиска пользователей по атрибутам. Фильтры объединяются по И и выполняются по индексам
+    хранилища, без просмотра всех пользователей.
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param connection: Объект типа Connection (соединение) для взаимодействия с БД
+    :param age_min: Минимальный возраст
+    :param age_max: Максимальный возраст
+    :param is_supervisor: Признак суперпользователя
+    :param email_domain: Домен электронной почты
+    :param name_prefix: Начало имени
+    :param limit: Максимальное количество результатов
+    :return: Список пользователей, валидированных моделью UserPublic
+    """
     try:
         if protection:
-            users_list = await connection.read_users(start_index, end_index)
-            return users_list
+            return await connection.search_users(
+                age_min=age_min,
+                age_max=age_max,
+                is_supervisor=is_supervisor,
+                email_domain=email_domain,
+                name_prefix=name_prefix,
+                limit=limit,
+            )
     except Exception as e:
         return {"message": f"Возникла ошибка: {e}"}
 
@@ -141,23 +367,41 @@ async def update_user(
     """
     try:
         if protection:
-            user_from_db = await connection.read_user_by_id(user_id)
+            user_from_db = await connection.update_user(user_id, to_user_changes(user))
             if not user_from_db:
                 raise HTTPException(status_code=404, detail="Пользователь не найден")
-            user_data = user.model_dump(exclude_unset=True)
-            extra_data = {}
-            if "password" in user_data:
-                password = user_data["password"]
-                hashed_password = pwd_context.hash(password)
-                extra_data["hashed_password"] = hashed_password
-            del user_data["password"]
-            user_from_db.update(user_data)
-            user_from_db.update(extra_data)
             return user_from_db
     except Exception as e:
         return {"message": f"Возникла ошибка: {e}"}
 
 
+@user_router.patch("/users/", response_model=Union[UsersUpdated, dict])
+async def update_users(
+    users: Annotated[list[UserBulkUpdate], Body(min_length=1)],
+    connection: ConnectionDep,
+    protection: ProtectionDep,
+):
+    """
+    Эндпоинт пакетного обновления данных о пользователях. Каждый элемент содержит id пользователя
+    и только изменяемые поля.
+    :param protection: Объект типа TokenData. Нужен для проверки авторизации пользователя
+    :param users: Список изменений, пришедших из тела запроса
+    :param connection: Объект типа Connection (соединение) для взаимодействия с БД
+    :return: Обновленные пользователи, валидируемые моделью UserPublic, и список отсутствующих ID
+    """
+    try:
+        if protection:
+            updates = {}
+            for user in users:
+                updates.setdefault(user.id, {}).update(
+                    to_user_changes(user, exclude={"id"})
+                )
+            updated, missing = await connection.update_users(updates)
+            return {"updated": updated, "missing": missing}
+    except Exception as e:
+        return {"message": f"Возникла ошибка: {e}"}
+
+
 @user_router.delete("/users/{user_id}")
 async def delete_user(
     user_id: Annotated[int, Path(title="Идентификатор пользователя", ge=0, le=1000)],
@@ -0,0 +1,223 @@
+import asyncio
+import csv
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Iterator
+
+from fastapi import UploadFile
+
+from apps.auth.services import hash_password
+from apps.jobs.services import Job
+from apps.user.services import (
+    AsyncDatabaseConnection,
+    to_stored_user,
+    validate_users_batch,
+)
+from settings.settings import get_settings
+
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def detect_format(filename: str | None, content_type: str | None) -> str | None:
+    """
+    Функция определения формата файла импорта по расширению имени или типу содержимого
+    :param filename: Имя загруженного файла
+    :param content_type: Тип содержимого части multipart
+    :return: "csv", "ndjson" или None, если формат не поддерживается
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in IMPORT_FORMATS:
+        return IMPORT_FORMATS[extension]
+    return IMPORT_FORMATS.get((content_type or "").split(";")[0].strip().lower())
+
+
+def iter_rows(file, file_format: str) -> Iterator[Any]:
+    """
+    Функция построчного чтения файла импорта. Файл читается буферизованно, в памяти находится
+    только текущая строка
+    :param file: Текстовый файл
+    :param file_format: Формат файла: csv или ndjson
+    :return: Итератор по строкам данных. Строка CSV - словарь, в котором пустые значения заменены
+    на None; строка NDJSON - разобранный JSON или исходный текст, если он некорректен (тогда
+    строка не пройдет валидацию и попадет в ошибки)
+    """
+    if file_format == "csv":
+        for row in csv.DictReader(file):
+            row.pop(None, None)  # Значения без заголовка столбца
+            yield {key: value if value != "" else None for key, value in row.items()}
+        return
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield line
+
+
+@lru_cache
+def get_hash_executor() -> ThreadPoolExecutor:
+    """
+    Функция получения пула потоков для хэширования паролей при импорте. bcrypt отпускает GIL,
+    поэтому хэширование выполняется параллельно и не блокирует цикл событий
+    :return: Пул потоков размером IMPORT_HASH_WORKERS (по умолчанию - число процессоров)
+    """
+    return ThreadPoolExecutor(
+        max_workers=get_settings().IMPORT_HASH_WORKERS or os.cpu_count() or 1,
+        thread_name_prefix="users-import-hash",
+    )
+
+
+def close_hash_executor():
+    if get_hash_executor.cache_info().currsize:
+        get_hash_executor().shutdown(wait=False, cancel_futures=True)
+        get_hash_executor.cache_clear()
+
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Функция хэширования группы паролей в пуле потоков импорта
+    :param passwords: Пароли
+    :return: Хеши паролей в том же порядке
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_hash_executor()
+    return await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, hash_password, password)
+            for password in passwords
+        )
+    )
+
+
+async def create_users_job(
+    job: Job, rows: list[Any], store, latency: float = 0.05
+) -> dict[str, Any]:
+    """
+    Функция фоновой задачи создания группы пользователей. Пакет валидируется целиком за один проход,
+    строки с ошибками не прерывают создание остальных пользователей и возвращаются в поле errors.
+    Пользователи добавляются одной операцией после хэширования всех паролей; при повторе задачи
+    уже добавленные пользователи пропускаются, поэтому задачу можно безопасно повторить при ошибке
+    :param job: Задача, в progress которой записываются счетчики rows, created и failed
+    :param rows: Список сырых данных пользователей из тела запроса
+    :param store: Хранилище пользователей
+    :param latency: Имитируемая задержка операций с БД
+    :return: Количество созданных и ошибочных строк, идентификаторы созданных пользователей
+    и ошибки по строкам. Данные пользователей (в том числе хеши паролей) в результат не попадают:
+    результат доступен через эндпоинты задач
+    """
+    valid_users, errors = validate_users_batch(rows)
+    job.progress.update(rows=len(rows), created=0, failed=len(errors))
+    hashed_passwords = await hash_passwords([user.password for user in valid_users])
+    list_of_users = [
+        to_stored_user(user, hashed_password)
+        for user, hashed_password in zip(valid_users, hashed_passwords)
+    ]
+    async with AsyncDatabaseConnection(
+        get_settings().db_url, store, latency
+    ) as connection:
+        if job.attempts > 1:
+            # Повтор задачи: пользователи, добавленные прерванной попыткой (например, при ошибке
+            # отключения от БД), повторно не добавляются
+            _, missing = await connection.read_users_by_ids(
+                [user["id"] for user in list_of_users]
+            )
+            missing = set(missing)
+            list_of_users = [user for user in list_of_users if user["id"] in missing]
+        await connection.create_users(list_of_users)
+    job.progress["created"] = len(valid_users)
+    return {
+        "created": len(valid_users),
+        "failed": len(errors),
+        "ids": [user.id for user in valid_users],
+        "errors": errors,
+    }
+
+
+async def save_upload(file: UploadFile) -> str:
+    """
+    Функция сохранения загруженного файла во временный файл задачи импорта. Загрузка копируется
+    частями в потоке: после ответа на запрос файл загрузки закрывается, а задача продолжает работу
+    :param file: Загруженный файл
+    :return: Путь к временному файлу
+    """
+    fd, path = tempfile.mkstemp(prefix="users_import_")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await asyncio.to_thread(
+                shutil.copyfileobj, file.file, out, get_settings().IMPORT_CHUNK_SIZE
+            )
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def import_users_file(
+    job: Job, path: str, file_format: str, store, latency: float = 0.05
+) -> dict[str, Any]:
+    """
+    Функция фоновой задачи импорта пользователей. Строки читаются и разбираются в потоке пакетами
+    по IMPORT_BATCH_SIZE, пакет валидируется одним проходом, пароли хэшируются в пуле потоков,
+    пользователи пакета добавляются в БД одной операцией. В памяти находится только текущий пакет,
+    поэтому объем памяти не зависит от размера файла. Временный файл удаляется по завершении.
+    :param job: Задача, в progress которой записываются счетчики rows, created и failed
+    :param path: Путь к временному файлу импорта
+    :param file_format: Формат файла: csv или ndjson
+    :param store: Хранилище пользователей
+    :param latency: Имитируемая задержка операций с БД
+    :return: Количество созданных и ошибочных строк и первые IMPORT_MAX_ERRORS ошибок
+    """
+    settings = get_settings()
+    progress = job.progress
+    progress.update(rows=0, created=0, failed=0)
+    errors: list[dict[str, Any]] = []
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            rows = iter_rows(file, file_format)
+            async with AsyncDatabaseConnection(
+                settings.db_url, store, latency
+            ) as connection:
+                while batch := await asyncio.to_thread(
+                    lambda: list(islice(rows, settings.IMPORT_BATCH_SIZE))
+                ):
+                    valid_users, batch_errors = validate_users_batch(batch)
+                    for error in batch_errors:
+                        error["index"] += progress["rows"]
+                    errors.extend(
+                        batch_errors[: settings.IMPORT_MAX_ERRORS - len(errors)]
+                    )
+                    hashed_passwords = await hash_passwords(
+                        [user.password for user in valid_users]
+                    )
+                    await connection.create_users(
+                        [
+                            to_stored_user(user, hashed_password)
+                            for user, hashed_password in zip(
+                                valid_users, hashed_passwords
+                            )
+                        ]
+                    )
+                    progress["rows"] += len(batch)
+                    progress["created"] += len(valid_users)
+                    progress["failed"] += len(batch_errors)
+    finally:
+        os.unlink(path)
+    return {
+        "created": progress["created"],
+        "failed": progress["failed"],
+        "errors": errors,
+    }
@@ -1,30 +1,794 @@
-from pydantic.dataclasses import dataclass
+import fcntl
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
 
+from settings.settings import get_settings
 
-class SingletonMeta(type):
-    _instances = {}
+# Поля, при изменении которых обновляются индексы хранилища: индексы обновляются только
+# для записи изменившегося пользователя
+INDEXED_FIELDS = {"id", "username", "age", "is_supervisor", "email", "name"}
 
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            instance = super().__call__()
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+# Удаленные записи оставляют пустые слоты; список уплотняется, когда пустых слотов становится
+# больше половины (и не меньше COMPACT_MIN_REMOVED), поэтому удаление в среднем O(1)
+COMPACT_MIN_REMOVED = 1024
+# Поля отсортированных индексов. Вставка и удаление пары в середине массива требуют сдвига,
+# поэтому при удалении пары записи остаются в индексах до уплотнения (пустой слот поиск
+# пропускает), а при большом пакетном обновлении индексы сортируются заново один раз
+SORTED_FIELDS = {"age", "name"}
+TOMBSTONE_FIELDS = INDEXED_FIELDS - SORTED_FIELDS
+# Доля записей хранилища, начиная с которой пакет обновлений пересортировывает индексы
+RESORT_BATCH_FRACTION = 1 / 16
 
 
-@dataclass
-class UsersStore(metaclass=SingletonMeta):
+def _email_domain(email: str) -> str:
+    return email.rsplit("@", 1)[-1].lower()
+
+
+def _discard(index: list, item):
+    """Удаление элемента из отсортированного списка"""
+    position = bisect_left(index, item)
+    if position < len(index) and index[position] == item:
+        del index[position]
+
+
+class UsersStore:
     """
-    Хранилище Пользователей
+    Хранилище Пользователей. Помимо списка записей поддерживает индексы по id и username,
+    поэтому поиск пользователя не требует просмотра всего списка. Для поиска по атрибутам
+    поддерживаются вторичные индексы: отсортированные массивы по возрасту и имени, множества
+    номеров записей (слотов) по признаку суперпользователя и по домену электронной почты.
+    Поиск берет наименьшее из множеств кандидатов, проверяет остальные фильтры на самих записях
+    и останавливается, набрав limit результатов.
+
+    Удаление оставляет пустой слот, поэтому номера остальных записей и индексы не меняются;
+    пустые слоты убираются уплотнением, когда их становится больше половины.
+
+    Данные принадлежат экземпляру: хранилище приложения создается в lifespan и передается
+    через зависимость get_users_store, тесты и бенчмарки создают собственные экземпляры.
+    Публичные методы выполняются под блокировкой экземпляра, поэтому хранилище можно
+    использовать из пула потоков.
+    """
+
+    # Запись выполняется в памяти процесса и не ждет блокировок других процессов
+    blocking_writes = False
+
+    def __init__(self, users=None):
+        self._lock = threading.RLock()
+        self._users_store = []  # Записи по слотам; None - удаленная запись
+        self._removed = 0
+        # Слоты записей с данным id или username по возрастанию: при дублировании
+        # поиск возвращает первую запись, как и линейный поиск
+        self._slots_by_id = {}
+        self._slots_by_username = {}
+        self._age_index = []  # Отсортированные пары (возраст, слот)
+        self._name_index = []  # Отсортированные пары (имя в нижнем регистре, слот)
+        self._supervisor_slots = {True: set(), False: set()}
+        self._email_domain_slots = {}
+        # Версии для кэширования ответов: общая версия хранилища растет при каждой записи,
+        # версия пользователя - общая версия на момент его последнего изменения.
+        # Эпоха отличает экземпляры хранилища, чтобы версии не совпали после перезапуска
+        self.epoch = uuid.uuid4().hex[:16]
+        self.version = 0
+        self._record_versions = {}
+        if users:
+            self.extend(users)
+
+    @property
+    def users_store(self):
+        """
+        Список пользователей в порядке добавления. Возвращается копия списка, чтобы изменения
+        хранилища в других потоках не влияли на перебор
+        """
+        with self._lock:
+            if not self._removed:
+                return list(self._users_store)
+            return [
+                user_dict for user_dict in self._users_store if user_dict is not None
+            ]
+
+    def record_version(self, user_id):
+        """
+        Метод получения версии пользователя
+        :param user_id: Идентификатор пользователя
+        :return: Версия или None, если пользователь не найден
+        """
+        with self._lock:
+            return self._record_versions.get(user_id)
+
+    def _bump(self, user_ids):
+        self.version += 1
+        for user_id in user_ids:
+            self._record_versions[user_id] = self.version
+
+    def _index(self, user_dict, slot, sort=True, fields=INDEXED_FIELDS):
+        # sort=False - пары добавляются в конец, индексы сортируются после пакетной вставки;
+        # fields - поля, индексы которых обновляются
+        add = insort if sort else list.append
+        if "id" in fields:
+            add(self._slots_by_id.setdefault(user_dict.get("id"), []), slot)
+        if "username" in fields and user_dict.get("username") is not None:
+            add(self._slots_by_username.setdefault(user_dict["username"], []), slot)
+        if "age" in fields and user_dict.get("age") is not None:
+            add(self._age_index, (user_dict["age"], slot))
+        if "name" in fields and user_dict.get("name") is not None:
+            add(self._name_index, (user_dict["name"].casefold(), slot))
+        if "is_supervisor" in fields and user_dict.get("is_supervisor") is not None:
+            self._supervisor_slots[bool(user_dict["is_supervisor"])].add(slot)
+        if "email" in fields and user_dict.get("email") is not None:
+            domain = _email_domain(user_dict["email"])
+            self._email_domain_slots.setdefault(domain, set()).add(slot)
+
+    def _unindex(self, user_dict, slot, fields=INDEXED_FIELDS):
+        for field, key_index in (
+            ("id", self._slots_by_id),
+            ("username", self._slots_by_username),
+        ):
+            slots = key_index.get(user_dict.get(field)) if field in fields else None
+            if slots is not None:
+                _discard(slots, slot)
+                if not slots:
+                    del key_index[user_dict.get(field)]
+        if "age" in fields and user_dict.get("age") is not None:
+            _discard(self._age_index, (user_dict["age"], slot))
+        if "name" in fields and user_dict.get("name") is not None:
+            _discard(self._name_index, (user_dict["name"].casefold(), slot))
+        if "is_supervisor" in fields and user_dict.get("is_supervisor") is not None:
+            self._supervisor_slots[bool(user_dict["is_supervisor"])].discard(slot)
+        if "email" in fields and user_dict.get("email") is not None:
+            domain = _email_domain(user_dict["email"])
+            slots = self._email_domain_slots.get(domain)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._email_domain_slots[domain]
+
+    def _reindex(self):
+        self._slots_by_id.clear()
+        self._slots_by_username.clear()
+        self._age_index.clear()
+        self._name_index.clear()
+        self._supervisor_slots = {True: set(), False: set()}
+        self._email_domain_slots.clear()
+        for slot, user_dict in enumerate(self._users_store):
+            if user_dict is not None:
+                self._index(user_dict, slot, sort=False)
+        self._age_index.sort()
+        self._name_index.sort()
+
+    def _resort(self):
+        # Пары удаленных записей при этом тоже убираются
+        self._age_index[:] = sorted(
+            (user_dict["age"], slot)
+            for slot, user_dict in enumerate(self._users_store)
+            if user_dict is not None and user_dict.get("age") is not None
+        )
+        self._name_index[:] = sorted(
+            (user_dict["name"].casefold(), slot)
+            for slot, user_dict in enumerate(self._users_store)
+            if user_dict is not None and user_dict.get("name") is not None
+        )
+
+    def _compact(self):
+        self._users_store[:] = [
+            user_dict for user_dict in self._users_store if user_dict is not None
+        ]
+        self._removed = 0
+        self._reindex()
+
+    def _first(self, slots):
+        return self._users_store[slots[0]] if slots else None
+
+    def __call__(self, user_dict):
+        with self._lock:
+            self._users_store.append(user_dict)
+            self._index(user_dict, len(self._users_store) - 1)
+            self._bump([user_dict.get("id")])
+
+    def extend(self, user_dicts):
+        with self._lock:
+            user_dicts = list(user_dicts)
+            first_slot = len(self._users_store)
+            self._users_store.extend(user_dicts)
+            for slot, user_dict in enumerate(user_dicts, start=first_slot):
+                self._index(user_dict, slot, sort=False)
+            self._age_index.sort()
+            self._name_index.sort()
+            self._bump([user_dict.get("id") for user_dict in user_dicts])
+
+    def replace_all(self, user_dicts):
+        """
+        Функция замены всех записей хранилища с перестроением индексов
+        :param user_dicts: Новый список пользователей
+        """
+        with self._lock:
+            self._users_store[:] = user_dicts
+            self._removed = 0
+            self._reindex()
+            self._record_versions.clear()
+            self._bump([user_dict.get("id") for user_dict in user_dicts])
+
+    def get_by_id(self, user_id):
+        with self._lock:
+            return self._first(self._slots_by_id.get(user_id))
+
+    def get_by_username(self, username):
+        with self._lock:
+            return self._first(self._slots_by_username.get(username))
+
+    def get_many(self, user_ids):
+        """
+        Функция получения группы пользователей за один проход по индексу
+        :param user_ids: Список идентификаторов пользователей
+        :return: Кортеж из списка найденных пользователей и списка отсутствующих идентификаторов
+        """
+        found, missing = [], []
+        with self._lock:
+            for user_id in dict.fromkeys(user_ids):
+                user_dict = self._first(self._slots_by_id.get(user_id))
+                if user_dict is None:
+                    missing.append(user_id)
+                else:
+                    found.append(user_dict)
+        return found, missing
+
+    def search(
+        self,
+        age_min=None,
+        age_max=None,
+        is_supervisor=None,
+        email_domain=None,
+        name_prefix=None,
+        limit=None,
+    ):
+        """
+        Функция поиска пользователей по атрибутам. По индексу каждого фильтра определяется
+        количество кандидатов, из наименьшего набора кандидатов выбираются записи, подходящие
+        под остальные фильтры, пока не набрано limit результатов.
+        :param age_min: Минимальный возраст (включительно)
+        :param age_max: Максимальный возраст (включительно)
+        :param is_supervisor: Признак суперпользователя
+        :param email_domain: Домен электронной почты
+        :param name_prefix: Начало имени без учета регистра
+        :param limit: Максимальное количество результатов
+        :return: Список пользователей в порядке добавления
+        """
+        with self._lock:
+            return self._search(
+                age_min, age_max, is_supervisor, email_domain, name_prefix, limit
+            )
+
+    def _search(
+        self, age_min, age_max, is_supervisor, email_domain, name_prefix, limit
+    ):
+        if email_domain is not None:
+            email_domain = email_domain.lower()
+        if name_prefix is not None:
+            name_prefix = name_prefix.casefold()
+        # Кандидаты каждого фильтра: (количество, функция получения слотов)
+        candidates = []
+        if age_min is not None or age_max is not None:
+            start = 0 if age_min is None else bisect_left(self._age_index, (age_min,))
+            end = (
+                len(self._age_index)
+                if age_max is None
+                else bisect_right(self._age_index, (age_max, float("inf")))
+            )
+            candidates.append(
+                (end - start, self._range_slots(self._age_index, start, end))
+            )
+        if is_supervisor is not None:
+            slots = self._supervisor_slots[is_supervisor]
+            candidates.append((len(slots), lambda slots=slots: slots))
+        if email_domain is not None:
+            slots = self._email_domain_slots.get(email_domain, set())
+            candidates.append((len(slots), lambda slots=slots: slots))
+        if name_prefix is not None:
+            start = bisect_left(self._name_index, (name_prefix,))
+            end = bisect_left(self._name_index, (name_prefix + "\U0010ffff",))
+            candidates.append(
+                (end - start, self._range_slots(self._name_index, start, end))
+            )
+
+        live = len(self._users_store) - self._removed
+        size, get_slots = min(
+            candidates, key=lambda candidate: candidate[0], default=(live, None)
+        )
+        if get_slots is None or size * 4 > live:
+            # Кандидатов много: записи просматриваются по порядку до набора limit результатов
+            slots = range(len(self._users_store))
+        else:
+            slots = sorted(get_slots())
+
+        result = []
+        for slot in slots:
+            if limit is not None and len(result) >= limit:
+                break
+            user_dict = self._users_store[slot]
+            if user_dict is None:
+                continue
+            if age_min is not None or age_max is not None:
+                age = user_dict.get("age")
+                if age is None or (age_min is not None and age < age_min):
+                    continue
+                if age_max is not None and age > age_max:
+                    continue
+            if is_supervisor is not None and (
+                user_dict.get("is_supervisor") is None
+                or bool(user_dict["is_supervisor"]) != is_supervisor
+            ):
+                continue
+            if email_domain is not None and (
+                user_dict.get("email") is None
+                or _email_domain(user_dict["email"]) != email_domain
+            ):
+                continue
+            if name_prefix is not None and (
+                user_dict.get("name") is None
+                or not user_dict["name"].casefold().startswith(name_prefix)
+            ):
+                continue
+            result.append(user_dict)
+        return result
+
+    @staticmethod
+    def _range_slots(index, start, end):
+        return lambda: [slot for _, slot in index[start:end]]
+
+    def update(self, user_id, changes):
+        """
+        Функция частичного обновления пользователя на месте. Применяются только изменившиеся поля,
+        индексы обновляются только при изменении индексируемых полей.
+        :param user_id: Идентификатор пользователя
+        :param changes: Словарь с новыми значениями полей
+        :return: Обновленный пользователь или None, если пользователь не найден
+        """
+        updated, _ = self.update_many({user_id: changes})
+        return updated[0] if updated else None
+
+    def update_many(self, updates):
+        """
+        Функция пакетного частичного обновления пользователей. Индексы обновляются только
+        для записей изменившихся пользователей, в том числе при смене id или username;
+        отсортированные индексы большого пакета сортируются заново один раз после обновления
+        :param updates: Словарь {идентификатор пользователя: словарь с новыми значениями полей}
+        :return: Кортеж из списка обновленных пользователей и списка отсутствующих идентификаторов
+        """
+        updated, missing, changed_ids = [], [], []
+        resort = False
+        with self._lock:
+            deferred = len(updates) > len(self._users_store) * RESORT_BATCH_FRACTION
+            for user_id, changes in updates.items():
+                slots = self._slots_by_id.get(user_id)
+                if not slots:
+                    missing.append(user_id)
+                    continue
+                slot = slots[0]
+                user_dict = self._users_store[slot]
+                changed = {
+                    key: value
+                    for key, value in changes.items()
+                    if user_dict.get(key) != value
+                }
+                if INDEXED_FIELDS.isdisjoint(changed):
+                    user_dict.update(changed)
+                else:
+                    fields = changed.keys() - SORTED_FIELDS if deferred else changed
+                    resort = resort or len(fields) < len(changed)
+                    self._unindex(user_dict, slot, fields=fields)
+                    user_dict.update(changed)
+                    self._index(user_dict, slot, fields=fields)
+                    if "id" in changed and user_id not in self._slots_by_id:
+                        # Версия переходит к новому id вместе с записью
+                        self._record_versions.pop(user_id, None)
+                if changed:
+                    changed_ids.append(user_dict.get("id"))
+                updated.append(user_dict)
+            if resort:
+                self._resort()
+            if changed_ids:
+                self._bump(changed_ids)
+        return updated, missing
+
+    def remove(self, user_id):
+        """
+        Функция удаления пользователя. Записи удаляются из индексов по ключам и множеств,
+        а их слоты остаются пустыми, поэтому индексы остальных записей не меняются
+        :param user_id: Идентификатор пользователя
+        """
+        with self._lock:
+            slots = self._slots_by_id.get(user_id)
+            if not slots:
+                return
+            for slot in list(slots):
+                self._unindex(self._users_store[slot], slot, fields=TOMBSTONE_FIELDS)
+                self._users_store[slot] = None
+                self._removed += 1
+            self._bump([])
+            self._record_versions.pop(user_id, None)
+            if self._removed >= COMPACT_MIN_REMOVED and self._removed * 2 > len(
+                self._users_store
+            ):
+                self._compact()
+
+
+class StoreFullError(Exception):
+    """Данные хранилища не помещаются в сегмент разделяемой памяти"""
+
+
+class SharedUsersStore:
+    """
+    Хранилище Пользователей, общее для процессов-воркеров. Единственный источник истины - сегмент
+    разделяемой памяти: снимок списка пользователей и следующий за ним журнал операций записи,
+    защищенные seqlock. Заголовок содержит счетчик версий (нечетный во время записи), поколение
+    снимка, длины снимка и журнала и эпоху сегмента.
+
+    Чтение не берет межпроцессных блокировок: проверяется счетчик версий, и если он не менялся,
+    запрос обслуживается локальной копией (UsersStore процесса со всеми индексами). Если менялся,
+    к локальной копии применяются только новые записи журнала, каждая - с инкрементальным
+    обновлением индексов. Снимок перечитывается целиком только после уплотнения журнала.
+    Запись сериализуется блокировкой файла (fcntl.flock) между процессами и threading.Lock
+    внутри процесса: под блокировкой копия синхронизируется, изменяется, а операция дописывается
+    в журнал. Когда журнал становится длиннее снимка, он уплотняется в новый снимок, поэтому
+    стоимость записи не зависит от объема данных и числа воркеров. Запись может ждать блокировку,
+    поэтому AsyncDatabaseConnection выполняет ее в потоке (признак blocking_writes).
+
+    Каждый подключенный процесс держит разделяемую блокировку файла подключений; сегмент удаляет
+    последний отключившийся процесс.
     """
 
-    _users_store = []
+    # Счетчик версий, поколение снимка, длина снимка, длина журнала, эпоха сегмента
+    HEADER = struct.Struct("<QQQQ16s")
+    RECORD = struct.Struct("<I")  # Длина записи журнала
+    # Журнал короче этого размера не уплотняется, даже если он длиннее снимка
+    COMPACT_MIN_LOG = 64 * 1024
+    blocking_writes = True
+
+    def __init__(self, name: str, size: int, store: UsersStore | None = None):
+        self.name = name
+        self._store = store if store is not None else UsersStore()
+        self._seen_seq = -1
+        self._seen_generation = -1
+        self._seen_log = 0
+        self._epoch = b""
+        self._thread_lock = threading.Lock()
+        # Синхронизация локальной копии: удерживается только на время работы с памятью,
+        # поэтому чтение в цикле событий не ждет межпроцессную блокировку писателя
+        self._local_lock = threading.RLock()
+        lock_dir = tempfile.gettempdir()
+        self._attach_file = self._attach(os.path.join(lock_dir, f"{name}.attach"))
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.owner = True
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        # Сегмент удаляет последний отключившийся процесс, а не resource_tracker создавшего
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        lock_path = os.path.join(lock_dir, f"{name}.lock")
+        self._lock_file = open(lock_path, "a+b")
+        # Отдельный дескриптор для проверки, не завершился ли писатель посреди записи:
+        # блокировки flock разных дескрипторов конфликтуют и внутри одного процесса
+        self._probe_file = open(lock_path, "a+b")
+        if self.owner:
+            with self._write_lock(), self._local_lock:
+                self._epoch = uuid.uuid4().bytes
+                self._compact()
+
+    @staticmethod
+    def _attach(path: str):
+        while True:
+            file = open(path, "a+b")
+            fcntl.flock(file, fcntl.LOCK_SH)
+            try:
+                if os.fstat(file.fileno()).st_ino == os.stat(path).st_ino:
+                    return file
+            except FileNotFoundError:
+                pass
+            # Файл удален последним отключившимся процессом, пока ожидалась блокировка
+            file.close()
+
+    @contextmanager
+    def _write_lock(self):
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        with self._local_lock:
+            buf = self._shm.buf
+            while True:
+                seq, generation, snapshot_length, log_length, epoch = (
+                    self.HEADER.unpack_from(buf)
+                )
+                if seq == self._seen_seq:
+                    return
+                if seq % 2:
+                    self._recover(seq)
+                    continue
+                snapshot = None
+                log_start = self._seen_log
+                if generation != self._seen_generation:
+                    snapshot = bytes(
+                        buf[self.HEADER.size : self.HEADER.size + snapshot_length]
+                    )
+                    log_start = 0
+                offset = self.HEADER.size + snapshot_length
+                log = bytes(buf[offset + log_start : offset + log_length])
+                if self.HEADER.unpack_from(buf)[0] == seq:
+                    break
+            if snapshot is not None:
+                self._store.replace_all(json.loads(snapshot) if snapshot else [])
+            self._apply_log(log)
+            self._seen_seq = seq
+            self._seen_generation = generation
+            self._seen_log = log_length
+            self._epoch = epoch
+
+    def _recover(self, seq: int):
+        # Идет запись в другом процессе. Если писатель завершился посреди записи, его блокировка
+        # уже снята, и сегмент восстанавливается снимком локальной копии
+        try:
+            fcntl.flock(self._probe_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            time.sleep(0)
+            return
+        try:
+            if self.HEADER.unpack_from(self._shm.buf)[0] == seq:
+                self._compact()
+        finally:
+            fcntl.flock(self._probe_file, fcntl.LOCK_UN)
+
+    def _apply_log(self, log: bytes):
+        offset = 0
+        while offset < len(log):
+            (length,) = self.RECORD.unpack_from(log, offset)
+            offset += self.RECORD.size
+            operation, argument = json.loads(log[offset : offset + length])
+            offset += length
+            if operation == "add":
+                self._store(argument)
+            elif operation == "extend":
+                self._store.extend(argument)
+            elif operation == "update_many":
+                self._store.update_many(dict(argument))
+            elif operation == "remove":
+                self._store.remove(argument)
+
+    def _append(self, operation: str, argument):
+        """
+        Метод добавления операции в журнал сегмента. Если журнал стал длиннее снимка
+        или не помещается в сегмент, он уплотняется в снимок локальной копии
+        """
+        data = json.dumps(
+            [operation, argument], ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        buf = self._shm.buf
+        seq, generation, snapshot_length, log_length, epoch = self.HEADER.unpack_from(
+            buf
+        )
+        offset = self.HEADER.size + snapshot_length + log_length
+        new_log_length = log_length + self.RECORD.size + len(data)
+        if (
+            self.HEADER.size + snapshot_length + new_log_length > self._shm.size
+            or new_log_length > max(snapshot_length, self.COMPACT_MIN_LOG)
+        ):
+            self._compact()
+            return
+        struct.pack_into("<Q", buf, 0, seq + 1)
+        self.RECORD.pack_into(buf, offset, len(data))
+        buf[offset + self.RECORD.size : offset + self.RECORD.size + len(data)] = data
+        self.HEADER.pack_into(
+            buf, 0, seq + 2, generation, snapshot_length, new_log_length, epoch
+        )
+        self._seen_seq = seq + 2
+        self._seen_log = new_log_length
+
+    def _resort(self):
+        # Пары удаленных записей при этом тоже убираются
+        self._age_index[:] = sorted(
+            (user_dict["age"], slot)
+            for slot, user_dict in enumerate(self._users_store)
+            if user_dict is not None and user_dict.get("age") is not None
+        )
+        self._name_index[:] = sorted(
+            (user_dict["name"].casefold(), slot)
+            for slot, user_dict in enumerate(self._users_store)
+            if user_dict is not None and user_dict.get("name") is not None
+        )
+
+    def _compact(self):
+        """
+        Метод публикации снимка локальной копии с пустым журналом (новое поколение снимка)
+        :raises StoreFullError: Снимок не помещается в сегмент
+        """
+        data = json.dumps(
+            self._store.users_store, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        if self.HEADER.size + len(data) > self._shm.size:
+            # Локальная копия уже изменена: при следующем чтении она перечитывается из снимка
+            self._seen_seq = self._seen_generation = -1
+            raise StoreFullError(
+                f"Снимок хранилища ({len(data)} байт) больше сегмента {self._shm.size} байт"
+            )
+        buf = self._shm.buf
+        seq, generation = self.HEADER.unpack_from(buf)[:2]
+        seq += 1 if seq % 2 == 0 else 0
+        struct.pack_into("<Q", buf, 0, seq)
+        buf[self.HEADER.size : self.HEADER.size + len(data)] = data
+        self.HEADER.pack_into(
+            buf, 0, seq + 1, generation + 1, len(data), 0, self._epoch
+        )
+        self._seen_seq = seq + 1
+        self._seen_generation = generation + 1
+        self._seen_log = 0
+
+    def _write(self, operation: str, argument, method, *args):
+        with self._write_lock(), self._local_lock:
+            if self.HEADER.unpack_from(self._shm.buf)[0] % 2:
+                # Предыдущий писатель завершился посреди записи
+                self._compact()
+            self._sync()
+            result = method(*args)
+            self._append(operation, argument)
+            return result
 
     @property
     def users_store(self):
-        return self._users_store
+        self._sync()
+        return self._store.users_store
+
+    # Версии локальных копий в разных процессах не совпадают, поэтому версией хранилища
+    # и каждого пользователя служит счетчик версий сегмента: любая запись меняет все версии
+    @property
+    def epoch(self):
+        self._sync()
+        return self._epoch.hex()
+
+    @property
+    def version(self):
+        self._sync()
+        return self._seen_seq
+
+    def record_version(self, user_id):
+        self._sync()
+        if self._store.get_by_id(user_id) is None:
+            return None
+        return self._seen_seq
 
     def __call__(self, user_dict):
-        self._users_store.append(user_dict)
+        self._write("add", user_dict, self._store, user_dict)
+
+    def extend(self, user_dicts):
+        user_dicts = list(user_dicts)
+        self._write("extend", user_dicts, self._store.extend, user_dicts)
+
+    def get_by_id(self, user_id):
+        self._sync()
+        return self._store.get_by_id(user_id)
+
+    def get_by_username(self, username):
+        self._sync()
+        return self._store.get_by_username(username)
+
+    def get_many(self, user_ids):
+        self._sync()
+        return self._store.get_many(user_ids)
+
+    def search(
+        self,
+        age_min=None,
+        age_max=None,
+        is_supervisor=None,
+        email_domain=None,
+        name_prefix=None,
+        limit=None,
+    ):
+        self._sync()
+        return self._store.search(
+            age_min, age_max, is_supervisor, email_domain, name_prefix, limit
+        )
 
+    def update(self, user_id, changes):
+        return self._write(
+            "update_many", [[user_id, changes]], self._store.update, user_id, changes
+        )
 
-users_store_instance = UsersStore()
+    def update_many(self, updates):
+        return self._write(
+            "update_many", list(updates.items()), self._store.update_many, updates
+        )
+
+    def remove(self, user_id):
+        self._write("remove", user_id, self._store.remove, user_id)
+
+    def close(self):
+        """
+        Метод отключения от сегмента. Последний отключившийся процесс удаляет сегмент и файлы
+        блокировок
+        """
+        self._lock_file.close()
+        self._probe_file.close()
+        self._shm.close()
+        try:
+            fcntl.flock(self._attach_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            pass  # Сегментом пользуются другие процессы
+        else:
+            # unlink снимает регистрацию в resource_tracker, снятую при подключении
+            resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
+            os.unlink(self._lock_file.name)
+            os.unlink(self._attach_file.name)
+        finally:
+            self._attach_file.close()
+
+
+# Хранилище приложения. Создается в lifespan; если lifespan не запускался (например,
+# при тестировании через ASGITransport), создается при первом обращении
+_users_store: UsersStore | SharedUsersStore | None = None
+_users_store_lock = threading.Lock()
+
+
+def create_users_store(settings=None) -> UsersStore | SharedUsersStore:
+    """
+    Функция создания хранилища пользователей согласно настройке USERS_STORE_BACKEND:
+    "memory" - хранилище процесса, "shared" - общее для воркеров хранилище в разделяемой памяти
+    :param settings: Объект-настройки. По умолчанию - настройки приложения
+    :return: Объект UsersStore или SharedUsersStore
+    """
+    settings = settings or get_settings()
+    if settings.USERS_STORE_BACKEND == "shared":
+        return SharedUsersStore(settings.USERS_SHM_NAME, settings.USERS_SHM_SIZE)
+    return UsersStore()
+
+
+def get_users_store() -> UsersStore | SharedUsersStore:
+    """
+    Зависимость, возвращающая хранилище пользователей приложения
+    :return: Объект UsersStore или SharedUsersStore
+    """
+    global _users_store
+    if _users_store is None:
+        with _users_store_lock:
+            if _users_store is None:
+                _users_store = create_users_store()
+    return _users_store
+
+
+def reset_users_store(store=None) -> UsersStore | SharedUsersStore:
+    """
+    Функция замены хранилища приложения. Вызывается в lifespan при старте,
+    а также тестами и бенчмарками для изолированного хранилища
+    :param store: Новое хранилище. По умолчанию создается по настройкам
+    :return: Новое хранилище
+    """
+    global _users_store
+    with _users_store_lock:
+        previous = _users_store
+        _users_store = store if store is not None else create_users_store()
+    if isinstance(previous, SharedUsersStore) and previous is not _users_store:
+        previous.close()
+    return _users_store
+
+
+def close_users_store():
+    """
+    Функция закрытия хранилища приложения при остановке. Общее хранилище отключается
+    от сегмента разделяемой памяти
+    """
+    global _users_store
+    with _users_store_lock:
+        previous, _users_store = _users_store, None
+    if isinstance(previous, SharedUsersStore):
+        previous.close()
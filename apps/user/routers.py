@@ -1,23 +1,29 @@
 from fastapi import APIRouter, FastAPI, Request, HTTPException, status
 import jwt
-from settings.settings import settings
+from settings.settings import get_settings
 from jwt.exceptions import InvalidTokenError
+from apps.monitoring.services import timed, TimedAPIRoute
 
-user_router = APIRouter(tags=["Приложение для взаимодействия с пользователем"])
+user_router = APIRouter(
+    tags=["Приложение для взаимодействия с пользователем"], route_class=TimedAPIRoute
+)
 
 
 middleware_protected_app = FastAPI(
     description="Подприложение для конечных точек с защитой на основе middleware"
 )
+middleware_protected_app.router.route_class = TimedAPIRoute
 
 
 @middleware_protected_app.middleware("http")
 async def check_if_user_authorized(request: Request, call_next):
+    settings = get_settings()
     try:
         token = request.cookies.get("access-token")
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        with timed("jwt"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
         username: str = payload.get("sub")
     except InvalidTokenError:
         raise HTTPException(
@@ -1,15 +1,49 @@
 import re
+from typing import Annotated
+
 from pydantic import (
+    AfterValidator,
     BaseModel,
     Field,
-    EmailStr,
+    WithJsonSchema,
     field_validator,
     ConfigDict,
+    TypeAdapter,
+    ValidationError,
+    WrapValidator,
 )
 from pydantic.alias_generators import to_camel
 
 unique_user_ids_list = []
 
+# Регулярные выражения компилируются один раз при импорте модуля
+PHONE_NUMBER_PATTERN = re.compile(r"^\+\d{1} \(\d{3}\) \d{3}-\d{2}-\d{2}$")
+EMAIL_PATTERN = re.compile(
+    r"^[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}$"
+)
+EMAIL_MAX_LENGTH = 254
+
+
+def validate_email_syntax(value: str) -> str:
+    """
+    Быстрая проверка электронной почты только по синтаксису, без проверки доставляемости (DNS).
+    Домен приводится к нижнему регистру, как это делает EmailStr.
+    :param value: Адрес электронной почты
+    :return: Нормализованный адрес электронной почты
+    """
+    if len(value) > EMAIL_MAX_LENGTH or not EMAIL_PATTERN.fullmatch(value):
+        raise ValueError("Адрес электронной почты некорректен")
+    local_part, domain = value.rsplit("@", 1)
+    return f"{local_part}@{domain.lower()}"
+
+
+EmailSyntaxStr = Annotated[
+    str,
+    AfterValidator(validate_email_syntax),
+    WithJsonSchema({"type": "string", "format": "email"}),
+]
+
 
 class UserPublic(BaseModel):
     id: int | None = Field(
@@ -32,7 +66,7 @@ class UserPublic(BaseModel):
         title="Является ли админом",
         description="Проверка на суперпользователя",
     )
-    email: EmailStr | None = Field(
+    email: EmailSyntaxStr | None = Field(
         default=None, title="Электронная почта", description="Электронная почта"
     )
     phone_number: str | None = Field(
@@ -44,7 +78,7 @@ class UserPublic(BaseModel):
     @field_validator("phone_number")
     @classmethod
     def validate_phone_number(cls, value: str) -> str:
-        if not re.match(r"^\+\d{1} \(\d{3}\) \d{3}-\d{2}-\d{2}$", value):
+        if not PHONE_NUMBER_PATTERN.match(value):
             raise ValueError(
                 "Номер телефона должен соответствовать формату: +7 (000) 000-00-00"
             )
@@ -76,3 +110,66 @@ class UserCreate(UserPublic):
 class UserUpdate(UserPublic):
     username: str | None = None
     password: str | None = None
+
+
+class UserBulkUpdate(UserUpdate):
+    id: int = Field(
+        title="Уникальный идентификатор пользователя",
+        description="Идентификатор обновляемого пользователя",
+    )
+
+
+class UsersBatch(BaseModel):
+    found: list[UserPublic] = Field(
+        title="Найденные пользователи",
+        description="Пользователи в порядке запрошенных идентификаторов",
+    )
+    missing: list[int] = Field(
+        title="Отсутствующие идентификаторы",
+        description="Идентификаторы, для которых пользователь не найден",
+    )
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class UsersUpdated(BaseModel):
+    updated: list[UserPublic] = Field(
+        title="Обновленные пользователи",
+        description="Пользователи после обновления",
+    )
+    missing: list[int] = Field(
+        title="Отсутствующие идентификаторы",
+        description="Идентификаторы, для которых пользователь не найден",
+    )
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class RowErrors(list):
+    """Ошибки валидации одной строки пакета пользователей"""
+
+
+def collect_row_errors(value, handler):
+    """
+    Функция валидации строки пакета, не прерывающая проверку остальных строк
+    :param value: Сырые данные строки
+    :param handler: Валидатор UserCreate
+    :return: Провалидированный пользователь или RowErrors с ошибками строки в JSON-совместимом виде
+    """
+    try:
+        return handler(value)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_input=False, include_context=False)
+        for error in errors:
+            error["loc"] = list(error["loc"])
+        return RowErrors(errors)
+
+
+# Кэшированный адаптер для валидации пакета пользователей за один проход: вместо строки с ошибками
+# возвращаются ее ошибки, корректные строки повторно не валидируются
+UserCreateListAdapter = TypeAdapter(
+    list[Annotated[UserCreate, WrapValidator(collect_row_errors)]]
+)
+
+# Кэшированный адаптер для сериализации списка пользователей в JSON без промежуточных словарей
+UserPublicListAdapter = TypeAdapter(list[UserPublic])
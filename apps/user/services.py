@@ -1,10 +1,19 @@
 import asyncio
+import logging
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Annotated, Any
 
-from fastapi import Depends
-from settings.settings import settings
-from apps.user.schemas import User
-from apps.user.repository import users_store_instance
+from fastapi import Depends, Request, Response
+from settings.settings import get_settings
+from apps.user.schemas import RowErrors, User, UserCreate, UserCreateListAdapter
+from apps.user.repository import get_users_store
+from apps.monitoring.services import timed, timed_stage
+
+logger = logging.getLogger("apps.user")
+
+
+UsersStoreDep = Annotated[Any, Depends(get_users_store)]
 
 
 class AsyncDatabaseConnection:
@@ -12,62 +21,238 @@ class AsyncDatabaseConnection:
     Асинхронный контекстный менеджер, имитирующий подключение к БД
     """
 
-    def __init__(self, db_url):
+    def __init__(self, db_url, store=None, latency=0.05):
+        """
+        :param db_url: Адрес БД
+        :param store: Хранилище пользователей. По умолчанию - хранилище приложения
+        :param latency: Имитируемая задержка каждой операции с БД в секундах
+        """
         self.db_url = db_url
+        self.store = store if store is not None else get_users_store()
+        self.latency = latency
 
     async def __aenter__(self):
         try:
-            await asyncio.sleep(0.05)  # Имитация ожидания подключения к БД
-            print(f"Асинхронное подключение к базе данных с URL: {self.db_url}")
+            with timed("db_connect"):
+                await asyncio.sleep(self.latency)  # Имитация ожидания подключения к БД
+            logger.debug(
+                "Асинхронное подключение к базе данных", extra={"event": "db_connect"}
+            )
             return self
-        except Exception as e:
-            print(f"Ошибка при подключении к БД: {e}")
+        except Exception:
+            logger.exception(
+                "Ошибка при подключении к БД", extra={"event": "db_connect"}
+            )
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         try:
-            await asyncio.sleep(0.05)  # Имитация ожидания отключения от БД
-            print(f"Отключение от базы данных с URL: {self.db_url}")
-            print("Отключение от базы данных")
-        except Exception as e:
-            print(f"Ошибка при разрыве подключения с БД: {e}")
+            await asyncio.sleep(self.latency)  # Имитация ожидания отключения от БД
+            logger.debug("Отключение от базы данных", extra={"event": "db_disconnect"})
+        except Exception:
+            logger.exception(
+                "Ошибка при разрыве подключения с БД", extra={"event": "db_disconnect"}
+            )
+
+    def user_etag(self, user_id) -> str | None:
+        """
+        Метод получения ETag пользователя по версии его записи. Читает только счетчики хранилища,
+        поэтому не имитирует обращение к БД
+        :param user_id: Идентификатор пользователя
+        :return: ETag или None, если пользователь не найден
+        """
+        version = self.store.record_version(user_id)
+        if version is None:
+            return None
+        return f'"{self.store.epoch}.{user_id}.{version}"'
+
+    def store_etag(self) -> str:
+        """
+        Метод получения ETag всего хранилища по его общей версии
+        :return: ETag
+        """
+        return f'"{self.store.epoch}.{self.store.version}"'
 
+    async def _write(self, operation, *args):
+        """
+        Метод выполнения записи в хранилище. Запись в общее хранилище ждет межпроцессную
+        блокировку, поэтому выполняется в потоке, чтобы не блокировать цикл событий
+        :param operation: Метод хранилища
+        :return: Результат метода
+        """
+        if self.store.blocking_writes:
+            return await asyncio.to_thread(operation, *args)
+        return operation(*args)
+
+    @timed_stage("db")
     async def create_user(self, user: User):
-        await asyncio.sleep(0.05)
+        await asyncio.sleep(self.latency)
         user_dict = user.model_dump()
-        users_store_instance(user_dict)
+        await self._write(self.store, user_dict)
+        get_response_cache().clear()
+
+    @timed_stage("db")
+    async def create_users(self, user_dicts: list[dict]):
+        await asyncio.sleep(self.latency)
+        await self._write(self.store.extend, user_dicts)
+        get_response_cache().clear()
 
+    @timed_stage("db")
     async def read_user_by_id(self, user_id):
-        await asyncio.sleep(0.05)
-        users_list = users_store_instance.users_store
-        for i in users_list:
-            if i["id"] == user_id:
-                return i
+        await asyncio.sleep(self.latency)
+        return self.store.get_by_id(user_id)
+
+    @timed_stage("db")
+    async def read_users_by_ids(self, user_ids: list[int]):
+        await asyncio.sleep(self.latency)
+        return self.store.get_many(user_ids)
 
+    @timed_stage("db")
     async def read_user_by_username(self, username):
-        await asyncio.sleep(0.05)
-        users_list = users_store_instance.users_store
-        for i in users_list:
-            if i["username"] == username:
-                return i
+        await asyncio.sleep(self.latency)
+        return self.store.get_by_username(username)
 
+    @timed_stage("db")
     async def read_users(self, start, end):
-        await asyncio.sleep(0.05)
-        users_list = users_store_instance.users_store
+        await asyncio.sleep(self.latency)
+        users_list = self.store.users_store
         if start is None and end is None:
             return users_list
         return users_list[start - 1 : end]
 
+    @timed_stage("db")
+    async def search_users(self, **filters):
+        await asyncio.sleep(self.latency)
+        return self.store.search(**filters)
+
+    @timed_stage("db")
+    async def update_user(self, user_id, changes: dict):
+        await asyncio.sleep(self.latency)
+        user_dict = await self._write(self.store.update, user_id, changes)
+        get_response_cache().clear()
+        return user_dict
+
+    @timed_stage("db")
+    async def update_users(self, updates: dict[int, dict]):
+        await asyncio.sleep(self.latency)
+        result = await self._write(self.store.update_many, updates)
+        get_response_cache().clear()
+        return result
+
+    @timed_stage("db")
     async def delete_user(self, user_id):
-        await asyncio.sleep(0.05)
-        users_list = users_store_instance.users_store
-        for i in users_list:
-            if i["id"] == user_id:
-                users_list.remove(i)
+        await asyncio.sleep(self.latency)
+        await self._write(self.store.remove, user_id)
+        get_response_cache().clear()
+
+
+class ResponseCache:
+    """
+    LRU-кэш сериализованных тел ответов. Ключ включает ETag, поэтому после записи в хранилище
+    (в том числе из другого процесса) устаревшее тело не будет найдено. Записи этого процесса
+    дополнительно очищают кэш, чтобы не держать в памяти недостижимые тела
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._bodies: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+
+    def get(self, key: str, etag: str) -> bytes | None:
+        body = self._bodies.get((key, etag))
+        if body is not None:
+            self._bodies.move_to_end((key, etag))
+        return body
+
+    def put(self, key: str, etag: str, body: bytes):
+        if self.max_size <= 0:
+            return
+        self._bodies[(key, etag)] = body
+        self._bodies.move_to_end((key, etag))
+        while len(self._bodies) > self.max_size:
+            self._bodies.popitem(last=False)
+
+    def clear(self):
+        self._bodies.clear()
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    return ResponseCache(get_settings().USERS_RESPONSE_CACHE_SIZE)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Функция проверки заголовка If-None-Match (слабое сравнение, как требует RFC 9110)
+    :param if_none_match: Значение заголовка If-None-Match
+    :param etag: Текущий ETag ресурса
+    :return: True, если клиент уже получил текущую версию ресурса
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+async def cached_json_response(
+    request: Request, key: str, etag: str, serialize
+) -> Response:
+    """
+    Функция ответа с валидацией по ETag. Если у клиента текущая версия - возвращается 304 без тела,
+    иначе тело берется из кэша ответов или сериализуется и сохраняется в кэш
+    :param request: Запрос
+    :param key: Ключ ресурса в кэше ответов
+    :param etag: Текущий ETag ресурса, полученный до чтения данных
+    :param serialize: Асинхронная функция чтения и сериализации данных в байты JSON
+    :return: Ответ 304 или 200 с телом
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    cache = get_response_cache()
+    body = cache.get(key, etag)
+    if body is None:
+        body = await serialize()
+        cache.put(key, etag, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def validate_users_batch(
+    rows: list[Any],
+) -> tuple[list[UserCreate], list[dict[str, Any]]]:
+    """
+    Функция пакетной валидации пользователей. Весь пакет проверяется одним проходом кэшированного
+    TypeAdapter: строка с ошибками не прерывает проверку, ее ошибки группируются по номеру строки.
+    :param rows: Список сырых данных пользователей из тела запроса
+    :return: Кортеж из списка валидных пользователей UserCreate и списка ошибок по строкам
+    """
+    users, errors = [], []
+    for index, result in enumerate(UserCreateListAdapter.validate_python(rows)):
+        if isinstance(result, RowErrors):
+            errors.append({"index": index, "errors": list(result)})
+        else:
+            users.append(result)
+    return users, errors
+
+
+def to_stored_user(user: UserCreate, hashed_password: str) -> dict[str, Any]:
+    """
+    Функция преобразования провалидированного UserCreate в словарь, хранимый в БД (формат модели User).
+    Повторная валидация моделью User не выполняется.
+    :param user: Провалидированный пользователь
+    :param hashed_password: Хеш пароля пользователя
+    :return: Словарь с данными пользователя
+    """
+    user_dict = user.model_dump(exclude={"password"})
+    user_dict["hashed_password"] = hashed_password
+    return user_dict
 
 
-async def get_connection():
-    async with AsyncDatabaseConnection(settings.db_url) as connection:
-        await asyncio.sleep(0.05)
+async def get_connection(store: UsersStoreDep):
+    async with AsyncDatabaseConnection(get_settings().db_url, store) as connection:
+        with timed("db_connect"):
+            await asyncio.sleep(connection.latency)
         yield connection
 
 
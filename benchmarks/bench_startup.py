@@ -0,0 +1,67 @@
+"""
+Бенчмарк холодного старта приложения.
+Импортирует main в отдельном процессе с python -X importtime, выводит суммарное время импорта
+и самые дорогие модули. Завершается с кодом 1, если время старта превышает бюджет.
+
+Запуск: python -m benchmarks.bench_startup --budget-ms 800 --top 15
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(.+)$")
+
+# Бюджет времени старта (импорт main) в миллисекундах
+STARTUP_BUDGET_MS = 800
+
+
+def profile_import(module: str = "main") -> list[tuple[str, int, int, int]]:
+    """
+    Функция профилирования импорта модуля в чистом интерпретаторе
+    :param module: Имя импортируемого модуля
+    :return: Список кортежей (модуль, собственное время, суммарное время в мкс, глубина вложенности)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    imports = profile_import(args.module)
+    total_ms = sum(self_us for _, self_us, _, _ in imports) / 1000
+    print(f"Импорт {args.module}: {total_ms:.1f} мс (бюджет {args.budget_ms:.0f} мс)")
+    print("Самые дорогие модули (суммарно, верхний уровень вложенности ≤ 3):")
+    top_level = [item for item in imports if item[3] <= 3]
+    for name, _, cumulative_us, _ in sorted(top_level, key=lambda item: -item[2])[
+        : args.top
+    ]:
+        print(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+    if total_ms > args.budget_ms:
+        print("Бюджет времени старта превышен")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Бенчмарк скорости создания экземпляров UserPublic.
+Сравнивает прежнюю схему (re.match с литеральным шаблоном и EmailStr) с текущей
+(скомпилированные регулярные выражения и проверка почты только по синтаксису).
+
+Запуск: python -m benchmarks.bench_user_public
+"""
+
+import re
+import time
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
+from pydantic.alias_generators import to_camel
+
+from apps.user.schemas import UserPublic
+
+USER_DATA = {
+    "id": 1,
+    "name": "John",
+    "age": 35,
+    "is_supervisor": True,
+    "email": "johndoe@mail.com",
+    "phone_number": "+8 (800) 555-35-35",
+}
+
+
+class LegacyUserPublic(BaseModel):
+    """Схема UserPublic в прежнем виде (копия исходной модели вместе с ограничениями Field)"""
+
+    id: int | None = Field(
+        default=None,
+        title="Уникальный идентификатор пользователя",
+        description="Позволяет упорядочить пользователей",
+    )
+    name: str | None = Field(
+        default=None,
+        min_length=1,
+        max_length=50,
+        title="Имя пользователя",
+        description="Имя пользователя",
+    )
+    age: int | None = Field(
+        default=None, gt=0, title="Возраст", description="Возраст пользователя"
+    )
+    is_supervisor: bool | None = Field(
+        default=None,
+        title="Является ли админом",
+        description="Проверка на суперпользователя",
+    )
+    email: EmailStr | None = Field(
+        default=None, title="Электронная почта", description="Электронная почта"
+    )
+    phone_number: str | None = Field(
+        default=None, title="Номер телефона", description="Номер телефона"
+    )
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    @field_validator("phone_number")
+    @classmethod
+    def validate_phone_number(cls, value: str) -> str:
+        if not re.match(r"^\+\d{1} \(\d{3}\) \d{3}-\d{2}-\d{2}$", value):
+            raise ValueError(
+                "Номер телефона должен соответствовать формату: +7 (000) 000-00-00"
+            )
+        return value
+
+
+def constructions_per_second(model, iterations: int = 20000) -> float:
+    """
+    Функция измерения количества созданий модели в секунду
+    :param model: Класс Pydantic модели
+    :param iterations: Количество созданий модели
+    :return: Количество созданий в секунду
+    """
+    for _ in range(1000):  # Прогрев
+        model(**USER_DATA)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model(**USER_DATA)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    before = constructions_per_second(LegacyUserPublic)
+    after = constructions_per_second(UserPublic)
+    print(f"До (EmailStr, re.match):        {before:12.0f} UserPublic/с")
+    print(f"После (re.compile, синтаксис): {after:12.0f} UserPublic/с")
+    print(f"Ускорение: x{after / before:.2f}")
+
+
+if __name__ == "__main__":
+    main()
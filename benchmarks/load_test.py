@@ -0,0 +1,79 @@
+"""
+Нагрузочный тест HTTP-эндпоинта.
+Держит заданное количество одновременных запросов в течение заданного времени и выводит
+пропускную способность (запросов в секунду) и перцентили задержки.
+
+Запуск: python -m benchmarks.load_test http://127.0.0.1:8000/auth/suc_auth -c 64 -d 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(
+    client: httpx.AsyncClient, url: str, deadline: float, latencies, errors
+):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(e)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def load_test(url: str, concurrency: int, duration: float) -> dict:
+    """
+    Функция нагрузочного тестирования
+    :param url: Адрес тестируемого эндпоинта
+    :param concurrency: Количество одновременных запросов
+    :param duration: Длительность теста в секундах
+    :return: Словарь с результатами теста
+    """
+    latencies: list[float] = []
+    errors: list = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(
+                worker(client, url, deadline, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    )
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / duration,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=64)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    result = asyncio.run(load_test(args.url, args.concurrency, args.duration))
+    print(
+        f"{result['requests']} запросов, {result['errors']} ошибок, "
+        f"{result['rps']:.0f} запросов/с, p50 {result['p50_ms']:.1f} мс, "
+        f"p99 {result['p99_ms']:.1f} мс"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Набор микробенчмарков горячих путей приложения с машиночитаемыми результатами
+и режимом сравнения с базовым прогоном.
+
+Измеряются: verify_password, create_access_token, verify_token, поиск в UsersStore
+на хранилищах разного размера, валидация UserPublic, эндпоинт /integration/json
+с заглушкой вместо внешнего API и сжатие списка пользователей доступными кодировками.
+Сеть и внешние сервисы не нужны.
+
+Каждая метрика - время одной операции в наносекундах (меньше - лучше): число повторов
+подбирается так, чтобы серия длилась не меньше --min-time секунд, из --repeat серий
+берется лучшая. Бенчмарки сжатия дополнительно сохраняют размер сжатого тела (bytes)
+и степень сжатия (ratio), чтобы сравнивать затраты процессора с экономией трафика.
+
+Запуск:
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.1
+Во втором случае процесс завершается с кодом 1, если какая-либо метрика стала медленнее
+базовой больше чем на threshold (доля).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Callable
+from unittest import mock
+
+# Обязательные настройки приложения для запуска без .env. Задаются в main, а не при импорте,
+# чтобы импорт модуля (например, в тестах) не менял окружение процесса
+DEFAULT_ENV = {
+    "SECRET_KEY": "benchmark-secret-key",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "3",
+}
+
+STORE_SIZES = (1_000, 10_000, 100_000)
+
+USER_DATA = {
+    "id": 1,
+    "name": "John",
+    "age": 35,
+    "is_supervisor": True,
+    "email": "johndoe@mail.com",
+    "phone_number": "+8 (800) 555-35-35",
+}
+
+
+def measure(run_batch: Callable[[int], float], min_time: float, repeat: int) -> float:
+    """
+    Функция измерения времени одной операции
+    :param run_batch: Функция, выполняющая операцию n раз и возвращающая затраченное время
+    :param min_time: Минимальная длительность серии в секундах
+    :param repeat: Количество серий
+    :return: Лучшее время одной операции в наносекундах
+    """
+    number = 1
+    while True:
+        elapsed = run_batch(number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number *= 2 if elapsed < min_time / 10 else 1 + int(min_time / elapsed)
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, run_batch(number) / number)
+    return best * 1e9
+
+
+def sync_batch(func: Callable[[], object]) -> Callable[[int], float]:
+    def run_batch(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+
+    return run_batch
+
+
+def async_batch(loop: asyncio.AbstractEventLoop, func) -> Callable[[int], float]:
+    async def run(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    return lambda number: loop.run_until_complete(run(number))
+
+
+def make_users(count: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "username": f"username_{i}",
+            "name": f"User_{i}",
+            "age": 18 + i % 60,
+            "is_supervisor": i % 10 == 0,
+            "email": f"user_{i}@domain{i % 20}.com",
+        }
+        for i in range(count)
+    ]
+
+
+def auth_benchmarks(loop, stack: ExitStack) -> dict[str, Callable[[int], float]]:
+    from starlette.requests import Request
+
+    from apps.auth.services import (
+        create_access_token,
+        hash_password,
+        verify_password,
+        verify_token,
+    )
+    from apps.user.repository import UsersStore
+    from apps.user.services import AsyncDatabaseConnection
+    from settings.settings import get_settings
+
+    settings = get_settings()
+    hashed = hash_password("password")
+    store = UsersStore([{"id": 1, "username": "johndoe", "hashed_password": hashed}])
+    connection = AsyncDatabaseConnection("benchmark", store, latency=0)
+    request = Request({"type": "http", "headers": []})
+    token = loop.run_until_complete(create_access_token(settings, {"sub": "johndoe"}))
+    return {
+        "auth.verify_password": sync_batch(lambda: verify_password("password", hashed)),
+        "auth.create_access_token": async_batch(
+            loop, lambda: create_access_token(settings, {"sub": "johndoe"})
+        ),
+        "auth.verify_token": async_batch(
+            loop, lambda: verify_token(settings, token, request, connection)
+        ),
+    }
+
+
+def store_benchmarks(loop, stack: ExitStack) -> dict[str, Callable[[int], float]]:
+    from apps.user.repository import UsersStore
+
+    benchmarks = {}
+    for size in STORE_SIZES:
+        store = UsersStore(make_users(size))
+        middle = size // 2
+        benchmarks[f"store.get_by_id[{size}]"] = sync_batch(
+            lambda store=store, middle=middle: store.get_by_id(middle)
+        )
+        benchmarks[f"store.get_by_username[{size}]"] = sync_batch(
+            lambda store=store, middle=middle: store.get_by_username(
+                f"username_{middle}"
+            )
+        )
+        benchmarks[f"store.search[{size}]"] = sync_batch(
+            lambda store=store: store.search(
+                age_min=30, age_max=40, is_supervisor=True, limit=100
+            )
+        )
+    return benchmarks
+
+
+def schema_benchmarks(loop, stack: ExitStack) -> dict[str, Callable[[int], float]]:
+    from apps.user.schemas import UserPublic
+
+    return {
+        "schemas.UserPublic": sync_batch(lambda: UserPublic(**USER_DATA)),
+        "schemas.UserPublic.model_validate": sync_batch(
+            lambda: UserPublic.model_validate(USER_DATA)
+        ),
+    }
+
+
+def integration_benchmarks(loop, stack: ExitStack) -> dict[str, Callable[[int], float]]:
+    from httpx import ASGITransport, AsyncClient
+
+    from apps.external_API.resilience import reset_upstream_client
+    from main import app
+
+    posts = [
+        {"userId": i // 10 + 1, "id": i, "title": f"title {i}", "body": "body " * 20}
+        for i in range(1, 101)
+    ]
+
+    async def fake_fetch_data(url, params=None, **kwargs):
+        start = (params or {}).get("_start", 0)
+        for post in posts[start : start + (params or {}).get("_limit", len(posts))]:
+            yield post
+
+    # Заглушка внешнего API остается на время всех прогонов и снимается по их завершении
+    stack.enter_context(
+        mock.patch(
+            "apps.external_API.resilience.fetch_data", side_effect=fake_fetch_data
+        )
+    )
+    reset_upstream_client()
+    client = AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://benchmark/integration"
+    )
+    return {
+        "integration.json[limit=10]": async_batch(
+            loop, lambda: client.get("/json?offset=1&limit=10")
+        ),
+        "integration.json[limit=100,fields]": async_batch(
+            loop, lambda: client.get("/json?offset=1&limit=100&fields=id,title")
+        ),
+    }
+
+
+def compression_benchmarks(loop, stack: ExitStack) -> dict[str, Callable[[int], float]]:
+    from apps.compression.services import compress_body, get_compressors
+    from apps.user.schemas import UserPublicListAdapter
+
+    body = UserPublicListAdapter.dump_json(
+        UserPublicListAdapter.validate_python(make_users(1_000)), by_alias=True
+    )
+    variants = {
+        f"gzip[level={level}]": get_compressors(["gzip"], gzip_level=level)["gzip"]
+        for level in (1, 6, 9)
+    }
+    variants.update(
+        (f"{encoding}[default]", factory)
+        for encoding, factory in get_compressors(["br", "zstd"]).items()
+    )
+    benchmarks = {}
+    for variant, factory in variants.items():
+        run_batch = sync_batch(lambda factory=factory: compress_body(factory, body))
+        size = len(compress_body(factory, body))
+        run_batch.extra = {"bytes": size, "ratio": round(len(body) / size, 2)}
+        benchmarks[f"compression.{variant}"] = run_batch
+    return benchmarks
+
+
+GROUPS = {
+    "auth": auth_benchmarks,
+    "store": store_benchmarks,
+    "schemas": schema_benchmarks,
+    "integration": integration_benchmarks,
+    "compression": compression_benchmarks,
+}
+
+
+def run(
+    groups: list[str], pattern: str | None, min_time: float, repeat: int
+) -> dict[str, dict[str, float]]:
+    """
+    Функция прогона бенчмарков
+    :param groups: Группы бенчмарков
+    :param pattern: Подстрока имени метрики для выбора бенчмарков
+    :param min_time: Минимальная длительность серии в секундах
+    :param repeat: Количество серий
+    :return: Словарь {имя метрики: {"ns_per_op": время операции в нс, ...}}
+    """
+    results = {}
+    loop = asyncio.new_event_loop()
+    try:
+        with ExitStack() as stack:
+            for group in groups:
+                for name, run_batch in GROUPS[group](loop, stack).items():
+                    if pattern and pattern not in name:
+                        continue
+                    results[name] = {"ns_per_op": measure(run_batch, min_time, repeat)}
+                    extra = getattr(run_batch, "extra", {})
+                    results[name].update(extra)
+                    details = " ".join(f"{key}={value}" for key, value in extra.items())
+                    print(
+                        f"{name:40} {format_ns(results[name]['ns_per_op']):>12} {details}"
+                    )
+    finally:
+        loop.close()
+    return results
+
+
+def compare(
+    baseline: dict[str, dict[str, float]],
+    current: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[tuple[str, float, float, float]]:
+    """
+    Функция поиска регрессий относительно базового прогона
+    :param baseline: Результаты базового прогона
+    :param current: Результаты текущего прогона
+    :param threshold: Допустимое замедление (доля, 0.1 - на 10%)
+    :return: Список регрессий (метрика, базовое время, текущее время, отношение)
+    """
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["ns_per_op"], result["ns_per_op"]
+        ratio = after / before
+        if ratio > 1 + threshold:
+            regressions.append((name, before, after, ratio))
+    return regressions
+
+
+def format_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="Файл для сохранения результатов в JSON")
+    parser.add_argument("--compare", help="Файл с результатами базового прогона")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--group", action="append", choices=sorted(GROUPS))
+    parser.add_argument("--filter", help="Подстрока имени метрики")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    for name, value in DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
+
+    results = run(args.group or list(GROUPS), args.filter, args.min_time, args.repeat)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(
+                f"РЕГРЕССИЯ {name}: {format_ns(before)} -> {format_ns(after)} "
+                f"(x{ratio:.2f})"
+            )
+        if regressions:
+            return 1
+        print(f"Регрессий больше {args.threshold:.0%} нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
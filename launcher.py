@@ -0,0 +1,80 @@
+"""
+Production-точка входа приложения.
+
+В отличие от запуска main.py (reload, debug-логирование, один процесс), лаунчер поднимает
+несколько воркеров uvicorn с циклом событий uvloop и HTTP-парсером httptools, отключает
+access-логи на горячем пути и берет backlog/keep-alive из настроек (.env):
+WEB_HOST, WEB_PORT, WEB_WORKERS, WEB_BACKLOG, WEB_KEEPALIVE.
+
+Количество воркеров по умолчанию равно количеству CPU. По умолчанию хранилище UsersStore
+живет внутри процесса, поэтому при WEB_WORKERS > 1 у каждого воркера свои данные.
+С USERS_STORE_BACKEND=shared лаунчер создает сегмент разделяемой памяти до запуска воркеров,
+воркеры подключаются к нему, а после остановки сервера сегмент удаляется.
+
+Прирост пропускной способности измеряется нагрузочным тестом benchmarks/load_test.py:
+    WEB_WORKERS=1 python launcher.py
+    python -m benchmarks.load_test http://127.0.0.1:8000/auth/suc_auth
+и повторный замер с WEB_WORKERS, равным количеству CPU.
+"""
+
+import logging
+import os
+from importlib.util import find_spec
+from typing import Any
+
+from uvicorn import run
+
+from settings.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_workers_count(settings: Settings) -> int:
+    """
+    Функция определения количества воркеров
+    :param settings: Объект-настройки для взаимодействия с переменными окружения из .env-файла
+    :return: WEB_WORKERS, если задан, иначе количество CPU
+    """
+    return settings.WEB_WORKERS or os.cpu_count() or 1
+
+
+def get_uvicorn_options(settings: Settings) -> dict[str, Any]:
+    """
+    Функция формирования параметров запуска uvicorn для production
+    :param settings: Объект-настройки для взаимодействия с переменными окружения из .env-файла
+    :return: Словарь с именованными аргументами для uvicorn.run
+    """
+    return {
+        "host": settings.WEB_HOST,
+        "port": settings.WEB_PORT,
+        "workers": get_workers_count(settings),
+        "loop": "uvloop" if find_spec("uvloop") else "asyncio",
+        "http": "httptools" if find_spec("httptools") else "h11",
+        "backlog": settings.WEB_BACKLOG,
+        "timeout_keep_alive": settings.WEB_KEEPALIVE,
+        "access_log": False,
+        "log_level": "warning",
+        "reload": False,
+    }
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    options = get_uvicorn_options(settings)
+    shared_store = None
+    if settings.USERS_STORE_BACKEND == "shared":
+        from apps.user.repository import SharedUsersStore
+
+        shared_store = SharedUsersStore(
+            settings.USERS_SHM_NAME, settings.USERS_SHM_SIZE
+        )
+    elif options["workers"] > 1:
+        logger.warning(
+            "Запущено %s воркеров: хранилище пользователей не разделяется между процессами",
+            options["workers"],
+        )
+    try:
+        run(app="main:app", **options)
+    finally:
+        if shared_store is not None:
+            shared_store.close()
@@ -1,28 +1,88 @@
+import signal
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from uvicorn import run
 
 from apps.user.controllers import user_router, middleware_protected_app
+from apps.user.imports import close_hash_executor
+from apps.user.repository import close_users_store, reset_users_store
 from apps.auth.controllers import auth_router
+from apps.compression.services import CompressionMiddleware
 from apps.external_API.controllers import external_API_router
+from apps.external_API.services import close_http_client
+from apps.jobs.controllers import jobs_router
+from apps.jobs.services import close_job_queue
+from apps.monitoring.admission import AdmissionControlMiddleware
+from apps.monitoring.blocking import start_blocking_detector, stop_blocking_detector
+from apps.monitoring.controllers import monitoring_router
+from apps.monitoring.profiler import install_profiler_signal
+from apps.monitoring.services import ServerTimingMiddleware
+from settings.logger import setup_logging
+from settings.settings import get_settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Жизненный цикл приложения. Настройки загружаются один раз при старте, логирование
+    в формате JSON пишется в stdout фоновым потоком через очередь, HTTP-клиент
+    для внешнего API закрывается при остановке. Если включен профилировщик, сигнал SIGUSR2
+    запускает профилирование с сохранением профиля в файл. Детектор блокировок цикла событий
+    работает от старта до остановки приложения. Хранилище пользователей создается при старте
+    и передается в обработчики через зависимость get_users_store;
+    при остановке процесс отключается от общего хранилища, если оно используется, а воркеры
+    очереди фоновых задач останавливаются.
+    """
+    settings = get_settings()
+    log_listener = setup_logging(settings.LOG_LEVEL, settings.LOG_DEBUG_SAMPLE_EVERY)
+    reset_users_store()
+    if settings.PROFILER_ENABLED:
+        install_profiler_signal(
+            signal.SIGUSR2,
+            settings.PROFILER_SIGNAL_SECONDS,
+            settings.PROFILER_OUTPUT_DIR,
+        )
+    if settings.BLOCKING_DETECTOR_ENABLED:
+        start_blocking_detector(settings.BLOCKING_THRESHOLD_MS / 1000)
+    try:
+        yield
+    finally:
+        stop_blocking_detector()
+        await close_job_queue()
+        close_hash_executor()
+        await close_http_client()
+        close_users_store()
+        log_listener.stop()
 
 
 app = FastAPI(
+    lifespan=lifespan,
     description="""
     Приложение содержит защищенное подприложение по маршруту /protected_user. Для доступа необходимо получить токен доступа.
     Среди не защищенных маршрутов находятся:
     /docs - Документация Swagger
     /redoc - альтернативная документация
-    """
+    """,
 )
 
+# Сжатие - внутренний слой: его время попадает в Server-Timing как этап compress.
+# Управление допуском отклоняет лишние запросы до сжатия, но после начала замера Server-Timing
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
 app.include_router(user_router, prefix="/user")
 app.include_router(auth_router, prefix="/auth")
 app.include_router(external_API_router, prefix="/integration")
+app.include_router(monitoring_router, prefix="/monitoring")
+app.include_router(jobs_router, prefix="/jobs")
 
 app.mount("/protected_user", middleware_protected_app)
 
 
 if __name__ == "__main__":
+    from uvicorn import run
+
     run(
         app="main:app",
         reload=True,
@@ -0,0 +1,99 @@
+import copy
+import itertools
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+# Стандартные атрибуты LogRecord. Все остальные атрибуты записи попадают в JSON как поля события
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись лога в одну строку JSON, включая поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class JsonQueueHandler(QueueHandler):
+    """
+    QueueHandler, сохраняющий exc_info записи. Стандартный prepare добавляет трассировку к тексту
+    сообщения и очищает exc_info; здесь трассировку форматирует JsonFormatter в потоке
+    QueueListener и записывает в отдельное поле exc_info
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Фильтр сэмплирования отладочных событий: пропускает каждую sample_every-ю запись уровня DEBUG,
+    записи остальных уровней пропускаются всегда
+    """
+
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = sample_every
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        return next(self._counter) % self.sample_every == 0
+
+
+def setup_logging(
+    level: str = "INFO",
+    debug_sample_every: int = 1,
+    stream: TextIO | None = None,
+    logger_name: str = "apps",
+) -> QueueListener:
+    """
+    Функция настройки неблокирующего логирования. Обработчики на пути запроса только кладут запись
+    в очередь, форматирование в JSON и запись в stdout выполняет фоновый поток QueueListener.
+    :param level: Уровень логирования
+    :param debug_sample_every: Из скольких отладочных записей сохраняется одна
+    :param stream: Поток вывода, по умолчанию stdout
+    :param logger_name: Имя настраиваемого логгера
+    :return: Запущенный QueueListener. Его нужно остановить при завершении приложения
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = JsonQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_every))
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    logger = logging.getLogger(logger_name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
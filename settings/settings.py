@@ -1,10 +1,11 @@
 from functools import lru_cache
-from typing import Annotated
+from typing import Annotated, Literal
 
 from fastapi import Depends
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
@@ -18,6 +19,68 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
+    BCRYPT_ROUNDS: int = Field(default=12, ge=4, le=31)
+    WEB_HOST: str = Field(default="0.0.0.0")
+    WEB_PORT: int = Field(default=8000)
+    WEB_WORKERS: int | None = Field(default=None, ge=1)
+    WEB_BACKLOG: int = Field(default=2048, ge=1)
+    WEB_KEEPALIVE: int = Field(default=5, ge=1)
+    SERVER_TIMING_ENABLED: bool = Field(default=False)
+    PROFILER_ENABLED: bool = Field(default=False)
+    PROFILER_SIGNAL_SECONDS: float = Field(default=10, gt=0)
+    PROFILER_OUTPUT_DIR: str = Field(default_factory=tempfile.gettempdir)
+    BLOCKING_DETECTOR_ENABLED: bool = Field(default=False)
+    BLOCKING_THRESHOLD_MS: float = Field(default=100, gt=0)
+    ADMISSION_ENABLED: bool = Field(default=True)
+    ADMISSION_AUTH_CONCURRENCY: int = Field(default=4, ge=1)
+    ADMISSION_AUTH_QUEUE: int = Field(default=32, ge=0)
+    ADMISSION_AUTH_TIMEOUT: float = Field(default=1, gt=0)
+    ADMISSION_USER_READ_CONCURRENCY: int = Field(default=256, ge=1)
+    ADMISSION_USER_READ_QUEUE: int = Field(default=1024, ge=0)
+    ADMISSION_USER_READ_TIMEOUT: float = Field(default=2, gt=0)
+    ADMISSION_USER_WRITE_CONCURRENCY: int = Field(default=32, ge=1)
+    ADMISSION_USER_WRITE_QUEUE: int = Field(default=256, ge=0)
+    ADMISSION_USER_WRITE_TIMEOUT: float = Field(default=2, gt=0)
+    ADMISSION_INTEGRATION_CONCURRENCY: int = Field(default=32, ge=1)
+    ADMISSION_INTEGRATION_QUEUE: int = Field(default=128, ge=0)
+    ADMISSION_INTEGRATION_TIMEOUT: float = Field(default=2, gt=0)
+    USERS_STORE_BACKEND: Literal["memory", "shared"] = Field(default="memory")
+    USERS_SHM_NAME: str = Field(default="users_store")
+    USERS_SHM_SIZE: int = Field(default=64 * 1024 * 1024, gt=48)
+    USERS_RESPONSE_CACHE_SIZE: int = Field(default=1024, ge=0)
+    JOBS_WORKERS: int = Field(default=4, ge=1)
+    JOBS_RETRIES: int = Field(default=2, ge=0)
+    JOBS_RETRY_BACKOFF: float = Field(default=0.5, ge=0)
+    JOBS_MAX_FINISHED: int = Field(default=1000, ge=0)
+    IMPORT_BATCH_SIZE: int = Field(default=1000, ge=1)
+    IMPORT_HASH_WORKERS: int | None = Field(default=None, ge=1)
+    IMPORT_MAX_ERRORS: int = Field(default=100, ge=0)
+    IMPORT_CHUNK_SIZE: int = Field(default=64 * 1024, ge=1)
+    COMPRESSION_ENABLED: bool = Field(default=True)
+    COMPRESSION_MIN_SIZE: int = Field(default=1024, ge=0)
+    COMPRESSION_THREAD_MIN_SIZE: int = Field(default=64 * 1024, ge=0)
+    COMPRESSION_ENCODINGS: list[Literal["zstd", "br", "gzip"]] = Field(
+        default=["zstd", "br", "gzip"]
+    )
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6, ge=1, le=9)
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4, ge=0, le=11)
+    COMPRESSION_ZSTD_LEVEL: int = Field(default=3, ge=1, le=22)
+    COMPRESSION_CACHE_MAX_BYTES: int = Field(default=16 * 1024 * 1024, ge=0)
+    LOG_LEVEL: str = Field(default="INFO")
+    LOG_DEBUG_SAMPLE_EVERY: int = Field(default=100, ge=1)
+    UPSTREAM_BASE_URL: str = Field(default="https://jsonplaceholder.typicode.com")
+    UPSTREAM_CONCURRENCY: int = Field(default=4, ge=1)
+    UPSTREAM_ATTEMPT_TIMEOUT: float = Field(default=2, gt=0)
+    UPSTREAM_RETRIES: int = Field(default=2, ge=0)
+    UPSTREAM_BACKOFF_BASE: float = Field(default=0.1, ge=0)
+    UPSTREAM_BACKOFF_MAX: float = Field(default=1, ge=0)
+    UPSTREAM_BREAKER_THRESHOLD: int = Field(default=5, ge=1)
+    UPSTREAM_BREAKER_RESET_SECONDS: float = Field(default=30, gt=0)
+    UPSTREAM_CACHE_SIZE: int = Field(default=128, ge=0)
+    UPSTREAM_CACHE_MAX_ITEMS: int = Field(default=1000, ge=0)
+    UPSTREAM_DISK_CACHE_DIR: str | None = Field(default=None)
+    UPSTREAM_DISK_CACHE_MAX_BYTES: int = Field(default=64 * 1024 * 1024, ge=0)
+    UPSTREAM_DISK_CACHE_TTL: float = Field(default=300, ge=0)
 
     model_config = SettingsConfigDict(
         env_file=f"{os.path.dirname(os.path.abspath(__file__))}/../.env"
@@ -38,12 +101,14 @@ class Settings(BaseSettings):
         )
 
 
-settings = Settings()
-
-
 @lru_cache()
 def get_settings():
-    return settings
+    """
+    Функция получения настроек. Настройки читаются из окружения один раз, при первом вызове
+    (в lifespan приложения), а не при импорте модуля.
+    :return: Объект-настройки
+    """
+    return Settings()
 
 
 SettingsDep = Annotated[Settings, Depends(get_settings)]
@@ -1,18 +1,64 @@
+import os
 from dataclasses import dataclass
 
 import pytest
 import pytest_asyncio
 
+from apps.external_API.resilience import reset_upstream_client
+from apps.user.repository import UsersStore, reset_users_store
+from apps.jobs.services import reset_job_queue
 from apps.user.services import get_connection, AsyncDatabaseConnection
 from apps.user.schemas import UserPublic
 from apps.user.routers import middleware_protected_app
 from apps.auth.services import verify_token
 from apps.auth.schemas import TokenData
-from settings.settings import settings as project_settings
+from settings.settings import get_settings
 from main import app
 import asyncio
 
 
+def pytest_configure(config):
+    """
+    Обязательные настройки приложения для запуска тестов без .env и минимальная стоимость bcrypt:
+    хэширование паролей не должно занимать время тестов. Задаются до первого обращения
+    к настройкам: импорт модулей приложения настройки не читает
+    """
+    for name, value in {
+        "SECRET_KEY": "test-secret-key",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+        "REFRESH_TOKEN_EXPIRE_DAYS": "3",
+        "BCRYPT_ROUNDS": "4",
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+# Первые посты внешнего API (jsonplaceholder), остальные генерируются заглушкой
+UPSTREAM_POSTS = [
+    {
+        "userId": 1,
+        "id": 1,
+        "title": "sunt aut facere repellat provident occaecati excepturi optio reprehenderit",
+        "body": "quia et suscipit\nsuscipit recusandae consequuntur expedita et cum\nreprehenderit molestiae ut ut quas totam\nnostrum rerum est autem sunt rem eveniet architecto",
+    },
+    {
+        "userId": 1,
+        "id": 2,
+        "title": "qui est esse",
+        "body": "est rerum tempore vitae\nsequi sint nihil reprehenderit dolor beatae ea dolores neque\nfugiat blanditiis voluptate porro vel nihil molestiae ut reiciendis\nqui aperiam non debitis possimus qui neque nisi nulla",
+    },
+    {
+        "userId": 1,
+        "id": 3,
+        "title": "ea molestias quasi exercitationem repellat qui ipsa sit aut",
+        "body": "et iusto sed quo iure\nvoluptatem occaecati omnis eligendi aut ad\nvoluptatem doloribus vel accusantium quis pariatur\nmolestiae porro eius odio et labore et velit aut",
+    },
+] + [
+    {"userId": i // 10 + 1, "id": i, "title": f"title {i}", "body": f"body {i}"}
+    for i in range(4, 101)
+]
+
+
 @pytest_asyncio.fixture
 def settings():
     """
@@ -37,14 +83,28 @@ def settings():
     return settings_instance
 
 
+@pytest.fixture(autouse=True)
+def users_store():
+    """
+    Фикстура, автоматически срабатывающая перед каждым тестом и подменяющая хранилище приложения
+    пустым. Тесты не видят данных друг друга и могут выполняться параллельно (pytest -n auto)
+    :return: Хранилище пользователей теста
+    """
+    store = reset_users_store(UsersStore())
+    yield store
+    reset_users_store(UsersStore())
+
+
 @pytest_asyncio.fixture
-async def connection():
+async def connection(users_store):
     """
-    Фикстура, возвращающая асинхронное подключение к БД
+    Фикстура, возвращающая асинхронное подключение к БД без имитации задержек
+    :param users_store: Хранилище пользователей теста
     :return: Подключение для взаимодействия с тестировочной БД
     """
-    async with AsyncDatabaseConnection(project_settings.test_db_url) as connection:
-        await asyncio.sleep(0.01)
+    async with AsyncDatabaseConnection(
+        get_settings().test_db_url, users_store, latency=0
+    ) as connection:
         yield connection
 
 
@@ -120,3 +180,45 @@ def override_dependencies(connection, protection):
     yield
     app.dependency_overrides.clear()
     middleware_protected_app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def upstream_client():
+    """
+    Фикстура, автоматически срабатывающая перед каждым тестом и сбрасывающая клиент внешнего API,
+    чтобы кэш и состояние выключателя не переходили между тестами
+    """
+    reset_upstream_client()
+    yield
+    reset_upstream_client()
+
+
+@pytest.fixture(autouse=True)
+def job_queue():
+    """
+    Фикстура, автоматически срабатывающая перед каждым тестом и сбрасывающая очередь фоновых задач,
+    чтобы задачи и воркеры не переходили между тестами
+    """
+    reset_job_queue()
+    yield
+    reset_job_queue()
+
+
+@pytest.fixture
+def stub_upstream(mocker):
+    """
+    Фикстура, подменяющая внешний API локальной заглушкой с постами UPSTREAM_POSTS.
+    Поддерживает параметры пагинации _start и _limit
+    :return: Мок функции fetch_data
+    """
+
+    async def fake_fetch_data(url, params=None, **kwargs):
+        params = params or {}
+        start = params.get("_start", 0)
+        end = start + params["_limit"] if "_limit" in params else None
+        for post in UPSTREAM_POSTS[start:end]:
+            yield post
+
+    return mocker.patch(
+        "apps.external_API.resilience.fetch_data", side_effect=fake_fetch_data
+    )
@@ -1,9 +1,46 @@
+import asyncio
+import zlib
+
 import pytest
 from httpx import AsyncClient, ASGITransport
+from starlette.applications import Starlette
 from main import app
+import apps.compression.services
+from apps.user.schemas import UserPublic
+from apps.user.services import get_connection
+from apps.monitoring.services import ServerTimingMiddleware
+from apps.monitoring.admission import (
+    AdmissionControlMiddleware,
+    AdmissionController,
+    AdmissionLimiter,
+)
+from settings.settings import get_settings
+from apps.monitoring.blocking import start_blocking_detector, stop_blocking_detector
+import time
 from pytest import mark
 
 
+async def wait_for_job(ac, job_id, timeout=10):
+    """
+    Функция ожидания завершения фоновой задачи
+    :param ac: Клиент приложения
+    :param job_id: Идентификатор задачи
+    :param timeout: Максимальное время ожидания в секундах
+    :return: Ответ эндпоинта состояния задачи
+    """
+    for _ in range(int(timeout / 0.02)):
+        response = await ac.get(f"http://test/jobs/{job_id}")
+        if response.json()["status"] in ("succeeded", "failed", "cancelled"):
+            return response
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Задача {job_id} не завершилась")
+
+
+async def create_users(ac, users):
+    response = await ac.post("http://test/user/users/", json=users)
+    return await wait_for_job(ac, response.json()["jobId"])
+
+
 @mark.services
 @mark.database
 @mark.controllers
@@ -76,8 +113,40 @@ async def test_create_users_success(list_of_user_create):
         transport=ASGITransport(app=app), base_url="http://test/user"
     ) as ac:
         response = await ac.post("/users/", json=list_of_user_create)
-    assert response.status_code == 200
-    assert "users_created" in response.json()
+        job = await wait_for_job(ac, response.json()["jobId"])
+    assert response.status_code == 202
+    assert job.json()["status"] == "succeeded"
+    assert job.json()["result"]["ids"] == [0, 1, 2, 3, 4]
+    assert "hashed_password" not in job.text
+    assert job.json()["progress"] == {"rows": 5, "created": 5, "failed": 0}
+    for i in range(5):
+        async with AsyncClient(  # Удаляем пользователей
+            transport=ASGITransport(app=app), base_url="http://test/user"
+        ) as ac:
+            await ac.delete(f"/users/{i}")
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_create_users_partial_errors(list_of_user_create):
+    list_of_user_create[2]["age"] = 0
+    list_of_user_create[3]["phone_number"] = (
+        "bad"  # Ошибка пользовательского валидатора
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        response = await ac.post("/users/", json=list_of_user_create)
+        job = await wait_for_job(ac, response.json()["jobId"])
+    assert response.status_code == 202
+    assert job.status_code == 200
+    result = job.json()["result"]
+    assert (result["created"], result["failed"], result["ids"]) == (3, 2, [0, 1, 4])
+    assert result["errors"][0]["index"] == 2
+    assert result["errors"][0]["errors"][0]["loc"] == ["age"]
+    assert result["errors"][1]["errors"][0]["loc"] == ["phone_number"]
     for i in range(5):
         async with AsyncClient(  # Удаляем пользователей
             transport=ASGITransport(app=app), base_url="http://test/user"
@@ -156,6 +225,52 @@ async def test_read_user_no_user_found(user_public, mocker):
     }
 
 
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_users_by_ids_success(list_of_user_create, mocker):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        await create_users(ac, list_of_user_create)
+    mocker.patch(
+        "apps.user.routers.jwt.decode",
+        return_value={"sub": "username", "type": "bearer"},
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/protected_user"
+    ) as ac:
+        get_response = await ac.get("/users/?ids=3&ids=77&ids=0")
+        post_response = await ac.post("/users/batch", json=[3, 77, 0])
+    assert get_response.status_code == 200
+    assert [user["id"] for user in get_response.json()["found"]] == [3, 0]
+    assert get_response.json()["missing"] == [77]
+    assert "hashedPassword" not in get_response.json()["found"][0]
+    assert post_response.status_code == 200
+    assert post_response.json() == get_response.json()
+    for i in range(5):
+        async with AsyncClient(  # Удаляем пользователей
+            transport=ASGITransport(app=app), base_url="http://test/user"
+        ) as ac:
+            await ac.delete(f"/users/{i}")
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_users_by_ids_no_ids_passed(mocker):
+    mocker.patch(
+        "apps.user.routers.jwt.decode",
+        return_value={"sub": "username", "type": "bearer"},
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/protected_user"
+    ) as ac:
+        response = await ac.get("/users/")
+    assert response.status_code == 422
+
+
 @mark.services
 @mark.database
 @mark.controllers
@@ -164,7 +279,7 @@ async def test_read_users_list_success(list_of_user_create):
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/user"
     ) as ac:
-        await ac.post("/users/", json=list_of_user_create)
+        await create_users(ac, list_of_user_create)
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/user"
     ) as ac:
@@ -178,6 +293,75 @@ async def test_read_users_list_success(list_of_user_create):
             await ac.delete(f"/users/{i}")
 
 
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_user_not_modified(user_public, mocker):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        data = {"username": "johndoe", "password": "deadpond"}
+        data.update(user_public)
+        await ac.post("/user/", data=data)
+    mocker.patch(
+        "apps.user.routers.jwt.decode",
+        return_value={"sub": "username", "type": "bearer"},
+    )
+    serialize = mocker.spy(UserPublic, "model_dump_json")
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/protected_user"
+    ) as ac:
+        first = await ac.get("/users/1")
+        cached = await ac.get("/users/1")
+        not_modified = await ac.get(
+            "/users/1", headers={"If-None-Match": first.headers["etag"]}
+        )
+    assert first.status_code == 200
+    assert first.headers["etag"] == cached.headers["etag"]
+    assert cached.content == first.content
+    assert first.json()["isSupervisor"] is True
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert serialize.call_count == 1  # Повторные ответы взяты из кэша
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_user_real_connection_dependency(users_store, monkeypatch):
+    # Настоящая зависимость get_connection вместо подмены из conftest
+    monkeypatch.delitem(app.dependency_overrides, get_connection)
+    users_store({"id": 1, "name": "John", "age": 35})
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        response = await ac.get("/users/")
+    assert response.status_code == 200
+    assert [user["name"] for user in response.json()] == ["John"]
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_users_list_etag_changes_after_update(list_of_user_create):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        await create_users(ac, list_of_user_create)
+        first = await ac.get("/users/")
+        etag = first.headers["etag"]
+        not_modified = await ac.get("/users/", headers={"If-None-Match": etag})
+        await ac.patch("/users/1", data={"name": "Smith"})
+        changed = await ac.get("/users/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()[1]["name"] == "Smith"
+
+
 @mark.services
 @mark.database
 @mark.controllers
@@ -199,7 +383,7 @@ async def test_read_users_list_wrong_query(list_of_user_create):
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/user"
     ) as ac:
-        await ac.post("/users/", json=list_of_user_create)
+        await create_users(ac, list_of_user_create)
 
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/user"
@@ -219,6 +403,38 @@ async def test_read_users_list_wrong_query(list_of_user_create):
     }
 
 
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_search_users_success(list_of_user_create):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        await create_users(ac, list_of_user_create)
+        response = await ac.get(
+            "/users/search?age_min=20&age_max=40&email_domain=mail.com&name_prefix=user_"
+        )
+    assert response.status_code == 200
+    assert {user["name"] for user in response.json()} == {"User_1", "User_2", "User_3"}
+    for i in range(5):
+        async with AsyncClient(  # Удаляем пользователей
+            transport=ASGITransport(app=app), base_url="http://test/user"
+        ) as ac:
+            await ac.delete(f"/users/{i}")
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_search_users_wrong_query():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        response = await ac.get("/users/search?age_min=0")
+    assert response.status_code == 422
+
+
 @mark.services
 @mark.database
 @mark.controllers
@@ -295,7 +511,7 @@ async def test_update_user_no_user_found(user_public):
 @mark.database
 @mark.controllers
 @pytest.mark.asyncio
-async def test_update_user_data_passed_is_invalid(user_public):
+async def test_update_user_no_password_passed(user_public):
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/user"
     ) as ac:
@@ -322,15 +538,15 @@ async def test_update_user_data_passed_is_invalid(user_public):
     ) as ac:
         get_response = await ac.get("/users/")
     assert patch_response.status_code == 200
-    assert patch_response.json()["name"] == None
-    assert patch_response.json()["email"] == None
+    assert patch_response.json()["name"] == "Smith"
+    assert patch_response.json()["age"] == 25
     assert get_response.status_code == 200
     assert get_response.json()[0] == {
-        "age": 35,
+        "age": 25,
         "email": "johndoe@mail.com",
         "id": 1,
         "isSupervisor": True,
-        "name": "John",
+        "name": "Smith",
         "phoneNumber": "+8 (800) 555-35-35",
     }
     async with AsyncClient(
@@ -339,6 +555,37 @@ async def test_update_user_data_passed_is_invalid(user_public):
         await ac.delete("/users/1")
 
 
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_update_users_success(list_of_user_create):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        await create_users(ac, list_of_user_create)
+        patch_response = await ac.patch(
+            "/users/",
+            json=[
+                {"id": 1, "name": "Smith"},
+                {"id": 3, "age": 99, "username": "renamed"},
+                {"id": 77, "name": "Nobody"},
+            ],
+        )
+    assert patch_response.status_code == 200
+    updated = patch_response.json()["updated"]
+    assert [(user["id"], user["name"], user["age"]) for user in updated] == [
+        (1, "Smith", 20),
+        (3, "User_3", 99),
+    ]
+    assert patch_response.json()["missing"] == [77]
+    for i in range(5):
+        async with AsyncClient(  # Удаляем пользователей
+            transport=ASGITransport(app=app), base_url="http://test/user"
+        ) as ac:
+            await ac.delete(f"/users/{i}")
+
+
 @mark.services
 @mark.database
 @mark.controllers
@@ -467,7 +714,7 @@ async def test_successfull_auth_success():
 @mark.services
 @mark.controllers
 @pytest.mark.asyncio
-async def test_fetch_external_API_data_success():
+async def test_fetch_external_API_data_success(stub_upstream):
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test/integration"
     ) as ac:
@@ -487,6 +734,72 @@ async def test_fetch_external_API_data_success():
             "title": "qui est esse",
             "body": "est rerum tempore vitae\nsequi sint nihil reprehenderit dolor beatae ea dolores neque\nfugiat blanditiis voluptate porro vel nihil molestiae ut reiciendis\nqui aperiam non debitis possimus qui neque nisi nulla",
         },
+        {
+            "userId": 1,
+            "id": 3,
+            "title": "ea molestias quasi exercitationem repellat qui ipsa sit aut",
+            "body": "et iusto sed quo iure\nvoluptatem occaecati omnis eligendi aut ad\nvoluptatem doloribus vel accusantium quis pariatur\nmolestiae porro eius odio et labore et velit aut",
+        },
+    ]
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_fetch_external_API_data_pagination_and_projection(mocker):
+    posts = [
+        {"userId": 1, "id": i, "title": f"title {i}", "body": "..."}
+        for i in range(5, 9)
+    ]
+
+    async def fake_fetch_data(url, params=None, **kwargs):
+        for post in posts:
+            yield post
+
+    mock = mocker.patch(
+        "apps.external_API.resilience.fetch_data", side_effect=fake_fetch_data
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/integration"
+    ) as ac:
+        response = await ac.get("/json?offset=5&limit=3&fields=id,title")
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": 5, "title": "title 5"},
+        {"id": 6, "title": "title 6"},
+        {"id": 7, "title": "title 7"},
+    ]
+    assert mock.call_args.kwargs["params"] == {"_start": 4, "_limit": 3}
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_aggregate_external_API_data_success(mocker):
+    resources = {
+        "posts": [{"id": 3, "userId": 1, "title": "title 3"}],
+        "users": [{"id": 1, "name": "Leanne Graham"}],
+        "comments": [{"id": 11, "postId": 3, "body": "..."}],
+    }
+
+    async def fake_fetch_data(url, params=None, **kwargs):
+        for item in resources[url.rsplit("/", 1)[1]]:
+            yield item
+
+    mocker.patch("apps.external_API.resilience.fetch_data", side_effect=fake_fetch_data)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/integration"
+    ) as ac:
+        response = await ac.get("/aggregate?offset=3&limit=1")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "id": 3,
+            "userId": 1,
+            "title": "title 3",
+            "author": {"id": 1, "name": "Leanne Graham"},
+            "comments": [{"id": 11, "postId": 3, "body": "..."}],
+        }
     ]
 
 
@@ -511,3 +824,376 @@ async def test_fetch_external_API_data_wrong_query():
             }
         ]
     }
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_server_timing_disabled_by_default():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/auth"
+    ) as ac:
+        response = await ac.get("/suc_auth")
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_server_timing_protected_request(user_public, mocker):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        data = {"username": "johndoe", "password": "deadpond"}
+        data.update(user_public)
+        await ac.post("/user/", data=data)
+    mocker.patch(
+        "apps.user.routers.jwt.decode",
+        return_value={"sub": "username", "type": "bearer"},
+    )
+    timed_app = Starlette()
+    timed_app.add_middleware(ServerTimingMiddleware, enabled=True)
+    timed_app.mount("/", app)
+    async with AsyncClient(
+        transport=ASGITransport(app=timed_app), base_url="http://test/protected_user"
+    ) as ac:
+        response = await ac.get("/users/1")
+    assert response.status_code == 200
+    stages = [
+        metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")
+    ]
+    assert stages == ["jwt", "db", "serialize", "total"]
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        await ac.delete("/users/1")
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_profile_event_loop_disabled():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/monitoring"
+    ) as ac:
+        response = await ac.get("/profile?seconds=0.1")
+    assert response.status_code == 404
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_profile_event_loop_success(mocker):
+    mocker.patch.object(get_settings(), "PROFILER_ENABLED", True)
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/monitoring"
+    ) as ac:
+        response = await ac.get("/profile?seconds=0.1&interval_ms=2")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment")
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert float(response.headers["x-event-loop-lag-max-ms"]) >= 0
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_blocking_call_sites_disabled():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/monitoring"
+    ) as ac:
+        response = await ac.get("/blocking")
+    assert response.status_code == 404
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_blocking_call_sites_success():
+    start_blocking_detector(0.04)
+    try:
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)
+        await asyncio.sleep(0.05)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test/monitoring"
+        ) as ac:
+            response = await ac.get("/blocking")
+    finally:
+        stop_blocking_detector()
+    assert response.status_code == 200
+    assert response.json()["threshold_ms"] == 40
+    [site] = response.json()["call_sites"]
+    assert site["count"] == 1
+    assert "test_read_blocking_call_sites_success" in site["call_site"]
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_users_list_compressed(users_store, mocker):
+    users_store.extend(
+        [
+            {"id": i, "username": f"user_{i}", "name": f"User_{i}", "age": 20 + i % 40}
+            for i in range(200)
+        ]
+    )
+    compress = mocker.spy(apps.compression.services, "compress_body")
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        first = await ac.get("/users/", headers={"Accept-Encoding": "gzip"})
+        second = await ac.get("/users/", headers={"Accept-Encoding": "gzip"})
+        identity = await ac.get("/users/", headers={"Accept-Encoding": "identity"})
+        not_modified = await ac.get(
+            "/users/",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]},
+        )
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert first.headers["etag"].startswith("W/")
+    assert int(first.headers["content-length"]) < len(identity.content) / 3
+    assert first.json() == identity.json()
+    assert len(first.json()) == 200
+    assert second.content == first.content
+    assert compress.call_count == 1  # Повторный ответ взят из кэша сжатых вариантов
+    assert "content-encoding" not in identity.headers
+    assert not_modified.status_code == 304
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_small_response_not_compressed(users_store):
+    users_store({"id": 1, "username": "johndoe", "name": "John"})
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/user"
+    ) as ac:
+        response = await ac.get("/users/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json()[0]["name"] == "John"
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_streaming_response_compressed(stub_upstream):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test/integration"
+    ) as ac:
+        response = await ac.get(
+            "/json?offset=1&limit=100", headers={"Accept-Encoding": "gzip"}
+        )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert [post["id"] for post in response.json()] == list(range(1, 101))
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_streaming_response_compressed_flushes_chunks():
+    chunks = [b'{"id": 1, "title": "' + b"x" * 2000 + b'"}', b", ", b'{"id": 2}']
+    sent = []
+
+    async def streaming_app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        for chunk in chunks[:-1]:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": chunks[-1]})
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = apps.compression.services.CompressionMiddleware(
+        streaming_app, enabled=True, minimum_size=1024
+    )
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    await middleware(scope, None, send)
+    bodies = [message["body"] for message in sent[1:]]
+    assert len(bodies) == 3
+    decompressor = zlib.decompressobj(31)
+    # Каждая часть распаковывается сразу после получения, без ожидания конца потока
+    assert [decompressor.decompress(body) for body in bodies] == chunks
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_import_users_csv_success(users_store, monkeypatch):
+    monkeypatch.setattr(get_settings(), "IMPORT_BATCH_SIZE", 2)
+    csv_file = (
+        "id,username,password,name,age,is_supervisor,email\n"
+        "1,user_1,secret,User 1,30,true,user_1@mail.com\n"
+        "2,user_2,secret,User 2,-5,false,\n"
+        "3,user_3,secret,,41,,\n"
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/user/users/import", files={"file": ("users.csv", csv_file, "text/csv")}
+        )
+        assert response.status_code == 202
+        assert response.json()["statusUrl"] == f"/jobs/{response.json()['jobId']}"
+        job = await wait_for_job(ac, response.json()["jobId"])
+    assert job.json()["status"] == "succeeded"
+    assert job.json()["progress"] == {"rows": 3, "created": 2, "failed": 1}
+    [error] = job.json()["result"]["errors"]
+    assert error["index"] == 1
+    assert error["errors"][0]["loc"] == ["age"]
+    assert users_store.get_by_id(1)["is_supervisor"] is True
+    assert users_store.get_by_id(3)["name"] is None
+    assert users_store.get_by_id(3)["hashed_password"].startswith("$2b$")
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_import_users_ndjson_invalid_line(users_store):
+    ndjson_file = (
+        '{"id": 1, "username": "user_1", "password": "secret"}\n'
+        "not json\n"
+        "\n"
+        '{"id": 2, "username": "user_2", "password": "secret"}\n'
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/user/users/import?format=ndjson",
+            files={"file": ("users.txt", ndjson_file, "text/plain")},
+        )
+        job = await wait_for_job(ac, response.json()["jobId"])
+    assert job.json()["result"]["created"] == 2
+    assert job.json()["result"]["errors"][0]["index"] == 1
+    assert [user["id"] for user in users_store.users_store] == [1, 2]
+
+
+@mark.services
+@mark.database
+@mark.controllers
+@pytest.mark.asyncio
+async def test_import_users_invalid_phone(users_store):
+    ndjson_file = (
+        '{"id": 1, "username": "user_1", "password": "secret", "phone_number": "bad"}\n'
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/user/users/import", files={"file": ("users.ndjson", ndjson_file)}
+        )
+        job = await wait_for_job(ac, response.json()["jobId"])
+        jobs = await ac.get("/jobs/?kind=users_import")
+    assert job.status_code == jobs.status_code == 200
+    assert job.json()["result"]["failed"] == 1
+    [error] = job.json()["result"]["errors"]
+    assert error["errors"][0]["loc"] == ["phone_number"]
+    assert users_store.get_by_id(1) is None
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_import_users_unsupported_format():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/user/users/import",
+            files={"file": ("users.xlsx", b"data", "application/zip")},
+        )
+        job = await ac.get("/jobs/unknown")
+    assert response.status_code == 415
+    assert job.status_code == 404
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_jobs_and_cancel_finished(list_of_user_create):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        job = await create_users(ac, list_of_user_create)
+        jobs = await ac.get("/jobs/?kind=users_create&status=succeeded")
+        cancel = await ac.delete(f"/jobs/{job.json()['id']}")
+    assert [item["id"] for item in jobs.json()["jobs"]] == [job.json()["id"]]
+    assert jobs.json()["workers"] >= 1
+    assert jobs.json()["queued"] == 0
+    assert cancel.status_code == 409
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_admission_control_sheds_overloaded_route_class():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        if scope["path"].startswith("/auth/"):
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    controller = AdmissionController(
+        {
+            "auth": AdmissionLimiter("auth", 1, 0, 1),
+            "user_read": AdmissionLimiter("user_read", 1, 0, 1),
+        }
+    )
+    middleware = AdmissionControlMiddleware(
+        slow_app, enabled=True, controller=controller
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=middleware), base_url="http://test"
+    ) as ac:
+        login = asyncio.create_task(ac.post("/auth/token"))
+        await asyncio.sleep(0.01)
+        rejected = await ac.post("/auth/token")
+        read = await ac.get("/user/users/1")
+        release.set()
+        assert (await login).status_code == 200
+    assert rejected.status_code == 503
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert read.status_code == 200
+    assert controller.metrics()["auth"]["rejected"] == 1
+
+
+@mark.services
+@mark.controllers
+@pytest.mark.asyncio
+async def test_read_admission_metrics_success():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        await ac.get("/user/users/")
+        response = await ac.get("/monitoring/admission")
+    assert response.status_code == 200
+    assert response.json()["enabled"] is True
+    route_classes = response.json()["route_classes"]
+    assert set(route_classes) == {"auth", "user_read", "user_write", "integration"}
+    assert route_classes["user_read"]["admitted"] >= 1
+    assert route_classes["user_read"]["active"] == 0
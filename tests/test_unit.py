@@ -1,7 +1,18 @@
 import pytest
-from apps.user.repository import UsersStore
-from apps.user.schemas import UserPublic, User, UserCreate
-from apps.user.services import AsyncDatabaseConnection
+from apps.user.repository import (
+    UsersStore,
+    SharedUsersStore,
+    StoreFullError,
+    get_users_store,
+    reset_users_store,
+)
+from apps.user.schemas import UserPublic, User, UserCreate, validate_email_syntax
+from apps.user.services import (
+    AsyncDatabaseConnection,
+    validate_users_batch,
+    to_stored_user,
+    etag_matches,
+)
 from apps.auth.schemas import Token, TokenData
 from apps.auth.services import (
     CryptContext,
@@ -9,6 +20,33 @@ from apps.auth.services import (
     verify_password,
 )
 from pydantic import ValidationError
+from launcher import get_uvicorn_options, get_workers_count
+from benchmarks.run import compare as compare_benchmarks, measure as measure_benchmark
+from settings.settings import Settings, get_settings
+from apps.auth.services import get_pwd_context
+from apps.monitoring.services import timed, format_server_timing, _request_timings
+from apps.monitoring.admission import classify_request
+from apps.jobs.services import JobQueue
+import asyncio
+from apps.external_API.disk_cache import DiskCache
+from apps.external_API.services import (
+    JsonStreamParser,
+    pagination_params,
+    parse_fields,
+    project_fields,
+)
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import uuid
+import os
+from multiprocessing import shared_memory
+import sys
+import io
+import json
+import logging
+from apps.user.imports import detect_format, iter_rows
+from apps.compression.services import CompressedCache, select_encoding
+from settings.logger import JsonFormatter, DebugSamplingFilter, setup_logging
 from pytest import mark
 
 
@@ -19,10 +57,33 @@ def test_users_store_success():
 
 
 @mark.database
-def test_users_store_singletone_success():
+def test_users_store_dependency_success():
+    users_store = get_users_store()
+    assert get_users_store() is users_store
+    assert UsersStore() is not UsersStore()
+    isolated = reset_users_store(UsersStore())
+    try:
+        assert get_users_store() is isolated
+        assert isolated is not users_store
+    finally:
+        reset_users_store(users_store)
+
+
+@mark.database
+def test_users_store_thread_safe():
     users_store = UsersStore()
-    users_store_2 = UsersStore()
-    assert users_store is users_store_2
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda i: users_store(
+                    {"id": i, "username": f"user_{i}", "age": i % 50}
+                ),
+                range(2000),
+            )
+        )
+    assert len(users_store.users_store) == 2000
+    assert all(users_store.get_by_id(i)["username"] == f"user_{i}" for i in range(2000))
+    assert len(users_store.search(age_min=0, age_max=0)) == 40
 
 
 @mark.database
@@ -33,6 +94,8 @@ def test_users_store_enter_data_success():
     list_of_users = users_store_instance.users_store
     assert list_of_users[0]["id"] == 1
     assert list_of_users[1]["id"] == 2
+    list_of_users.clear()  # Возвращается копия списка
+    assert len(users_store_instance.users_store) == 2
 
 
 @mark.services
@@ -165,3 +228,621 @@ def test_verify_password_success(mocker):
     mocker.patch("apps.auth.services.CryptContext.verify", return_value=True)
     result = verify_password("password", "hashed_password")
     assert result
+
+
+@mark.services
+def test_validate_users_batch_success(list_of_user_create):
+    users, errors = validate_users_batch(list_of_user_create)
+    assert len(users) == 5
+    assert all(isinstance(user, UserCreate) for user in users)
+    assert errors == []
+
+
+@mark.services
+def test_validate_users_batch_row_errors(list_of_user_create):
+    list_of_user_create[1]["email"] = "wrong_email"
+    del list_of_user_create[3]["username"]
+    list_of_user_create[4]["phone_number"] = "bad"
+    users, errors = validate_users_batch(list_of_user_create)
+    assert [user.id for user in users] == [0, 2]
+    assert [error["index"] for error in errors] == [1, 3, 4]
+    assert errors[0]["errors"][0]["loc"] == ["email"]
+    assert errors[1]["errors"][0]["loc"] == ["username"]
+    assert errors[2]["errors"][0]["loc"] == ["phone_number"]
+    assert "input" not in errors[0]["errors"][0]
+    assert "ctx" not in errors[2]["errors"][0]
+    json.dumps(errors)  # Ошибки сериализуются в ответ и результат задачи
+
+
+@mark.services
+def test_to_stored_user_success(user_public):
+    user = UserCreate(**user_public, username="johndoe", password="qwe123")
+    user_dict = to_stored_user(user, "hashed")
+    assert "password" not in user_dict
+    assert user_dict["hashed_password"] == "hashed"
+    assert user_dict == User(**user_dict).model_dump()
+
+
+@mark.services
+def test_validate_email_syntax_normalizes_domain():
+    assert validate_email_syntax("John.Doe@Mail.COM") == "John.Doe@mail.com"
+
+
+@mark.services
+@pytest.mark.parametrize(
+    "email",
+    [
+        "johndoemail.com",
+        "john@mail",
+        "john..doe@mail.com",
+        "john@mail.com\n",
+        "@mail.com",
+    ],
+)
+def test_validate_email_syntax_wrong_email(email):
+    with pytest.raises(ValueError):
+        validate_email_syntax(email)
+
+
+@mark.services
+def test_user_public_email_json_schema():
+    email_schema = UserPublic.model_json_schema()["properties"]["email"]
+    assert {"type": "string", "format": "email"} in email_schema["anyOf"]
+
+
+@mark.services
+def test_get_workers_count_defaults_to_cpu_count(mocker):
+    mocker.patch("launcher.os.cpu_count", return_value=8)
+    assert get_workers_count(Settings()) == 8
+    assert get_workers_count(Settings(WEB_WORKERS=3)) == 3
+
+
+@mark.services
+def test_get_uvicorn_options_success():
+    options = get_uvicorn_options(
+        Settings(WEB_WORKERS=2, WEB_BACKLOG=512, WEB_KEEPALIVE=30)
+    )
+    assert options["workers"] == 2
+    assert options["backlog"] == 512
+    assert options["timeout_keep_alive"] == 30
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "httptools"
+    assert options["access_log"] is False
+    assert options["reload"] is False
+
+
+@mark.services
+def test_get_settings_loaded_once():
+    assert get_settings() is get_settings()
+
+
+@mark.services
+def test_get_pwd_context_created_once():
+    assert get_pwd_context() is get_pwd_context()
+    assert get_pwd_context().schemes() == ("bcrypt",)
+
+
+@mark.services
+def test_import_main_is_lazy():
+    code = (
+        "import sys, main, settings.settings as s; "
+        "print('httpx' in sys.modules, s.get_settings.cache_info().currsize)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert result.stdout.split() == ["False", "0"]
+
+
+@mark.services
+def test_timed_disabled_is_noop():
+    with timed("db") as stage:
+        pass
+    assert stage is None
+    assert _request_timings.get() is None
+
+
+@mark.services
+def test_timed_accumulates_stages():
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        with timed("db"):
+            pass
+        with timed("db"):
+            pass
+        with timed("jwt"):
+            pass
+    finally:
+        _request_timings.reset(token)
+    assert list(timings) == ["db", "jwt"]
+    assert timings["db"] >= 0
+
+
+@mark.services
+def test_format_server_timing_success():
+    header = format_server_timing({"jwt": 0.0012, "_endpoint_done": 1.0}, 0.05)
+    assert header == "jwt;dur=1.20, total;dur=50.00"
+
+
+@mark.services
+def test_json_formatter_includes_extra_fields():
+    record = logging.makeLogRecord(
+        {"name": "apps.user", "levelname": "INFO", "msg": "Привет %s", "args": ("мир",)}
+    )
+    record.event = "db_connect"
+    data = json.loads(JsonFormatter().format(record))
+    assert data["message"] == "Привет мир"
+    assert data["event"] == "db_connect"
+    assert data["logger"] == "apps.user"
+    assert "args" not in data
+
+
+@mark.services
+def test_debug_sampling_filter_success():
+    sampling_filter = DebugSamplingFilter(sample_every=10)
+    debug = logging.makeLogRecord({"levelno": logging.DEBUG})
+    info = logging.makeLogRecord({"levelno": logging.INFO})
+    assert sum(sampling_filter.filter(debug) for _ in range(100)) == 10
+    assert all(sampling_filter.filter(info) for _ in range(10))
+
+
+@mark.services
+def test_setup_logging_writes_json_in_background():
+    stream = io.StringIO()
+    listener = setup_logging("DEBUG", 2, stream=stream, logger_name="apps.test_logging")
+    logger = logging.getLogger("apps.test_logging")
+    try:
+        for i in range(4):
+            logger.debug("debug %s", i, extra={"event": "debug_event"})
+        logger.info("info", extra={"event": "info_event"})
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logger.exception("failed %s", "once")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == [
+        "debug 0",
+        "debug 2",
+        "info",
+        "failed once",
+    ]
+    assert lines[2]["event"] == "info_event"
+    assert "exc_info" not in lines[2]
+    assert lines[-1]["exc_info"].endswith("RuntimeError: boom")
+
+
+@mark.database
+def test_users_store_indexes_success():
+    users_store_instance = UsersStore()
+    users_store_instance({"id": 901, "username": "alex"})
+    users_store_instance.extend(
+        [{"id": 902, "username": "sam"}, {"id": 901, "username": "dup"}]
+    )
+    try:
+        assert users_store_instance.get_by_id(901)["username"] == "alex"
+        assert users_store_instance.get_by_username("sam")["id"] == 902
+        found, missing = users_store_instance.get_many([902, 999, 901, 902])
+        assert [i["username"] for i in found] == ["sam", "alex"]
+        assert missing == [999]
+        users_store_instance.remove(901)
+        assert users_store_instance.get_by_id(901) is None
+        assert users_store_instance.get_by_username("dup") is None
+        assert users_store_instance.get_by_username("sam")["id"] == 902
+    finally:
+        users_store_instance.remove(901)
+        users_store_instance.remove(902)
+
+
+@mark.database
+def test_users_store_update_keeps_indexes():
+    users_store_instance = UsersStore()
+    users_store_instance({"id": 903, "username": "alex", "name": "Alex"})
+    try:
+        user = users_store_instance.update(
+            903, {"name": "Alexander", "username": "alexander"}
+        )
+        assert user["name"] == "Alexander"
+        assert users_store_instance.get_by_username("alex") is None
+        assert users_store_instance.get_by_username("alexander") is user
+        assert users_store_instance.update(904, {"name": "Nobody"}) is None
+        updated, missing = users_store_instance.update_many(
+            {903: {"id": 905}, 906: {"name": "Nobody"}}
+        )
+        assert updated == [user]
+        assert missing == [906]
+        assert users_store_instance.get_by_id(903) is None
+        assert users_store_instance.get_by_id(905) is user
+    finally:
+        users_store_instance.remove(903)
+        users_store_instance.remove(905)
+
+
+@mark.database
+def test_users_store_search_success():
+    users_store_instance = UsersStore()
+    users = [
+        {
+            "id": 910,
+            "name": "Alex",
+            "age": 20,
+            "is_supervisor": True,
+            "email": "a@corp.com",
+        },
+        {
+            "id": 911,
+            "name": "alice",
+            "age": 30,
+            "is_supervisor": False,
+            "email": "b@mail.com",
+        },
+        {
+            "id": 912,
+            "name": "Bob",
+            "age": 40,
+            "is_supervisor": True,
+            "email": "c@CORP.com",
+        },
+        {
+            "id": 913,
+            "name": "Alexandra",
+            "age": 50,
+            "is_supervisor": True,
+            "email": None,
+        },
+    ]
+    users_store_instance.extend(users)
+
+    def search_ids(**filters):
+        return [
+            i["id"] for i in users_store_instance.search(**filters) if i["id"] >= 910
+        ]
+
+    try:
+        assert search_ids(age_min=25, age_max=40) == [911, 912]
+        assert search_ids(is_supervisor=True) == [910, 912, 913]
+        assert search_ids(email_domain="corp.com") == [910, 912]
+        assert search_ids(name_prefix="AL") == [910, 911, 913]
+        assert search_ids(name_prefix="alex", is_supervisor=True, age_min=30) == [913]
+        assert search_ids(name_prefix="Zed") == []
+        users_store_instance.update(911, {"age": 60, "name": "Zed"})
+        assert search_ids(name_prefix="zed", age_min=55) == [911]
+        users_store_instance.remove(910)
+        assert search_ids(email_domain="corp.com") == [912]
+    finally:
+        for user in users:
+            users_store_instance.remove(user["id"])
+
+
+@mark.services
+def test_external_api_projection_success():
+    items = [{"id": 1, "title": "a", "body": "b"}, {"id": 2, "title": "c"}]
+    assert parse_fields(None) is None
+    assert parse_fields(" id , title,") == ["id", "title"]
+    assert project_fields(items[0], None) is items[0]
+    assert [project_fields(item, ["id", "body"]) for item in items] == [
+        {"id": 1, "body": "b"},
+        {"id": 2},
+    ]
+    assert pagination_params(offset=1, limit=3) == {"_start": 0, "_limit": 3}
+
+
+@mark.services
+def test_json_stream_parser_success():
+    items = [{"id": 1, "title": "Привет"}, 12345, "строка, с ] скобкой", [1, 2], None]
+    body = json.dumps(items, ensure_ascii=False).encode("utf-8")
+    parser = JsonStreamParser()
+    parsed = []
+    for i in range(len(body)):  # Передаем тело по одному байту
+        parsed.extend(parser.feed(body[i : i + 1]))
+    parsed.extend(parser.close())
+    assert parsed == items
+
+
+@mark.services
+def test_json_stream_parser_yields_items_early():
+    parser = JsonStreamParser()
+    assert parser.feed(b' [{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(b": 2}, 3") == [{"id": 2}]
+    assert parser.feed(b"4]") == [34]
+    assert parser.close() == []
+
+
+@mark.services
+def test_json_stream_parser_not_array_and_truncated():
+    parser = JsonStreamParser()
+    assert parser.feed(b'{"message": ') == []
+    assert parser.feed(b'"ok"}') == []
+    assert parser.close() == [{"message": "ok"}]
+    parser = JsonStreamParser()
+    parser.feed(b'[{"id": 1}, {"id": 2')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+@mark.services
+def test_disk_cache_format_and_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=250)
+    cache.put("a", [{"id": 1, "title": "Привет"}], etag='"e1"', last_modified="Mon")
+    entry = cache.get("a")
+    assert list(entry.items(chunk_size=3)) == [{"id": 1, "title": "Привет"}]
+    assert entry.validators() == {"If-None-Match": '"e1"', "If-Modified-Since": "Mon"}
+    entry.close()
+    assert cache.get("b") is None
+
+    with open(cache.path("b"), "wb") as file:  # Поврежденная запись
+        file.write(b"garbage")
+    assert cache.get("b") is None
+
+    cache.put("c", [{"id": i} for i in range(20)])
+    assert cache.get("a") is None  # Вытеснена как давно не обновлявшаяся
+    entry = cache.get("c")
+    assert len(list(entry.items())) == 20
+    entry.close()
+
+
+@mark.services
+def test_disk_cache_unreadable_entry_is_miss(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    os.mkdir(cache.path("a"))  # open завершится IsADirectoryError
+    assert cache.get("a") is None
+    with open(cache.path("b"), "wb"):
+        pass  # Пустой файл нельзя отобразить в память
+    assert cache.get("b") is None
+
+
+@mark.database
+def test_shared_users_store_between_processes():
+    name = f"users_store_test_{uuid.uuid4().hex[:8]}"
+    store = SharedUsersStore(name, 1024 * 1024)
+    try:
+        store({"id": 920, "name": "Parent", "age": 30})
+        # Другой процесс подключается к сегменту, читает и дописывает пользователя
+        code = (
+            "from apps.user.repository import SharedUsersStore; "
+            f"store = SharedUsersStore({name!r}, 1024 * 1024); "
+            "print(store.get_by_id(920)['name']); "
+            "store.update(920, {'age': 31}); "
+            "store({'id': 921, 'name': 'Child', 'age': 5}); "
+            "print(store.owner); store.close()"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        assert result.stdout.split() == ["Parent", "False"], result.stderr
+        assert store.get_by_id(921)["name"] == "Child"
+        assert store.get_by_id(920)["age"] == 31
+        assert [i["id"] for i in store.search(age_max=10)] == [921]
+    finally:
+        store.remove(920)
+        store.remove(921)
+        store.close()
+
+
+@mark.database
+def test_shared_users_store_applies_log_and_outlives_owner(mocker):
+    name = f"users_store_test_{uuid.uuid4().hex[:8]}"
+    owner = SharedUsersStore(name, 1024 * 1024)
+    replica = SharedUsersStore(name, 1024 * 1024)
+    replica.get_by_id(1)
+    replace_all = mocker.spy(replica._store, "replace_all")
+    owner.extend([{"id": i, "name": f"User_{i}", "age": i} for i in range(3)])
+    owner.update(1, {"age": 40})
+    owner.remove(2)
+    # Записи другого экземпляра применяются из журнала без перечитывания снимка
+    assert replica.get_by_id(1)["age"] == 40
+    assert [user["id"] for user in replica.search(age_min=30)] == [1]
+    assert [user["id"] for user in replica.search(30, None, None, None, None, 1)] == [1]
+    assert replica.get_by_id(2) is None
+    assert replace_all.call_count == 0
+    owner.COMPACT_MIN_LOG = 0
+    owner({"id": 5, "name": "User_5", "age": 5})  # Журнал уплотняется в снимок
+    assert replica.get_by_id(5)["age"] == 5
+    assert replace_all.call_count == 1
+    # Создавший сегмент процесс отключается, а сегмент остается у подключенных
+    owner.close()
+    replica.update(5, {"age": 6})
+    assert replica.get_by_id(5)["age"] == 6
+    replica.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+@mark.database
+def test_shared_users_store_full():
+    store = SharedUsersStore(f"users_store_test_{uuid.uuid4().hex[:8]}", 1024 * 1024)
+    try:
+        with pytest.raises(StoreFullError):
+            store({"id": 922, "name": "x" * 2 * 1024 * 1024})
+        assert store.get_by_id(922) is None  # Локальная копия перечитана из снимка
+    finally:
+        store.close()
+
+
+@mark.database
+def test_users_store_incremental_index_matches_rebuild():
+    users_store = UsersStore(
+        [
+            {
+                "id": i,
+                "name": f"User_{i}",
+                "age": i % 7,
+                "is_supervisor": i % 2 == 0,
+                "email": f"u{i}@d{i % 3}.com",
+            }
+            for i in range(50)
+        ]
+    )
+    users_store.update_many(
+        {
+            i: {"age": 100 - i, "name": f"Renamed_{i}", "email": f"u{i}@new.com"}
+            for i in range(0, 50, 5)
+        }
+    )
+    users_store.update(7, {"is_supervisor": True, "email": None})
+    users_store.update(8, {"id": 108, "username": "user_108"})
+    for user_id in (0, 13, 49, 100):
+        users_store.remove(user_id)
+    rebuilt = UsersStore(users_store.users_store)
+    assert users_store.get_by_id(8) is None
+    assert users_store.get_by_id(108) == rebuilt.get_by_id(108)
+    assert users_store.get_by_username("user_108") == rebuilt.get_by_username(
+        "user_108"
+    )
+    assert users_store.record_version(8) is None
+    assert users_store.record_version(108) == users_store.version - 3
+    for filters in (
+        {},
+        {"age_min": 2, "age_max": 5},
+        {"age_min": 60},
+        {"is_supervisor": True},
+        {"email_domain": "D1.com"},
+        {"email_domain": "new.com", "is_supervisor": False},
+        {"name_prefix": "user_1"},
+        {"name_prefix": "renamed", "age_max": 80},
+    ):
+        assert users_store.search(**filters) == rebuilt.search(**filters)
+        assert users_store.search(**filters, limit=3) == rebuilt.search(**filters)[:3]
+
+
+@mark.database
+def test_users_store_compacts_removed_slots(mocker):
+    mocker.patch("apps.user.repository.COMPACT_MIN_REMOVED", 4)
+    users_store = UsersStore([{"id": i, "age": i % 3} for i in range(10)])
+    for user_id in range(6):
+        users_store.remove(user_id)
+    assert users_store._users_store == [{"id": i, "age": i % 3} for i in range(6, 10)]
+    assert users_store.search(age_min=0, age_max=0) == [
+        {"id": 6, "age": 0},
+        {"id": 9, "age": 0},
+    ]
+    assert users_store.get_by_id(8) == {"id": 8, "age": 2}
+
+
+@mark.database
+def test_users_store_versions_success():
+    users_store = UsersStore([{"id": 1, "age": 30}, {"id": 2, "age": 40}])
+    version = users_store.version
+    assert users_store.record_version(1) == users_store.record_version(2) == version
+    users_store.update(1, {"age": 30})  # Значение не изменилось - версии прежние
+    assert users_store.version == version
+    users_store.update(1, {"age": 31})
+    assert users_store.version > version
+    assert users_store.record_version(1) == users_store.version
+    assert users_store.record_version(2) == version
+    users_store.remove(2)
+    assert users_store.record_version(2) is None
+    assert UsersStore().epoch != users_store.epoch
+
+
+@mark.services
+def test_etag_matches_success():
+    assert etag_matches('"a.1"', '"a.1"')
+    assert etag_matches('W/"a.1", "b.2"', '"a.1"')
+    assert etag_matches("*", '"a.1"')
+    assert not etag_matches('"a.2"', '"a.1"')
+    assert not etag_matches(None, '"a.1"')
+
+
+@mark.services
+def test_import_iter_rows_success():
+    csv_file = io.StringIO("id,username,age,extra\n1,john,,x,y\n")
+    assert list(iter_rows(csv_file, "csv")) == [
+        {"id": "1", "username": "john", "age": None, "extra": "x"}
+    ]
+    ndjson_file = io.StringIO('{"id": 1}\n\n{broken\n')
+    assert list(iter_rows(ndjson_file, "ndjson")) == [{"id": 1}, "{broken"]
+    assert detect_format("users.JSONL", None) == "ndjson"
+    assert detect_format("upload", "text/csv; charset=utf-8") == "csv"
+    assert detect_format("users.xlsx", "application/zip") is None
+
+
+@mark.services
+def test_select_encoding_success():
+    encodings = ["zstd", "br", "gzip"]
+    assert select_encoding("gzip, deflate, br", encodings) == "br"
+    assert select_encoding("gzip;q=0.5, br;q=0", encodings) == "gzip"
+    assert select_encoding("*", encodings) == "zstd"
+    assert select_encoding("identity", encodings) is None
+    assert select_encoding(None, encodings) is None
+
+
+@mark.services
+def test_compressed_cache_evicts_by_size():
+    cache = CompressedCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")  # Вытесняется давно не использованная запись b
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == b"1234"
+    assert cache.size == 8
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+
+
+@mark.services
+def test_benchmarks_compare_finds_regressions():
+    baseline = {"a": {"ns_per_op": 100.0}, "b": {"ns_per_op": 100.0}}
+    current = {
+        "a": {"ns_per_op": 109.0},
+        "b": {"ns_per_op": 150.0},
+        "new": {"ns_per_op": 1.0},
+    }
+    assert compare_benchmarks(baseline, current, threshold=0.1) == [
+        ("b", 100.0, 150.0, 1.5)
+    ]
+    assert compare_benchmarks(baseline, current, threshold=0.6) == []
+
+
+@mark.services
+def test_benchmarks_measure_calibrates_batch():
+    calls = []
+
+    def run_batch(number):
+        calls.append(number)
+        return number * 0.001
+
+    assert measure_benchmark(run_batch, min_time=0.05, repeat=3) == pytest.approx(1e6)
+    assert calls[-1] * 0.001 >= 0.05
+    assert calls[-3:] == [calls[-1]] * 3
+
+
+@mark.services
+def test_classify_request_success():
+    def classify(method, path):
+        return classify_request({"method": method, "path": path})
+
+    assert classify("POST", "/auth/token") == "auth"
+    assert classify("GET", "/user/users/") == "user_read"
+    assert classify("POST", "/protected_user/users/batch") == "user_read"
+    assert classify("POST", "/user/users/") == "user_write"
+    assert classify("GET", "/monitoring/admission") is None
+
+
+@mark.services
+def test_job_queue_moves_queued_jobs_to_new_loop():
+    queue = JobQueue(workers=1)
+
+    async def kind(job):
+        return job.kind
+
+    async def first_loop():
+        running = queue.submit("running", lambda job: asyncio.Event().wait())
+        await asyncio.sleep(0.01)
+        return running, queue.submit("queued", kind)
+
+    async def second_loop():
+        job = queue.submit("next", kind)
+        while not job.done:
+            await asyncio.sleep(0.01)
+        await queue.close()
+
+    running, queued = asyncio.run(first_loop())
+    assert (running.status, queued.status) == ("running", "queued")
+    asyncio.run(second_loop())
+    assert running.status == "failed"
+    assert (queued.status, queued.result) == ("succeeded", "queued")
@@ -10,8 +10,30 @@ from apps.auth.services import (
     verify_token,
 )
 from apps.user.routers import check_if_user_authorized
-from apps.external_API.services import fetch_data
+from apps.user.services import AsyncDatabaseConnection
+from apps.external_API.services import (
+    fetch_data,
+    get_http_client,
+    close_http_client,
+    stream_json_array,
+    aggregate_posts,
+)
+from apps.external_API.disk_cache import DiskCache
+from apps.external_API.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientClient,
+    UpstreamError,
+)
+from apps.jobs.services import Job, JobQueue, PRIORITY_HIGH, PRIORITY_LOW
+from apps.user.imports import create_users_job
+from apps.user.repository import UsersStore
+from apps.monitoring.admission import AdmissionLimiter, AdmissionRejected
 from fastapi import HTTPException
+from apps.monitoring.profiler import SamplingProfiler, probe_loop_lag
+from apps.monitoring.blocking import BlockingDetector
+import json
+import time
 import pytest
 from pytest import mark
 
@@ -153,9 +175,10 @@ async def test_error_middleware_raises():
 
 
 class AsyncMockResponse:
-    def __init__(self, data, status):
-        self.data = data
-        self.status = status
+    def __init__(self, chunks, status):
+        self.chunks = chunks
+        self.status_code = status
+        self.sent = 0
 
     async def __aexit__(self, exc_type, exc, tb):
         await asyncio.sleep(0.001)
@@ -164,19 +187,519 @@ class AsyncMockResponse:
         await asyncio.sleep(0.001)
         return self
 
-    def json(self):
-        return self
+    def raise_for_status(self):
+        pass
+
+    async def aiter_bytes(self):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
 
 
 @mark.services
 @pytest.mark.asyncio
 async def test_fetch_external_API_data_success(mocker):
-    data = {"message": "ok"}
-    response = AsyncMockResponse(data=data, status=200)
-    mock = mocker.patch(
-        "apps.external_API.services.httpx.AsyncClient.get", return_value=response
+    response = AsyncMockResponse(chunks=[b'[{"id": 1}, {"i', b'd": 2}]'], status=200)
+    mock = mocker.patch("httpx.AsyncClient.stream", return_value=response)
+    resp = [
+        item
+        async for item in fetch_data(
+            "https://jsonplaceholder.typicode.com/posts",
+            params={"_start": 0, "_limit": 3},
+        )
+    ]
+    assert resp == [{"id": 1}, {"id": 2}]
+    mock.assert_called_once_with(
+        "GET",
+        "https://jsonplaceholder.typicode.com/posts",
+        params={"_start": 0, "_limit": 3},
+        headers=None,
+    )
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_stream_json_array_stops_early(mocker):
+    chunks = [b"["] + [b'{"id": %d, "body": "..."},' % i for i in range(100)] + [b"{}]"]
+    response = AsyncMockResponse(chunks=chunks, status=200)
+    mocker.patch("httpx.AsyncClient.stream", return_value=response)
+    items = fetch_data("https://jsonplaceholder.typicode.com/posts")
+    first = await anext(items)
+    body = b"".join(
+        [chunk async for chunk in stream_json_array(first, items, 3, ["id"])]
     )
-    resp = await fetch_data("https://jsonplaceholder.typicode.com/posts")
-    assert resp.status == 200
-    assert resp.data == {"message": "ok"}
-    mock.assert_called_once_with("https://jsonplaceholder.typicode.com/posts")
+    assert json.loads(body) == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert response.sent <= 5  # Оставшаяся часть тела не читается
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_http_client_created_lazily():
+    client = get_http_client()
+    assert get_http_client() is client
+    await close_http_client()
+    assert client.is_closed
+    assert get_http_client() is not client
+    await close_http_client()
+
+
+def _blocking_hot_function(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_sampling_profiler_finds_blocking_function():
+    async def block_loop():
+        await asyncio.sleep(0.05)
+        _blocking_hot_function(0.2)
+
+    profile, _ = await asyncio.gather(
+        SamplingProfiler().profile(0.4, interval=0.002), block_loop()
+    )
+    assert profile.samples > 0
+    hot_functions = dict(profile.top_functions(3))
+    assert any("_blocking_hot_function" in name for name in hot_functions)
+    assert profile.loop_lag.max_ms >= 100
+    line = profile.collapsed().splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_sampling_profiler_single_run():
+    profiler = SamplingProfiler()
+    with pytest.raises(RuntimeError):
+        await asyncio.gather(profiler.profile(0.05), profiler.profile(0.05))
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_probe_loop_lag_idle_loop():
+    stats = await probe_loop_lag(0.05, 0.01)
+    assert len(stats.samples) >= 3
+    assert stats.max_ms < 50
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_blocking_detector_records_call_site():
+    detector = BlockingDetector(threshold=0.04)
+    detector.start()
+    try:
+        await asyncio.sleep(0.05)
+        time.sleep(0.15)  # Блокирующий вызов в асинхронном коде
+        await asyncio.sleep(0.05)
+    finally:
+        detector.stop()
+    [site] = detector.report()
+    assert site.call_site.startswith("tests/test_unit_async.py:")
+    assert site.call_site.endswith("test_blocking_detector_records_call_site")
+    assert site.count == 1
+    assert site.max_ms >= 100
+    assert "time.sleep(0.15)" in site.stack
+    assert detector.counts() == {site.call_site: 1}
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_blocking_detector_ignores_awaits():
+    detector = BlockingDetector(threshold=0.04)
+    detector.start()
+    try:
+        await asyncio.sleep(0.15)
+    finally:
+        detector.stop()
+    assert detector.report() == []
+    assert not detector.running
+
+
+@mark.database
+@pytest.mark.asyncio
+async def test_async_database_connection_does_not_print(capsys):
+    async with AsyncDatabaseConnection("some_url"):
+        pass
+    assert capsys.readouterr().out == ""
+
+
+class FaultInjectingServer:
+    """
+    Локальная заглушка внешнего API. Каждый запрос обрабатывается по очередному сценарию из faults:
+    "ok" - ответ 200 с телом body, "error" - ответ 500, "not_found" - ответ 404,
+    "slow" - ответ с задержкой, "reset" - разрыв соединения без ответа.
+    Если задан etag, на запрос с совпадающим If-None-Match отвечает 304
+    """
+
+    def __init__(self, body):
+        self.body = json.dumps(body).encode()
+        self.faults = []
+        self.requests = 0
+        self.etag = None
+        self.server = None
+
+    @property
+    def url(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/posts"
+
+    async def handle(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        self.requests += 1
+        fault = self.faults.pop(0) if self.faults else "ok"
+        if fault == "reset":
+            writer.close()
+            return
+        if fault == "slow":
+            await asyncio.sleep(1)
+        status, body = {
+            "error": (b"500 Internal Server Error", b"{}"),
+            "not_found": (b"404 Not Found", b"{}"),
+        }.get(fault, (b"200 OK", self.body))
+        if fault == "ok" and self.etag is not None and self.etag in request:
+            status, body = b"304 Not Modified", b""
+        etag = b"ETag: %s\r\n" % self.etag if self.etag is not None else b""
+        writer.write(
+            b"HTTP/1.1 "
+            + status
+            + b"\r\nContent-Type: application/json\r\n"
+            + etag
+            + b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body)
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.server.close()
+        await close_http_client()
+
+
+def _resilient_client(**kwargs):
+    options = {
+        "attempt_timeout": 0.3,
+        "retries": 2,
+        "backoff_base": 0.01,
+        "backoff_max": 0.02,
+    }
+    options.update(kwargs)
+    return ResilientClient(**options)
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_retries_transient_errors():
+    async with FaultInjectingServer([{"id": 1}, {"id": 2}]) as server:
+        server.faults = ["error", "reset", "ok"]
+        client = _resilient_client()
+        items = [item async for item in client.fetch(server.url)]
+    assert items == [{"id": 1}, {"id": 2}]
+    assert server.requests == 3
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_attempt_timeout():
+    async with FaultInjectingServer([{"id": 1}]) as server:
+        server.faults = ["slow", "ok"]
+        client = _resilient_client()
+        start = time.perf_counter()
+        items = [item async for item in client.fetch(server.url)]
+        elapsed = time.perf_counter() - start
+    assert items == [{"id": 1}]
+    assert elapsed < 1  # Медленная попытка прервана по сроку, а не дождалась ответа
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_does_not_retry_client_errors():
+    async with FaultInjectingServer([]) as server:
+        server.faults = ["not_found"]
+        client = _resilient_client()
+        with pytest.raises(Exception) as error:
+            [item async for item in client.fetch(server.url)]
+    assert not isinstance(error.value, UpstreamError)
+    assert server.requests == 1
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_circuit_breaker_serves_cache():
+    async with FaultInjectingServer([{"id": 1}]) as server:
+        client = _resilient_client(
+            retries=1, breaker=CircuitBreaker(threshold=2, reset_timeout=0.3)
+        )
+        assert [item async for item in client.fetch(server.url)] == [{"id": 1}]
+
+        server.faults = ["error", "error"]
+        # Выключатель размыкается, ответ берется из кэша
+        assert [item async for item in client.fetch(server.url)] == [{"id": 1}]
+        assert client.breaker.state == CircuitBreaker.OPEN
+        requests = server.requests
+        assert [item async for item in client.fetch(server.url)] == [{"id": 1}]
+        assert server.requests == requests  # Внешний API не вызывался
+        with pytest.raises(CircuitOpenError):
+            [item async for item in client.fetch(server.url, params={"_limit": 1})]
+
+        await asyncio.sleep(0.3)
+        # Отмененная пробная попытка не блокирует следующую
+        server.faults = ["slow"]
+        probe = asyncio.create_task(
+            anext(client.fetch(server.url, params={"_limit": 1}))
+        )
+        await asyncio.sleep(0.1)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        # Пробная попытка проходит и замыкает выключатель
+        assert [item async for item in client.fetch(server.url)] == [{"id": 1}]
+        assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_caches_only_complete_bounded_responses():
+    async with FaultInjectingServer([{"id": 1}, {"id": 2}, {"id": 3}]) as server:
+        client = _resilient_client(retries=0, cache_max_items=2)
+        items = client.fetch(server.url)
+        assert await anext(items) == {"id": 1}
+        await items.aclose()  # Потребитель прервал чтение
+        assert [item async for item in client.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+            {"id": 3},
+        ]
+        server.faults = ["error"]
+        # Ни прерванный, ни слишком длинный ответ не сохранены в кэше
+        with pytest.raises(UpstreamError):
+            [item async for item in client.fetch(server.url)]
+
+
+class FakeUpstreamClient:
+    """Заглушка клиента внешнего API: отдает данные по пути ресурса с заданной задержкой"""
+
+    def __init__(self, resources, delays):
+        self.resources = resources
+        self.delays = delays
+        self.calls = []
+
+    async def fetch(self, url, params=None):
+        resource = url.rsplit("/", 1)[1]
+        self.calls.append((resource, params))
+        await asyncio.sleep(self.delays[resource])
+        for item in self.resources[resource]:
+            yield item
+
+
+def _fake_upstream_client():
+    return FakeUpstreamClient(
+        resources={
+            "posts": [{"id": 1, "userId": 2}, {"id": 2, "userId": 1}],
+            "users": [{"id": 1, "name": "Leanne"}, {"id": 2, "name": "Ervin"}],
+            "comments": [{"id": 10, "postId": 1}, {"id": 11, "postId": 1}],
+        },
+        delays={"posts": 0.2, "users": 0.2, "comments": 0.2},
+    )
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_aggregate_posts_success():
+    client = _fake_upstream_client()
+    start = time.perf_counter()
+    result = await aggregate_posts(client, "http://upstream", offset=1, limit=2)
+    elapsed = time.perf_counter() - start
+    assert result == [
+        {
+            "id": 1,
+            "userId": 2,
+            "author": {"id": 2, "name": "Ervin"},
+            "comments": [{"id": 10, "postId": 1}, {"id": 11, "postId": 1}],
+        },
+        {"id": 2, "userId": 1, "author": {"id": 1, "name": "Leanne"}, "comments": []},
+    ]
+    assert elapsed < 0.4  # Время самого медленного запроса, а не сумма
+    assert ("comments", {"postId_gte": 1, "postId_lte": 2}) in client.calls
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_aggregate_posts_concurrency_limit():
+    start = time.perf_counter()
+    await aggregate_posts(
+        _fake_upstream_client(), "http://upstream", offset=1, limit=2, concurrency=1
+    )
+    assert time.perf_counter() - start >= 0.6
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_resilient_client_disk_cache_shared_between_clients(tmp_path, mocker):
+    async with FaultInjectingServer([{"id": 1}, {"id": 2}]) as server:
+        server.etag = b'"v1"'
+        first = _resilient_client(disk_cache=DiskCache(str(tmp_path), ttl=60))
+        assert [item async for item in first.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+        # Новый процесс после перезапуска: ответ берется с диска без запроса к внешнему API
+        second = _resilient_client(disk_cache=DiskCache(str(tmp_path), ttl=60))
+        assert [item async for item in second.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+        assert server.requests == 1
+        # Устаревшая запись перепроверяется условным запросом
+        stale = _resilient_client(disk_cache=DiskCache(str(tmp_path), ttl=0))
+        assert [item async for item in stale.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+        assert server.requests == 2
+        # Внешний API недоступен: отдается устаревшая запись с диска
+        server.faults = ["error"] * 3
+        assert [item async for item in stale.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+        # Ошибка записи в дисковый кэш не прерывает ответ
+        server.faults = []
+        full = DiskCache(str(tmp_path / "full"))
+        mocker.patch.object(full, "put", side_effect=OSError("No space left on device"))
+        client = _resilient_client(disk_cache=full)
+        assert [item async for item in client.fetch(server.url)] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_job_queue_priorities_and_concurrency():
+    queue = JobQueue(workers=1)
+    release = asyncio.Event()
+    order = []
+
+    async def blocker(job):
+        await release.wait()
+        order.append("blocker")
+
+    def record(name):
+        async def func(job):
+            order.append(name)
+
+        return func
+
+    queue.submit("blocker", blocker)
+    await asyncio.sleep(0)
+    low = queue.submit("low", record("low"), priority=PRIORITY_LOW)
+    high = queue.submit("high", record("high"), priority=PRIORITY_HIGH)
+    await asyncio.sleep(0.01)
+    assert queue.stats() == {"workers": 1, "running": 1, "queued": 2}
+    release.set()
+    for _ in range(100):
+        if low.done and high.done:
+            break
+        await asyncio.sleep(0.01)
+    assert order == ["blocker", "high", "low"]
+    assert [job.kind for job in queue.recent(status="succeeded")] == [
+        "high",
+        "low",
+        "blocker",
+    ]
+    await queue.close()
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_job_queue_retries_and_cancel():
+    queue = JobQueue(workers=1, retry_backoff=0)
+    calls = []
+
+    async def flaky(job):
+        calls.append(job.attempts)
+        if job.attempts < 3:
+            raise RuntimeError("временная ошибка")
+        return "ok"
+
+    async def broken(job):
+        raise RuntimeError("постоянная ошибка")
+
+    retried = queue.submit("flaky", flaky, retries=2)
+    failed = queue.submit("broken", broken, retries=0)
+    cancelled = []
+    waiting = queue.submit("waiting", flaky, on_cancel=lambda: cancelled.append(True))
+    assert queue.cancel(waiting.id)
+    for _ in range(100):
+        if retried.done and failed.done:
+            break
+        await asyncio.sleep(0.01)
+    assert (retried.status, retried.result, retried.attempts) == ("succeeded", "ok", 3)
+    assert (failed.status, failed.error) == ("failed", "постоянная ошибка")
+    assert waiting.status == "cancelled" and cancelled == [True]
+    assert calls == [1, 2, 3]
+    assert not queue.cancel(retried.id)
+    await queue.close()
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_admission_limiter_queue_and_rejections():
+    limiter = AdmissionLimiter("auth", concurrency=1, queue_size=1, queue_timeout=0.05)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert (limiter.active, limiter.queued) == (1, 1)
+    with pytest.raises(AdmissionRejected) as e:
+        await limiter.acquire()
+    assert e.value.reason == "queue_full" and e.value.retry_after >= 1
+    limiter.release(0.01)
+    await waiting
+    assert (limiter.active, limiter.queued) == (1, 0)
+    with pytest.raises(AdmissionRejected) as e:
+        await limiter.acquire()
+    assert e.value.reason == "queue_timeout"
+    limiter.release(0.01)
+    assert limiter.active == 0
+    metrics = limiter.metrics()
+    assert (metrics["admitted"], metrics["rejected"], metrics["timed_out"]) == (2, 1, 1)
+    assert metrics["queued"] == 0 and metrics["wait_max_ms"] > 0
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_admission_limiter_timeout_after_handoff(mocker):
+    limiter = AdmissionLimiter("auth", concurrency=1, queue_size=1, queue_timeout=0.05)
+    await limiter.acquire()
+
+    async def handed_off(waiter, timeout):
+        limiter.release()  # Слот передан в момент истечения ожидания
+        raise asyncio.TimeoutError
+
+    mocker.patch("apps.monitoring.admission.asyncio.wait_for", handed_off)
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+    assert (limiter.active, limiter.queued) == (0, 0)
+
+
+@mark.services
+@pytest.mark.asyncio
+async def test_create_users_job_retry_skips_created_users(list_of_user_create):
+    store = UsersStore()
+    job = Job("users_create", None)
+    job.attempts = 1
+    await create_users_job(job, list_of_user_create[:2], store, latency=0)
+    # Повтор после ошибки, возникшей уже после добавления пользователей
+    job.attempts = 2
+    result = await create_users_job(job, list_of_user_create, store, latency=0)
+    assert [user["id"] for user in store.users_store] == [
+        user["id"] for user in list_of_user_create
+    ]
+    assert result["created"] == len(list_of_user_create)